@@ -1,5 +1,9 @@
 import sys
 import os
+import threading
+import time
+
+from outbound import CLAUDE
 
 class Summarizer:
     # ... (existing Summarizer code remains the same as a fallback)
@@ -8,12 +12,22 @@ class Summarizer:
         self.parser = None
         self.summarizer = None
         self.tokenizer = None
+        self.load_seconds = None
+        # Warm-up thread and request threads may race to initialize
+        self._init_lock = threading.Lock()
         
     def _initialize_lazy(self):
         if self.initialized:
             return
 
+        with self._init_lock:
+            if self.initialized:
+                return
+            self._load()
+
+    def _load(self):
         print("Initializing AI Service (Lazy Loading)...")
+        start = time.perf_counter()
         try:
             import nltk
             # Ensure NLTK data is downloaded
@@ -41,8 +55,9 @@ class Summarizer:
             self.Stemmer = Stemmer
             self.get_stop_words = get_stop_words
             
+            self.load_seconds = time.perf_counter() - start
             self.initialized = True
-            print("AI Service Initialized Successfully.")
+            print(f"AI Service Initialized Successfully in {self.load_seconds:.1f}s.")
         except Exception as e:
             print(f"Error initializing AI Service: {e}")
             raise e
@@ -87,7 +102,8 @@ class ClaudeService:
             
         try:
             import anthropic
-            self.client = anthropic.Anthropic(api_key=self.api_key)
+            # Retries and timeouts come from the outbound layer
+            self.client = anthropic.Anthropic(api_key=self.api_key, max_retries=0)
             return True
         except ImportError:
             print("Anthropic SDK not installed. Using fallback summarizer.")
@@ -110,7 +126,8 @@ class ClaudeService:
                 f"Texto a resumir:\n{text}"
             )
 
-            message = self.client.messages.create(
+            message = CLAUDE.call(
+                self.client.messages.create,
                 model="claude-3-5-sonnet-20241022",
                 max_tokens=max_tokens,
                 temperature=0.7,
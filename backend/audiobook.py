@@ -0,0 +1,137 @@
+import os
+import struct
+import uuid
+
+# MPEG audio Layer III bitrates (kbps) by bitrate index, for MPEG-1 and MPEG-2/2.5
+BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+SAMPLE_RATES = {
+    1: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    2.5: (11025, 12000, 8000),
+}
+VERSIONS = {0b00: 2.5, 0b10: 2, 0b11: 1}
+
+# One CTOC frame can list at most 255 chapters
+MAX_CHAPTERS = 255
+
+
+def strip_tags(data):
+    """Returns only the MPEG frames of an MP3 file, without ID3v2/ID3v1 tags."""
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    if data[-128:-125] == b"TAG":
+        data = data[:-128]
+    return data
+
+
+def mp3_duration_ms(frames):
+    """Duration of MPEG Layer III audio, summed frame by frame (works for CBR and VBR)."""
+    position = 0
+    samples = 0.0
+    while position + 4 <= len(frames):
+        header = struct.unpack_from(">I", frames, position)[0]
+        version = VERSIONS.get((header >> 19) & 0b11)
+        layer = (header >> 17) & 0b11
+        bitrate_index = (header >> 12) & 0b1111
+        rate_index = (header >> 10) & 0b11
+        if (header >> 21) != 0x7FF or version is None or layer != 0b01 or bitrate_index in (0, 15) or rate_index == 3:
+            position += 1 # Not a frame header: resynchronize
+            continue
+        bitrate = BITRATES[1 if version == 1 else 2][bitrate_index] * 1000
+        sample_rate = SAMPLE_RATES[version][rate_index]
+        padding = (header >> 9) & 1
+        if version == 1:
+            length, frame_samples = 144 * bitrate // sample_rate + padding, 1152
+        else:
+            length, frame_samples = 72 * bitrate // sample_rate + padding, 576
+        samples += frame_samples / sample_rate
+        position += length
+    return int(samples * 1000)
+
+
+def _frame(frame_id, data):
+    # ID3v2.3 frame: id, plain 32-bit size, no flags
+    return frame_id.encode("ascii") + struct.pack(">I", len(data)) + b"\x00\x00" + data
+
+
+def _text_frame(frame_id, text):
+    return _frame(frame_id, b"\x01" + text.encode("utf-16"))
+
+
+def build_chapter_tag(title, chapters):
+    """ID3v2.3 tag with a title and chapter markers (CHAP frames listed by one CTOC).
+
+    `chapters` is a list of (title, start_ms, end_ms).
+    """
+    frames = _text_frame("TIT2", title)
+    chapters = chapters[:MAX_CHAPTERS]
+    element_ids = [f"ch{i}".encode("ascii") for i in range(len(chapters))]
+    # Top-level, ordered table of contents
+    toc = b"toc\x00" + bytes([0x03, len(chapters)]) + b"".join(eid + b"\x00" for eid in element_ids)
+    frames += _frame("CTOC", toc)
+    for eid, (chapter_title, start_ms, end_ms) in zip(element_ids, chapters):
+        # Byte offsets unused (0xFFFFFFFF): players seek by time
+        body = eid + b"\x00" + struct.pack(">IIII", start_ms, end_ms, 0xFFFFFFFF, 0xFFFFFFFF)
+        frames += _frame("CHAP", body + _text_frame("TIT2", chapter_title))
+
+    size = len(frames)
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x03\x00\x00" + syncsafe + frames
+
+
+def page_chapters(outline, total_pages):
+    """Chapter list as [(title, first_page)] from a PDF outline, or page groups if there is none."""
+    chapters = []
+    for level, title, page in outline:
+        if level == 1 and 1 <= page <= total_pages and (not chapters or page > chapters[-1][1]):
+            chapters.append((title.strip() or f"Página {page}", page))
+    if chapters:
+        if chapters[0][1] != 1:
+            chapters.insert(0, ("Inicio", 1))
+        return chapters[:MAX_CHAPTERS]
+
+    step = max(1, -(-total_pages // MAX_CHAPTERS))
+    return [(f"Página {page}", page) for page in range(1, total_pages + 1, step)]
+
+
+def write_audiobook(output_path, title, page_files, chapters):
+    """Concatenates per-page MP3 files into one MP3 with chapter markers.
+
+    `page_files` are the page audio files in page order (page 1 first);
+    `chapters` come from page_chapters(). Returns the duration in ms.
+    """
+    starts = []
+    total_ms = 0
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        # Audio goes to a temporary file first: the tag needs every page's duration
+        with open(tmp_path + ".frames", "wb") as out:
+            for path in page_files:
+                with open(path, "rb") as f:
+                    frames = strip_tags(f.read())
+                starts.append(total_ms)
+                total_ms += mp3_duration_ms(frames)
+                out.write(frames)
+
+        marks = []
+        for i, (chapter_title, page) in enumerate(chapters):
+            end_page = chapters[i + 1][1] if i + 1 < len(chapters) else None
+            start_ms = starts[page - 1]
+            end_ms = starts[end_page - 1] if end_page else total_ms
+            marks.append((chapter_title, start_ms, end_ms))
+
+        with open(tmp_path, "wb") as out, open(tmp_path + ".frames", "rb") as frames:
+            out.write(build_chapter_tag(title, marks))
+            while chunk := frames.read(1024 * 1024):
+                out.write(chunk)
+        os.replace(tmp_path, output_path)
+    finally:
+        for path in (tmp_path, tmp_path + ".frames"):
+            if os.path.exists(path):
+                os.remove(path)
+    return total_ms
@@ -0,0 +1,272 @@
+"""Component micro-benchmarks for the Amori backend, runnable offline.
+
+Generates synthetic PDFs (text-only, scanned-image and mixed) and times the
+hot paths one by one: PDF text extraction, page rendering, text cleaning,
+library/page storage, and the audio, translation and summary endpoints.
+edge-tts, GoogleTranslator, Anthropic and EasyOCR are replaced by the local
+stubs in offline_stubs.py, so no network or model download is needed.
+
+Usage:
+    python bench_components.py [--pages 10,100,1000] [--kinds text,scanned,mixed]
+                               [--runs 3] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+import offline_stubs
+from bench_startup import summarize
+
+WORDS = (
+    "el la de que y en un una los las por con para como sobre entre libro lectura página "
+    "capítulo historia tiempo noche ciudad camino palabra memoria silencio viento agua luz "
+    "sombra mundo vida casa puerta ventana calle río mar montaña voz mirada recuerdo"
+).split()
+
+
+def make_text(rng, words=350):
+    sentences = []
+    while sum(len(s.split()) for s in sentences) < words:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20)))
+        sentences.append(sentence.capitalize() + ".")
+    return " ".join(sentences)
+
+
+def make_pdf(path, kind, pages, seed=0):
+    """Writes a synthetic PDF: `text` pages, `scanned` pages (one image, no text layer) or `mixed`."""
+    import fitz
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    scan_xref = None
+    for n in range(pages):
+        page = doc.new_page(width=595, height=842)
+        page_kind = kind if kind != "mixed" else ("text" if n % 2 == 0 else "scanned")
+        if page_kind == "text":
+            page.insert_textbox(fitz.Rect(50, 50, 545, 792), make_text(rng), fontsize=10)
+            continue
+        if scan_xref is None:
+            # Rasterize one text page and reuse the image, like a scanned book with identical pages
+            source = fitz.open()
+            source.new_page(width=595, height=842).insert_textbox(fitz.Rect(50, 50, 545, 792), make_text(rng), fontsize=10)
+            scan = source[0].get_pixmap(dpi=150).tobytes("png")
+            scan_xref = page.insert_image(page.rect, stream=scan)
+        else:
+            page.insert_image(page.rect, xref=scan_xref)
+    doc.save(path, garbage=3, deflate=True)
+    return path
+
+
+def measure(fn, runs, setup=None):
+    samples = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def result(name, samples, **params):
+    entry = {"name": name, "params": params, "seconds": summarize(samples)}
+    per = params.get("pages") or params.get("items")
+    if per:
+        entry["per_item_ms"] = round(min(samples) / per * 1000, 4)
+    return entry
+
+
+def bench_pdf(pdf_processor, pdfs, runs):
+    results = []
+    for (kind, pages), path in pdfs.items():
+        samples = measure(lambda: pdf_processor.process_pdf(path), runs)
+        results.append(result("process_pdf", samples, kind=kind, pages=pages))
+
+        sample_pages = list(range(1, pages + 1))[:: max(1, pages // 10)][:10]
+        for fmt, width in (("png", None), ("webp", 1200)):
+            samples = measure(lambda: [pdf_processor.get_page_image(path, n, width=width, fmt=fmt) for n in sample_pages], runs)
+            results.append(result("get_page_image", samples, kind=kind, pages=len(sample_pages), format=fmt, width=width or "x2"))
+    return results
+
+
+def bench_clean_text(pdf_processor, runs):
+    rng = random.Random(1)
+    texts = [make_text(rng).replace(". ", ".\n") + "\n\n" for _ in range(200)]
+    samples = measure(lambda: [pdf_processor.clean_text(t) for t in texts], runs)
+    return [result("clean_text", samples, items=len(texts))]
+
+
+def bench_storage(tmp_dir, runs, documents=1000, pages=300):
+    from document_store import DocumentStore
+    from page_store import PageStore
+
+    results = []
+    rng = random.Random(2)
+    page_list = [{"page": n, "text": make_text(rng)} for n in range(1, pages + 1)]
+    counter = iter(range(10**9))
+
+    def write_library():
+        store = DocumentStore(os.path.join(tmp_dir, f"library-{next(counter)}.db"))
+        for i in range(documents):
+            store.create(f"doc-{i}", f"libro-{i}.pdf", f"uploads/doc-{i}.pdf", status="ready", total_pages=pages)
+
+    results.append(result("library_write", measure(write_library, runs), items=documents))
+
+    store = DocumentStore(os.path.join(tmp_dir, "library-read.db"))
+    for i in range(documents):
+        store.create(f"doc-{i}", f"libro-{i}.pdf", f"uploads/doc-{i}.pdf", status="ready", total_pages=pages)
+    results.append(result("library_read", measure(store.list_library, runs), items=documents))
+    results.append(result("library_progress_update", measure(
+        lambda: [store.update(f"doc-{i}", last_page=i % pages + 1) for i in range(100)], runs), items=100))
+
+    page_store = PageStore(os.path.join(tmp_dir, "pages"))
+    results.append(result("page_store_save", measure(lambda: page_store.save("doc", page_list), runs), pages=pages))
+    results.append(result("page_store_load", measure(lambda: page_store.load("doc"), runs), pages=pages))
+    results.append(result("page_store_load_page", measure(
+        lambda: [page_store.load_page("doc", n) for n in range(1, pages + 1)], runs), pages=pages))
+    return results
+
+
+def bench_endpoints(tmp_dir, pdf_path, pages, runs):
+    """Audio, translation and summary paths through the real FastAPI app, with stubbed services."""
+    # Every data path (database, page text, audio, library.json...) in tmp_dir, set before main is imported
+    data_dir = os.path.join(tmp_dir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    os.environ["AMORI_DATA_DIR"] = data_dir
+    os.environ.pop("AMORI_DB", None)
+    os.environ.setdefault("ANTHROPIC_API_KEY", "offline-stub")
+    import main
+    from fastapi.testclient import TestClient
+
+    assert main.page_store.root_dir.startswith(data_dir), "main was imported before its data dir was set"
+    client = TestClient(main.app)
+
+    rng = random.Random(3)
+    doc_id = "bench-doc"
+    page_list = [{"page": n, "text": make_text(rng)} for n in range(1, pages + 1)]
+    main.doc_store.create(doc_id, "bench.pdf", pdf_path, status="ready", total_pages=pages)
+    main.page_store.save(doc_id, page_list)
+
+    results = []
+    next_page = iter(range(1, 10**9))
+
+    def audio_miss():
+        page = (next(next_page) - 1) % pages + 1
+        path = main.audio_cache_path(doc_id, page, "es-AR-TomasNeural")
+        if os.path.exists(path):
+            os.remove(path)
+        assert client.get(f"/audio/{doc_id}/{page}").status_code == 200
+
+    results.append(result("audio_generate", measure(audio_miss, runs), items=1))
+    client.get(f"/audio/{doc_id}/1")
+    results.append(result("audio_cached", measure(lambda: client.get(f"/audio/{doc_id}/1"), runs), items=1))
+
+    results.append(result("translate_text", measure(
+        lambda: main.translate_text(page_list[0]["text"]), runs, setup=main._translate.cache_clear), items=1))
+    results.append(result("page_text_translated", measure(
+        lambda: client.get(f"/document/{doc_id}/page/1/text", params={"translate": True}), runs,
+        setup=main._translate.cache_clear), items=1))
+
+    def reset_summary():
+        main.doc_store.update(doc_id, summary=None)
+
+    results.append(result("generate_summary", measure(
+        lambda: client.post(f"/document/{doc_id}/summary"), runs, setup=reset_summary), pages=pages))
+    return results
+
+
+def environment(args, stubbed):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True,
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": args.runs,
+        "stubs": stubbed,
+        "stub_latency_ms": args.stub_latency_ms,
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {json.dumps([r["name"], r["params"]], sort_keys=True): r for r in json.load(f)["results"]}
+    print(f"{'benchmark':60s} {'baseline':>10s} {'current':>10s} {'ratio':>7s}")
+    for r in results:
+        key = json.dumps([r["name"], r["params"]], sort_keys=True)
+        if key not in baseline:
+            continue
+        old, new = baseline[key]["seconds"]["median"], r["seconds"]["median"]
+        label = r["name"] + " " + " ".join(f"{k}={v}" for k, v in r["params"].items())
+        print(f"{label[:60]:60s} {old:10.4f} {new:10.4f} {new / old if old else float('inf'):7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend components offline.")
+    parser.add_argument("--pages", default="10,100,1000", help="Comma-separated PDF sizes")
+    parser.add_argument("--kinds", default="text,scanned,mixed", help="Comma-separated PDF kinds")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0,
+                        help="Simulated latency of each stubbed remote call (TTS, translation, summary, OCR)")
+    parser.add_argument("--real-ocr", action="store_true", help="Use the installed EasyOCR instead of the stub")
+    parser.add_argument("--skip", default="", help="Comma-separated groups to skip: pdf,text,storage,endpoints")
+    parser.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", help="Print median ratios against an earlier JSON result file")
+    args = parser.parse_args()
+
+    latency = args.stub_latency_ms / 1000
+    stubbed = offline_stubs.install(
+        tts_latency=latency, translate_latency=latency, summary_latency=latency, ocr_latency=latency,
+        ocr=not args.real_ocr,
+    )
+
+    from services import PDFProcessor
+
+    sizes = [int(n) for n in args.pages.split(",") if n]
+    kinds = [k for k in args.kinds.split(",") if k]
+    skip = set(args.skip.split(","))
+    pdf_processor = PDFProcessor()
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix="amori-bench-") as tmp_dir:
+        pdfs = {
+            (kind, pages): make_pdf(os.path.join(tmp_dir, f"{kind}-{pages}.pdf"), kind, pages)
+            for kind in kinds for pages in sizes
+        }
+        if "pdf" not in skip:
+            results += bench_pdf(pdf_processor, pdfs, args.runs)
+        if "text" not in skip:
+            results += bench_clean_text(pdf_processor, args.runs)
+        if "storage" not in skip:
+            results += bench_storage(tmp_dir, args.runs)
+        if "endpoints" not in skip:
+            results += bench_endpoints(tmp_dir, next(iter(pdfs.values())), min(sizes), args.runs)
+
+    report = {"environment": environment(args, stubbed), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
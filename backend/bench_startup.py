@@ -0,0 +1,122 @@
+"""Startup benchmark for the Amori backend.
+
+Measures, in fresh interpreter processes:
+  * import time of `main` (module import plus library metadata load)
+  * time-to-first-request: from spawning uvicorn until GET /voices answers
+
+Both run against an empty library in a temp dir (AMORI_DATA_DIR), so the
+numbers don't depend on, or touch, the real database and library.json.
+
+Usage:
+    python bench_startup.py [--runs 5] [--json]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import main; "
+    "print('IMPORT_SECONDS', time.perf_counter() - start)"
+)
+
+HEAVY_MODULES = ["easyocr", "torch", "edge_tts", "deep_translator", "langdetect"]
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _server_env(data_dir):
+    env = dict(os.environ, AMORI_DATA_DIR=data_dir)
+    env.pop("AMORI_DB", None)
+    return env
+
+def measure_import(data_dir):
+    snippet = IMPORT_SNIPPET + "; import sys; print('HEAVY', ','.join(m for m in %r if m in sys.modules))" % (HEAVY_MODULES,)
+    result = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=BACKEND_DIR, env=_server_env(data_dir), capture_output=True, text=True, check=True,
+    )
+    seconds, heavy = None, []
+    for line in result.stdout.splitlines():
+        if line.startswith("IMPORT_SECONDS"):
+            seconds = float(line.split()[1])
+        elif line.startswith("HEAVY"):
+            heavy = [m for m in line[len("HEAVY"):].strip().split(",") if m]
+    return seconds, heavy
+
+def measure_first_request(data_dir, timeout=120):
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/voices"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=_server_env(data_dir), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn exited before serving a request")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"No response from {url} after {timeout}s")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def summarize(samples):
+    return {
+        "min": round(min(samples), 4),
+        "median": round(statistics.median(samples), 4),
+        "max": round(max(samples), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure backend import time and time-to-first-request.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    import_samples, first_request_samples = [], []
+    heavy_loaded = []
+    with tempfile.TemporaryDirectory(prefix="amori-bench-") as data_dir:
+        for _ in range(args.runs):
+            seconds, heavy_loaded = measure_import(data_dir)
+            import_samples.append(seconds)
+            first_request_samples.append(measure_first_request(data_dir))
+
+    results = {
+        "runs": args.runs,
+        "import_seconds": summarize(import_samples),
+        "first_request_seconds": summarize(first_request_samples),
+        "heavy_modules_loaded_at_import": heavy_loaded,
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Runs: {args.runs}")
+    for key in ("import_seconds", "first_request_seconds"):
+        r = results[key]
+        print(f"{key:24s} min {r['min']:.3f}s  median {r['median']:.3f}s  max {r['max']:.3f}s")
+    print(f"Heavy modules loaded at import: {', '.join(heavy_loaded) or 'none'}")
+
+if __name__ == "__main__":
+    main()
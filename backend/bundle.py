@@ -0,0 +1,75 @@
+import io
+import shutil
+import tarfile
+import time
+import zipfile
+
+ARCHIVE_MEDIA_TYPES = {
+    "zip": "application/zip",
+    "tar": "application/x-tar",
+}
+
+
+class _Sink:
+    """Write-only file object that hands out what was written so far (no tell/seek)."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ArchiveStream:
+    """Builds a zip or tar archive incrementally, without holding it in memory.
+
+    Add members, then call drain() to get the bytes produced since the last
+    call and send them on. Zip members are written with data descriptors, so
+    the output never has to be seeked back into.
+    """
+
+    def __init__(self, fmt="zip"):
+        if fmt not in ARCHIVE_MEDIA_TYPES:
+            raise ValueError(f"Unsupported archive format: {fmt}")
+        self.fmt = fmt
+        self._sink = _Sink()
+        if fmt == "zip":
+            self._archive = zipfile.ZipFile(self._sink, "w")
+        else:
+            self._archive = tarfile.open(fileobj=self._sink, mode="w|")
+
+    def add_bytes(self, name, data, compress=True):
+        """Adds a member; pass compress=False for data that is already compressed (images, audio)."""
+        if self.fmt == "zip":
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            self._archive.writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self._archive.addfile(info, io.BytesIO(data))
+
+    def add_file(self, name, path, compress=False):
+        if self.fmt == "zip":
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            with open(path, "rb") as src, self._archive.open(info, "w") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        else:
+            self._archive.add(path, arcname=name)
+
+    def close(self):
+        self._archive.close()
+
+    def drain(self):
+        return self._sink.take()
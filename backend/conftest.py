@@ -0,0 +1,52 @@
+"""Keeps the tests away from the real library.
+
+main opens its database and page store, and imports library.json, as soon as
+it is imported, so AMORI_DATA_DIR has to point at a temp dir before any test
+module gets there. pytest loads this file first.
+"""
+import os
+import shutil
+import tempfile
+import uuid
+
+import pytest
+
+DATA_DIR = tempfile.mkdtemp(prefix="amori-tests-")
+os.environ["AMORI_DATA_DIR"] = DATA_DIR
+os.environ.pop("AMORI_DB", None)
+
+def pytest_unconfigure(config):
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+@pytest.fixture
+def make_document(tmp_path):
+    """Adds ready documents with a PDF of `pages` pages ("Página N") to main's stores.
+
+    They are deleted afterwards, with any audio cached for them.
+    """
+    import fitz
+    from fastapi.testclient import TestClient
+    import main
+
+    created = []
+
+    def make(pages=2):
+        doc_id = str(uuid.uuid4())
+        pdf = fitz.open()
+        for i in range(pages):
+            pdf.new_page().insert_text((72, 72), f"Página {i + 1}")
+        pdf_path = str(tmp_path / f"{doc_id}.pdf")
+        pdf.save(pdf_path)
+        main.doc_store.create(doc_id, f"{doc_id}.pdf", pdf_path, status="ready", total_pages=pages)
+        main.page_store.save(doc_id, [{"page": n, "text": f"Página {n}"} for n in range(1, pages + 1)])
+        created.append(doc_id)
+        return doc_id
+
+    yield make
+
+    client = TestClient(main.app)
+    for doc_id in created:
+        client.delete(f"/library/{doc_id}") # 404 if the test already did
+        for name in os.listdir(main.AUDIO_DIR):
+            if name.startswith(f"{doc_id}_"):
+                os.remove(os.path.join(main.AUDIO_DIR, name))
@@ -1,35 +1,16 @@
-import json
-import os
+"""Removes duplicate documents (same PDF content) from the library.
 
-LIBRARY_FILE = "library.json"
+Kept so old instructions still work: it runs the duplicates step of
+maintenance.py. Unlike the old script, that step only reports what it would
+do unless run with --apply. --json prints the report as JSON.
+"""
+import sys
 
-def deduplicate():
-    if not os.path.exists(LIBRARY_FILE):
-        print("Library file not found.")
-        return
-
-    with open(LIBRARY_FILE, "r", encoding="utf-8") as f:
-        library = json.load(f)
-
-    seen_filenames = set()
-    unique_library = []
-    
-    print(f"Original count: {len(library)}")
-
-    for book in library:
-        filename = book.get("filename")
-        if filename and filename not in seen_filenames:
-            unique_library.append(book)
-            seen_filenames.add(filename)
-        else:
-            print(f"Removing duplicate: {filename} ({book.get('doc_id')})")
-
-    print(f"New count: {len(unique_library)}")
-
-    with open(LIBRARY_FILE, "w", encoding="utf-8") as f:
-        json.dump(unique_library, f, indent=4)
-        
-    print("Library deduplicated.")
+from maintenance import main
 
 if __name__ == "__main__":
-    deduplicate()
+    args = sys.argv[1:]
+    if "--apply" not in args:
+        # On stderr, so --json output stays parseable
+        print("Note: duplicates are no longer removed by default; run with --apply to remove them.", file=sys.stderr)
+    main(["--only", "duplicates", *args])
@@ -0,0 +1,239 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    total_pages INTEGER NOT NULL DEFAULT 0,
+    last_page INTEGER NOT NULL DEFAULT 1,
+    summary TEXT,
+    content_hash TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_filename ON documents (filename);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS tombstones (
+    doc_id TEXT PRIMARY KEY,
+    change_seq INTEGER NOT NULL,
+    deleted_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tombstones_change_seq ON tombstones (change_seq);
+"""
+
+# Columns added after the first release, created on existing databases at startup
+ADDED_COLUMNS = {
+    "content_hash": "TEXT",
+    "change_seq": "INTEGER",
+    # Comma-separated OCR languages, given at upload or detected during ingestion
+    "ocr_languages": "TEXT",
+}
+
+# Fields returned by /library, in the order library.json used to have them
+LIBRARY_FIELDS = ("doc_id", "filename", "path", "total_pages", "last_page", "summary")
+
+UPDATABLE_FIELDS = {
+    "filename", "path", "status", "error", "total_pages", "last_page", "summary", "content_hash", "ocr_languages",
+}
+
+
+def worker_id():
+    """Identifies this worker process on this host."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class DocumentStore:
+    """Document metadata and processing status shared by all worker processes.
+
+    Backed by a SQLite database in WAL mode, so several uvicorn/gunicorn
+    workers on one host see the same library. Processing is claimed through
+    the job queue in the same database (see job_queue.py).
+
+    Every write stamps the document with the next value of a library-wide
+    change sequence, and deletions leave a tombstone, so clients can ask
+    for what changed since the sequence they last saw (see changes()).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            self._add_missing_columns(conn)
+            conn.execute("CREATE INDEX IF NOT EXISTS documents_change_seq ON documents (change_seq)")
+
+    @staticmethod
+    def _add_missing_columns(conn):
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(documents)")}
+        for name, declaration in ADDED_COLUMNS.items():
+            if name not in columns:
+                try:
+                    conn.execute(f"ALTER TABLE documents ADD COLUMN {name} {declaration}")
+                except sqlite3.OperationalError:
+                    pass # Another worker added it first
+
+    def _connect(self):
+        # One connection per thread: sqlite3 connections are not shareable
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _next_seq(conn):
+        # Runs inside the caller's write transaction, so sequence numbers are unique across workers
+        return conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('change_seq', 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1 RETURNING value"
+        ).fetchone()[0]
+
+    def current_seq(self):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'change_seq'").fetchone()
+        return int(row[0]) if row else 0
+
+    def get(self, doc_id):
+        row = self._connect().execute(
+            "SELECT * FROM documents WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def find_by_filename(self, filename):
+        row = self._connect().execute(
+            "SELECT * FROM documents WHERE filename = ? ORDER BY created_at LIMIT 1", (filename,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def list_library(self):
+        """Ready documents in upload order, shaped like the old library.json entries."""
+        rows = self._connect().execute(
+            "SELECT * FROM documents WHERE status = 'ready' ORDER BY created_at, rowid"
+        ).fetchall()
+        return [self._library_entry(row) for row in rows]
+
+    @staticmethod
+    def _library_entry(row):
+        book = {field: row[field] for field in LIBRARY_FIELDS}
+        if book["summary"] is None:
+            del book["summary"]
+        return book
+
+    def changes(self, since):
+        """Library changes after sequence `since`.
+
+        Returns {seq, reset, changes, deleted}: `changes` are library entries
+        (as in list_library) written after `since`, `deleted` the ids removed
+        since then. `reset` means the client must replace its whole copy:
+        on a first sync (since=0) or when `since` is ahead of this database.
+        """
+        seq = self.current_seq()
+        if since <= 0 or since > seq:
+            return {"seq": seq, "reset": True, "changes": self.list_library(), "deleted": []}
+
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT * FROM documents WHERE change_seq > ? AND status = 'ready' ORDER BY change_seq",
+            (since,),
+        ).fetchall()
+        deleted = conn.execute(
+            "SELECT doc_id FROM tombstones WHERE change_seq > ? ORDER BY change_seq", (since,)
+        ).fetchall()
+        return {
+            "seq": seq,
+            "reset": False,
+            "changes": [self._library_entry(row) for row in rows],
+            "deleted": [row["doc_id"] for row in deleted],
+        }
+
+    def list_by_status(self, status):
+        rows = self._connect().execute(
+            "SELECT * FROM documents WHERE status = ? ORDER BY created_at", (status,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_all(self):
+        rows = self._connect().execute("SELECT * FROM documents ORDER BY created_at, rowid").fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def create(self, doc_id, filename, path, status="processing", total_pages=0, last_page=1, summary=None, content_hash=None, ocr_languages=None):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO documents (doc_id, filename, path, status, total_pages, last_page, summary, content_hash, ocr_languages, change_seq, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (doc_id, filename, path, status, total_pages, last_page, summary, content_hash, ocr_languages, self._next_seq(conn), now, now),
+            )
+            conn.execute("DELETE FROM tombstones WHERE doc_id = ?", (doc_id,))
+
+    def update(self, doc_id, **fields):
+        unknown = set(fields) - UPDATABLE_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown document fields: {', '.join(sorted(unknown))}")
+        if not fields:
+            return False
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE documents SET {assignments}, change_seq = ?, updated_at = ? WHERE doc_id = ?",
+                (*fields.values(), self._next_seq(conn), time.time(), doc_id),
+            )
+        return cursor.rowcount > 0
+
+    def delete(self, doc_id):
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+            if cursor.rowcount == 0:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO tombstones (doc_id, change_seq, deleted_at) VALUES (?, ?, ?)",
+                (doc_id, self._next_seq(conn), time.time()),
+            )
+        return True
+
+    def library_imported(self, key="library_json_imported"):
+        return self._connect().execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone() is not None
+
+    def import_library(self, library, key="library_json_imported"):
+        """One-time import of library.json entries; safe if several workers race.
+
+        Returns the ids of the documents inserted (none once imported).
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return []
+            now = time.time()
+            imported = []
+            for i, book in enumerate(library):
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO documents (doc_id, filename, path, status, total_pages, last_page, summary, created_at, updated_at) "
+                    "VALUES (?, ?, ?, 'ready', ?, ?, ?, ?, ?)",
+                    (
+                        book["doc_id"], book["filename"], book["path"],
+                        book.get("total_pages", len(book.get("pages", []))),
+                        book.get("last_page", 1), book.get("summary"),
+                        # Keep library order stable
+                        now + i * 1e-6, now,
+                    ),
+                )
+                if cursor.rowcount:
+                    imported.append(book["doc_id"])
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, str(now)))
+        return imported
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    doc_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_doc ON events (doc_id, seq);
+"""
+
+
+def format_sse(event):
+    """Serializes an event dict as one Server-Sent Events message."""
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+
+class EventLog:
+    """Per-document event log shared by all worker processes.
+
+    Events are appended to the shared SQLite database, so a client connected
+    to any worker sees events published by any other. Listeners in the
+    publishing process are woken immediately; other processes pick events
+    up on their next poll.
+    """
+
+    def __init__(self, db_path, retention=3600.0):
+        self.db_path = db_path
+        self.retention = retention
+        self._local = threading.local()
+        self._subscribers = set()  # (loop, asyncio.Event)
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def publish(self, doc_id, event_type, data):
+        now = time.time()
+        payload = dict(data, doc_id=doc_id)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO events (doc_id, type, data, created_at) VALUES (?, ?, ?, ?)",
+                (doc_id, event_type, json.dumps(payload, ensure_ascii=False), now),
+            )
+        # Old events are only needed by clients reconnecting shortly after
+        if now - self._last_prune > 60:
+            self.prune(now)
+        self._wake_subscribers()
+
+    def prune(self, now=None):
+        """Deletes events older than the retention period. Returns the count."""
+        now = time.time() if now is None else now
+        self._last_prune = now
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM events WHERE created_at < ?", (now - self.retention,))
+        return cursor.rowcount
+
+    def since(self, doc_id, seq, limit=500):
+        rows = self._connect().execute(
+            "SELECT seq, type, data FROM events WHERE doc_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (doc_id, seq, limit),
+        ).fetchall()
+        return [{"seq": row["seq"], "type": row["type"], "data": json.loads(row["data"])} for row in rows]
+
+    def last_seq(self):
+        row = self._connect().execute("SELECT MAX(seq) FROM events").fetchone()
+        return row[0] or 0
+
+    def _wake_subscribers(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, event in subscribers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass # Loop already closed
+
+    async def stream(self, doc_id, last_seq, poll_interval=1.0, keepalive=15.0):
+        """Yields SSE-formatted messages for doc_id forever, starting after last_seq."""
+        wakeup = asyncio.Event()
+        subscriber = (asyncio.get_running_loop(), wakeup)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            idle = 0.0
+            while True:
+                # Cleared before querying so an event published meanwhile still wakes us
+                wakeup.clear()
+                events = await asyncio.to_thread(self.since, doc_id, last_seq)
+                for event in events:
+                    last_seq = event["seq"]
+                    yield format_sse(event)
+                if events:
+                    idle = 0.0
+                    continue
+
+                if idle >= keepalive:
+                    idle = 0.0
+                    yield ": keepalive\n\n"
+
+                started = time.monotonic()
+                try:
+                    # Woken at once for events from this process; polled for other workers
+                    await asyncio.wait_for(wakeup.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                idle += time.monotonic() - started
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
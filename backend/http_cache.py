@@ -0,0 +1,120 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi.responses import Response
+
+# Page images and audio never change for a given URL, so clients may keep them forever
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def make_etag(*parts):
+    """Strong ETag built from the parts that determine a response's content."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(request, etag):
+    """True if the request's If-None-Match covers etag (weak comparison, as RFC 9110 requires)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def not_modified(etag, cache_control=IMMUTABLE):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class FileHashCache:
+    """Content hashes of files, reused while the file's size and mtime are unchanged."""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # path -> (size, mtime_ns, hash)
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                self._entries.move_to_end(path)
+                return entry[2]
+
+        digest = hash_file(path)
+        with self._lock:
+            self._entries[path] = (stat.st_size, stat.st_mtime_ns, digest)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return digest
+
+
+IMAGE_MEDIA_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+
+def negotiate_image_format(request, fmt=None):
+    """Picks the page image format: explicit ?format= wins, else WebP if the client accepts it.
+
+    Returns (format, negotiated); negotiated responses must carry `Vary: Accept`.
+    """
+    if fmt:
+        fmt = fmt.lower()
+        if fmt == "jpg":
+            fmt = "jpeg"
+        if fmt not in IMAGE_MEDIA_TYPES:
+            raise ValueError(f"Unsupported image format: {fmt}")
+        return fmt, False
+    if "image/webp" in request.headers.get("accept", ""):
+        return "webp", True
+    return "png", True
+
+
+def negotiate_encoding(accept_encoding, available):
+    """Picks the content coding for a response from the client's Accept-Encoding.
+
+    `available` lists the codings we can send, most preferred first; returns
+    one of them, or None for the uncompressed response.
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
@@ -0,0 +1,328 @@
+import json
+import sqlite3
+import threading
+import time
+import traceback
+
+from document_store import worker_id
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    doc_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    total_pages INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    claimed_by TEXT,
+    heartbeat REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority, created_at);
+CREATE INDEX IF NOT EXISTS jobs_doc ON jobs (doc_id);
+CREATE TABLE IF NOT EXISTS job_pages (
+    job_id INTEGER NOT NULL,
+    page INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (job_id, page)
+);
+"""
+
+GIVE_UP_ERROR = "Worker stopped repeatedly while running this job"
+
+# Columns added after the first release, created on existing databases at startup
+ADDED_COLUMNS = {
+    "payload": "TEXT",
+}
+
+
+class JobQueue:
+    """Durable job queue stored in the shared SQLite database.
+
+    Jobs survive restarts: a job whose worker stops sending heartbeats is
+    put back in the queue, and page results are checkpointed as they are
+    produced so a resumed job continues where it stopped. Lower priority
+    values run first.
+    """
+
+    def __init__(self, db_path, stale_after=30.0, max_attempts=3):
+        self.db_path = db_path
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            self._add_missing_columns(conn)
+
+    @staticmethod
+    def _add_missing_columns(conn):
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for name, declaration in ADDED_COLUMNS.items():
+            if name not in columns:
+                try:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {declaration}")
+                except sqlite3.OperationalError:
+                    pass # Another worker added it first
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, doc_id, kind, priority=0, total_pages=0, payload=None):
+        """Adds a job; `payload` is an optional JSON-serializable dict of job options."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (doc_id, kind, priority, status, total_pages, payload, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (doc_id, kind, priority, total_pages, json.dumps(payload) if payload is not None else None, now, now),
+            )
+        return cursor.lastrowid
+
+    @staticmethod
+    def _job(row):
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"]) if job.get("payload") else None
+        return job
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def active_job(self, doc_id, kind, payload=None):
+        """Latest queued or running job of this kind for doc_id (with this exact payload, if given)."""
+        sql = "SELECT * FROM jobs WHERE doc_id = ? AND kind = ? AND status IN ('queued', 'running')"
+        params = [doc_id, kind]
+        if payload is not None:
+            sql += " AND payload = ?"
+            params.append(json.dumps(payload))
+        row = self._connect().execute(sql + " ORDER BY job_id DESC LIMIT 1", params).fetchone()
+        return self._job(row) if row else None
+
+    def claim_next(self, owner, max_running, kinds=None):
+        """Claims the highest-priority queued job unless max_running jobs are already running.
+
+        With `kinds`, only jobs of those kinds are claimed and counted, so
+        each group of kinds gets its own limit. The running count is global
+        across worker processes, which gives host-wide admission control.
+        """
+        kind_filter, params = "", []
+        if kinds is not None:
+            kind_filter = f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params = list(kinds)
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            running = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'running'" + kind_filter, params
+            ).fetchone()[0]
+            if running >= max_running:
+                return None
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued'" + kind_filter
+                + " ORDER BY priority, created_at, job_id LIMIT 1", params
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', claimed_by = ?, heartbeat = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                (owner, now, now, row["job_id"]),
+            )
+        job = self._job(row)
+        job.update(status="running", claimed_by=owner, attempts=row["attempts"] + 1)
+        return job
+
+    def heartbeat(self, owner):
+        """Refreshes every running job owned by this worker."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE claimed_by = ? AND status = 'running'",
+                (time.time(), owner),
+            )
+
+    def requeue_stale(self, on_give_up=None):
+        """Puts back jobs whose worker died; gives up after max_attempts. Returns requeued ids.
+
+        on_give_up(job, error) is called for each job given up, once the
+        change is committed (only in the worker that gave it up).
+        """
+        cutoff = time.time() - self.stale_after
+        conn = self._connect()
+        given_up = []
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'running' AND heartbeat < ?", (cutoff,)
+            ).fetchall()
+            requeued = []
+            for row in rows:
+                if row["attempts"] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'error', error = ?, updated_at = ? WHERE job_id = ?",
+                        (GIVE_UP_ERROR, time.time(), row["job_id"]),
+                    )
+                    given_up.append(self._job(row))
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', claimed_by = NULL, updated_at = ? WHERE job_id = ?",
+                        (time.time(), row["job_id"]),
+                    )
+                    requeued.append(row["job_id"])
+        if on_give_up is not None:
+            for job in given_up:
+                on_give_up(job, GIVE_UP_ERROR)
+        return requeued
+
+    def save_page(self, job_id, page, text):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_pages (job_id, page, text) VALUES (?, ?, ?)",
+                (job_id, page, text),
+            )
+
+    def checkpoint(self, job_id):
+        """Pages already produced by earlier attempts, as {page: text}."""
+        rows = self._connect().execute(
+            "SELECT page, text FROM job_pages WHERE job_id = ?", (job_id,)
+        ).fetchall()
+        return {row["page"]: row["text"] for row in rows}
+
+    def pages_done(self, job_id):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM job_pages WHERE job_id = ?", (job_id,)
+        ).fetchone()[0]
+
+    def complete(self, job_id):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', updated_at = ? WHERE job_id = ?", (time.time(), job_id)
+            )
+            conn.execute("DELETE FROM job_pages WHERE job_id = ?", (job_id,))
+
+    def fail(self, job_id, error):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'error', error = ?, updated_at = ? WHERE job_id = ?",
+                (error, time.time(), job_id),
+            )
+            conn.execute("DELETE FROM job_pages WHERE job_id = ?", (job_id,))
+
+    def cancel_document(self, doc_id):
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM job_pages WHERE job_id IN (SELECT job_id FROM jobs WHERE doc_id = ?)", (doc_id,)
+            )
+            conn.execute("DELETE FROM jobs WHERE doc_id = ?", (doc_id,))
+
+    def document_ids(self):
+        rows = self._connect().execute("SELECT DISTINCT doc_id FROM jobs").fetchall()
+        return {row["doc_id"] for row in rows}
+
+    def prune(self, older_than):
+        """Deletes finished and failed jobs last updated more than `older_than` seconds ago. Returns the count."""
+        cutoff = time.time() - older_than
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM job_pages WHERE job_id IN "
+                "(SELECT job_id FROM jobs WHERE status IN ('done', 'error') AND updated_at < ?)", (cutoff,)
+            )
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'error') AND updated_at < ?", (cutoff,)
+            )
+        return cursor.rowcount
+
+    def stats(self):
+        rows = self._connect().execute(
+            "SELECT kind, status, COUNT(*) AS n FROM jobs GROUP BY kind, status"
+        ).fetchall()
+        stats = {}
+        for row in rows:
+            stats.setdefault(row["kind"], {})[row["status"]] = row["n"]
+        return stats
+
+
+class JobWorkerPool:
+    """Threads in this process that pull jobs from the shared queue.
+
+    `handlers` maps a job kind to a callable taking the job dict. A handler
+    that raises marks the job as failed. A pool only claims the kinds it has
+    handlers for, and `concurrency` limits how many of those run at once
+    across all processes: separate pools keep slow kinds from holding the
+    slots of others.
+    """
+
+    def __init__(self, queue, handlers, concurrency=2, poll_interval=1.0, name="jobs", on_give_up=None):
+        self.queue = queue
+        # Called with (job, error) for jobs given up after their worker died too often
+        self.on_give_up = on_give_up
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = name
+        self.owner = worker_id()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for n in range(self.concurrency):
+                thread = threading.Thread(target=self._run, name=f"amori-{self.name}-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            beat = threading.Thread(target=self._heartbeat, name=f"amori-{self.name}-heartbeat", daemon=True)
+            beat.start()
+            self._threads.append(beat)
+
+    def notify(self):
+        """Wakes idle workers, e.g. right after a job is enqueued."""
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.queue.stale_after / 3):
+            try:
+                self.queue.heartbeat(self.owner)
+            except sqlite3.Error as e:
+                print(f"Job heartbeat failed: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.queue.requeue_stale(self.on_give_up)
+                job = self.queue.claim_next(self.owner, self.concurrency, kinds=list(self.handlers))
+            except sqlite3.Error as e:
+                print(f"Job queue error: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            handler = self.handlers.get(job["kind"])
+            try:
+                if handler is None:
+                    raise ValueError(f"No handler for job kind {job['kind']!r}")
+                handler(job)
+                self.queue.complete(job["job_id"])
+            except Exception as e:
+                traceback.print_exc()
+                self.queue.fail(job["job_id"], str(e))
@@ -0,0 +1,369 @@
+"""End-to-end load test: simulated readers against a running Amori backend.
+
+Each virtual reader replays a reading session the way the frontend drives it:
+library sync, sometimes an upload followed by status polling until the book
+is ready, the FlipBook image burst when a book opens, then page turns with
+audio for the current page, the next-page audio prefetch and a progress post.
+The number of readers is stepped up (--readers 1,5,10,25) and every step
+reports throughput, p50/p95/p99 latency per route and the server's event
+loop lag (from amori_event_loop_lag_seconds in /metrics).
+
+Without --url the backend is started locally in a temporary data directory
+with edge-tts, Google Translate, Anthropic and EasyOCR replaced by the stubs
+in offline_stubs.py, so results measure this server, not the remote services
+(add --stub-latency-ms to model them).
+
+Usage:
+    python loadtest.py [--readers 1,5,10,25] [--duration 30] [--output results.json]
+    python loadtest.py --url http://localhost:8000 --readers 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+# Parallel connections a browser opens per origin: the FlipBook burst runs at this width
+BROWSER_CONNECTIONS = 6
+LAG_METRIC = "amori_event_loop_lag_seconds"
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Latencies and errors per route label for one load step."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, route, seconds, ok):
+        self.latencies.setdefault(route, []).append(seconds)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def report(self, elapsed):
+        routes = {}
+        for route, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            routes[route] = {
+                "requests": len(values),
+                "errors": self.errors.get(route, 0),
+                "rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+            }
+        total = sum(r["requests"] for r in routes.values())
+        return {
+            "requests": total,
+            "errors": sum(self.errors.values()),
+            "rps": round(total / elapsed, 2),
+            "routes": routes,
+        }
+
+
+async def timed(client, recorder, route, method, url, **kwargs):
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        await response.aread()
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        response, ok = None, False
+    recorder.add(route, time.perf_counter() - started, ok)
+    return response
+
+
+def pdf_bytes(pages, kind, seed):
+    from bench_components import make_pdf
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = make_pdf(os.path.join(tmp_dir, "book.pdf"), kind, pages, seed=seed)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+async def upload_and_wait(client, recorder, pdf, filename, poll_interval=0.5, timeout=600):
+    """Uploads a book and polls its status like the frontend does; returns (doc_id, total_pages)."""
+    response = await timed(
+        client, recorder, "POST /upload", "POST", "/upload",
+        files={"file": (filename, pdf, "application/pdf")},
+    )
+    if response is None or response.status_code != 200:
+        return None, 0
+    doc_id = response.json()["doc_id"]
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = await timed(client, recorder, "GET /document/{id}/status", "GET", f"/document/{doc_id}/status")
+        if response is not None and response.status_code == 200:
+            status = response.json()
+            if status["status"] == "ready":
+                return doc_id, status["total_pages"]
+            if status["status"] == "error":
+                return None, 0
+        await asyncio.sleep(poll_interval)
+    return None, 0
+
+
+async def reader_session(client, recorder, books, args, rng, pdf, stop_at):
+    """One reader, looping over sessions until the step ends."""
+    while time.monotonic() < stop_at:
+        await timed(client, recorder, "GET /library/changes", "GET", "/library/changes", params={"since": 0})
+
+        if rng.random() < args.upload_ratio:
+            doc_id, total_pages = await upload_and_wait(client, recorder, pdf, f"loadtest-{rng.getrandbits(64):x}.pdf")
+            if doc_id is None:
+                continue
+        else:
+            doc_id, total_pages = rng.choice(books)
+
+        # Opening the book: status, then FlipBook requests every page image at once
+        await timed(client, recorder, "GET /document/{id}/status", "GET", f"/document/{doc_id}/status")
+        burst = asyncio.Semaphore(BROWSER_CONNECTIONS)
+
+        async def image(page):
+            async with burst:
+                await timed(
+                    client, recorder, "GET /document/{id}/image/{n}", "GET",
+                    f"/document/{doc_id}/image/{page}", params={"width": args.image_width},
+                )
+
+        await asyncio.gather(*(image(page) for page in range(1, min(total_pages, args.burst_pages) + 1)))
+
+        # Reading: audio of the current page, low-priority prefetch of the next, progress on every turn
+        page = rng.randint(1, total_pages)
+        for _ in range(args.turns):
+            if time.monotonic() >= stop_at:
+                return
+            requests = [timed(
+                client, recorder, "GET /audio/{id}/{n}", "GET", f"/audio/{doc_id}/{page}", params={"voice": args.voice},
+            )]
+            if page < total_pages:
+                requests.append(timed(
+                    client, recorder, "GET /audio/{id}/{n} (prefetch)", "GET", f"/audio/{doc_id}/{page + 1}",
+                    params={"voice": args.voice},
+                ))
+            requests.append(timed(
+                client, recorder, "POST /document/{id}/progress", "POST", f"/document/{doc_id}/progress",
+                json={"page": page},
+            ))
+            await asyncio.gather(*requests)
+            await asyncio.sleep(rng.expovariate(1000 / args.think_ms) if args.think_ms else 0)
+            page = page % total_pages + 1
+
+
+def parse_lag(metrics_text):
+    """Bucket counts, sum and count of the event loop lag histogram from /metrics text."""
+    buckets, total, count = {}, 0.0, 0
+    for line in metrics_text.splitlines():
+        if not line.startswith(LAG_METRIC):
+            continue
+        name, value = line.rsplit(" ", 1)
+        if name.startswith(LAG_METRIC + "_bucket"):
+            buckets[re.search(r'le="([^"]+)"', name).group(1)] = float(value)
+        elif name == LAG_METRIC + "_sum":
+            total = float(value)
+        elif name == LAG_METRIC + "_count":
+            count = float(value)
+    return buckets, total, count
+
+
+def lag_report(before, after):
+    """Lag during one step, from the difference of two histogram snapshots.
+
+    Percentiles are bucket upper bounds: "p99_ms": 25 means 99% of wake-ups were
+    at most 25 ms late.
+    """
+    (b0, s0, c0), (b1, s1, c1) = before, after
+    count = c1 - c0
+    if count <= 0:
+        return None
+    report = {"samples": int(count), "mean_ms": round((s1 - s0) / count * 1000, 2)}
+    bounds = sorted(b1, key=lambda le: float("inf") if le == "+Inf" else float(le))
+    for name, q in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+        for le in bounds:
+            if b1[le] - b0.get(le, 0) >= q * count:
+                report[name] = None if le == "+Inf" else float(le) * 1000
+                break
+    return report
+
+
+async def scrape_lag(client):
+    try:
+        response = await client.get("/metrics")
+        return parse_lag(response.text) if response.status_code == 200 else None
+    except httpx.HTTPError:
+        return None
+
+
+async def run_step(base_url, readers, books, args, pdf):
+    limits = httpx.Limits(max_connections=readers * BROWSER_CONNECTIONS, max_keepalive_connections=readers * BROWSER_CONNECTIONS)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        lag_before = await scrape_lag(client)
+        recorder = Recorder()
+        started = time.monotonic()
+        stop_at = started + args.duration
+        await asyncio.gather(*(
+            reader_session(client, recorder, books, args, random.Random(args.seed + i), pdf, stop_at)
+            for i in range(readers)
+        ))
+        elapsed = time.monotonic() - started
+        lag_after = await scrape_lag(client)
+
+    step = {"readers": readers, "seconds": round(elapsed, 1)}
+    step.update(recorder.report(elapsed))
+    step["event_loop_lag"] = lag_report(lag_before, lag_after) if lag_before and lag_after else None
+    return step
+
+
+async def prepare_books(base_url, args):
+    """Uploads the shared books every reader picks from, once, before the first step."""
+    recorder = Recorder()
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+        books = []
+        for i in range(args.books):
+            pdf = pdf_bytes(args.pages, args.pdf_kind, seed=i)
+            doc_id, total_pages = await upload_and_wait(client, recorder, pdf, f"loadtest-book-{i}-{args.pages}-{args.pdf_kind}.pdf")
+            if doc_id is None:
+                raise RuntimeError(f"Book {i} failed to process")
+            books.append((doc_id, total_pages))
+    return books
+
+
+def print_step(step):
+    lag = step["event_loop_lag"] or {}
+    print(f"\n== {step['readers']} readers: {step['rps']} req/s, {step['errors']} errors, "
+          f"event loop lag mean {lag.get('mean_ms', '-')} ms p99 <= {lag.get('p99_ms', '-')} ms")
+    print(f"  {'route':36s} {'reqs':>6s} {'err':>5s} {'rps':>7s} {'p50':>8s} {'p95':>8s} {'p99':>8s}")
+    for route, r in step["routes"].items():
+        print(f"  {route:36s} {r['requests']:6d} {r['errors']:5d} {r['rps']:7.2f} "
+              f"{r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['p99_ms']:8.1f}")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(data_dir, args):
+    port = free_port()
+    # Every data path (database, page text, uploads, library.json...) under data_dir
+    env = dict(os.environ, AMORI_DATA_DIR=data_dir)
+    env.pop("AMORI_DB", None)
+    log = open(os.path.join(data_dir, "server.log"), "wb")
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port), "--data-dir", data_dir,
+         "--stub-latency-ms", str(args.stub_latency_ms)],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited; see {log.name}")
+        try:
+            if httpx.get(base_url + "/ready", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server did not start; see {log.name}")
+
+
+def serve(args):
+    """Runs the app with stubbed remote services and all data under --data-dir."""
+    import offline_stubs
+
+    latency = args.stub_latency_ms / 1000
+    offline_stubs.install(tts_latency=latency, translate_latency=latency, summary_latency=latency, ocr_latency=latency)
+
+    # Before main is imported: it creates its stores and imports library.json on import
+    os.environ["AMORI_DATA_DIR"] = args.data_dir
+    os.environ.pop("AMORI_DB", None)
+    import uvicorn
+    import main
+
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the backend with simulated readers.")
+    parser.add_argument("--url", help="Test a running server instead of starting one with stubbed services")
+    parser.add_argument("--readers", default="1,5,10,25", help="Comma-separated concurrent reader counts, one step each")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per step")
+    parser.add_argument("--books", type=int, default=3, help="Books shared by all readers")
+    parser.add_argument("--pages", type=int, default=40, help="Pages per synthetic book")
+    parser.add_argument("--pdf-kind", default="text", choices=("text", "scanned", "mixed"))
+    parser.add_argument("--upload-ratio", type=float, default=0.05, help="Share of sessions that upload a new book")
+    parser.add_argument("--burst-pages", type=int, default=40, help="Page images requested when a book opens")
+    parser.add_argument("--image-width", type=int, default=1200)
+    parser.add_argument("--turns", type=int, default=10, help="Page turns per session")
+    parser.add_argument("--think-ms", type=float, default=2000, help="Mean pause between page turns")
+    parser.add_argument("--voice", default="es-AR-TomasNeural")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="Simulated latency of stubbed remote calls")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    data_dir = None
+    process = None
+    base_url = args.url
+    if base_url is None:
+        data_dir = tempfile.mkdtemp(prefix="amori-loadtest-")
+        process, base_url = start_server(data_dir, args)
+        print(f"Started backend at {base_url} (data in {data_dir})")
+
+    try:
+        books = asyncio.run(prepare_books(base_url, args))
+        upload_pdf = pdf_bytes(args.pages, args.pdf_kind, seed=args.seed + 1000)
+        steps = []
+        for readers in (int(n) for n in args.readers.split(",") if n):
+            step = asyncio.run(run_step(base_url, readers, books, args, upload_pdf))
+            print_step(step)
+            steps.append(step)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if data_dir is not None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    if args.output:
+        report = {"url": args.url or "local (stubbed services)", "config": {
+            k: v for k, v in vars(args).items() if k not in ("serve", "port", "data_dir", "output")
+        }, "steps": steps}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
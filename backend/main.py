@@ -1,16 +1,38 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, Response
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-import shutil
+import asyncio
+import functools
+import hashlib
+import hmac
 import os
+import re
+import shutil
+import time
 import uuid
 from typing import List
-from services import PDFProcessor, TTSGenerator
+from services import PDFProcessor, TTSGenerator, tts_backends
+from tts_backends import AUDIO_PROFILES, DEFAULT_PROFILE, voice_language
 from ai_service import ClaudeService
-from deep_translator import GoogleTranslator
-from langdetect import detect
+from warmup import WarmupManager
+from page_cache import PageCache
+from page_store import PageStore
+from document_store import DocumentStore
+from job_queue import JobQueue, JobWorkerPool
+from events import EventLog, format_sse
+from search_index import SearchIndex
+from static_files import StaticSite
+from bundle import ARCHIVE_MEDIA_TYPES, ArchiveStream
+from audiobook import page_chapters, write_audiobook
+from metrics import CACHE_REQUESTS, REGISTRY, STAGE_SECONDS, MetricsMiddleware, monitor_event_loop, stage
+from profiling import ProfileRecorder, ServerTimingMiddleware
+from outbound import TRANSLATE, OutboundError, deadline, stats as outbound_stats
+from urllib.parse import quote
+from http_cache import (
+    IMAGE_MEDIA_TYPES, IMMUTABLE, FileHashCache, etag_matches, hash_file, make_etag,
+    negotiate_image_format, not_modified,
+)
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -18,28 +40,58 @@ load_dotenv()
 
 app = FastAPI()
 
+# Per-route latency histograms for /metrics
+app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # /pages window size and sprite sheet geometry for /images?layout=sprite
+    expose_headers=[
+        "X-Total-Pages", "X-Sprite-Pages", "X-Sprite-Columns", "X-Sprite-Cell-Width", "X-Sprite-Cell-Height",
+        "X-Audio-Quality",
+    ],
 )
 
 import json
 
-# Global store for demo purposes (should be DB in prod)
-# structure: { doc_id: { "path": str, "pages": [] } }
-documents = {}
-
 # Directories
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
-AUDIO_DIR = os.path.join(BASE_DIR, "audio_cache")
-LIBRARY_FILE = os.path.join(BASE_DIR, "library.json")
+# Everything the backend writes lives under DATA_DIR (benchmarks and load tests point it at a temp dir)
+DATA_DIR = os.environ.get("AMORI_DATA_DIR", BASE_DIR)
+UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
+AUDIO_DIR = os.path.join(DATA_DIR, "audio_cache")
+AUDIOBOOK_DIR = os.path.join(DATA_DIR, "audiobooks")
+LIBRARY_FILE = os.path.join(DATA_DIR, "library.json")
+PAGE_DIR = os.path.join(DATA_DIR, "page_text")
+THUMBNAIL_DIR = os.path.join(DATA_DIR, "thumbnails")
+THUMBNAIL_WIDTH = int(os.environ.get("AMORI_THUMBNAIL_WIDTH", "200"))
+# Missing audio generated at the same time for one offline bundle
+BUNDLE_AUDIO_CONCURRENCY = int(os.environ.get("AMORI_BUNDLE_AUDIO_CONCURRENCY", "3"))
+# Pages synthesized at the same time by one audiobook export
+AUDIOBOOK_CONCURRENCY = int(os.environ.get("AMORI_AUDIOBOOK_CONCURRENCY", "4"))
+# Shared by all worker processes on this host (uvicorn --workers N / gunicorn)
+DB_FILE = os.environ.get("AMORI_DB", os.path.join(DATA_DIR, "amori.db"))
+# Profiles written by /admin/profile and X-Amori-Profile requests
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+ADMIN_TOKEN = os.environ.get("AMORI_ADMIN_TOKEN")
+# Total time a request may spend on remote services (TTS, translation, summary), retries included
+AUDIO_DEADLINE = float(os.environ.get("AMORI_AUDIO_DEADLINE", "90"))
+TRANSLATE_DEADLINE = float(os.environ.get("AMORI_TRANSLATE_DEADLINE", "30"))
+SUMMARY_DEADLINE = float(os.environ.get("AMORI_SUMMARY_DEADLINE", "300"))
+
+profile_recorder = ProfileRecorder(PROFILE_DIR)
+if os.environ.get("AMORI_PROFILING", "0") == "1":
+    # Server-Timing headers on every response (opt-in: they reveal internal timings)
+    app.add_middleware(ServerTimingMiddleware, recorder=profile_recorder, admin_token=ADMIN_TOKEN)
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(AUDIO_DIR, exist_ok=True)
+os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+os.makedirs(AUDIOBOOK_DIR, exist_ok=True)
 
 print("="*60)
 print(" AMORI BACKEND v1.6 STARTING")
@@ -47,9 +99,50 @@ print(" AI SUMMARY FEATURE: ENABLED")
 print(f" FRONTEND PATH: {os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'frontend', 'dist'))}")
 print("="*60)
 
-pdf_processor = PDFProcessor()
+pdf_processor = PDFProcessor(
+    languages=os.environ.get("AMORI_OCR_LANGUAGES", "es,en,pt,fr").split(","),
+    # OCR readers kept loaded, one per language set, and their combined model size
+    max_readers=int(os.environ.get("AMORI_OCR_READERS", "2")),
+    max_reader_bytes=int(float(os.environ.get("AMORI_OCR_MEMORY_MB", "0")) * 1024 * 1024) or None,
+)
 tts_generator = TTSGenerator()
 summarizer = ClaudeService()
+page_store = PageStore(PAGE_DIR)
+# Document metadata and status: { doc_id, filename, path, status, total_pages, last_page, ... }
+# Page text lives in page_store and is loaded on demand through page_cache.
+doc_store = DocumentStore(DB_FILE)
+# Durable ingestion queue in the same database; survives restarts
+job_queue = JobQueue(DB_FILE, stale_after=float(os.environ.get("AMORI_JOB_STALE_SECONDS", "30")))
+# Progress/summary/audio events pushed to clients over SSE
+event_log = EventLog(DB_FILE)
+# Full-text index of page text, filled as pages are extracted
+search_index = SearchIndex(DB_FILE)
+
+# Optional background warm-up of the heavy engines (AMORI_WARMUP=1)
+warmup = WarmupManager(
+    enabled=os.environ.get("AMORI_WARMUP", "0").lower() in ("1", "true", "yes"),
+    delay=float(os.environ.get("AMORI_WARMUP_DELAY", "1.0")),
+)
+warmup.register(
+    "ocr",
+    # Only the first language's reader: documents detected as anything else load their own
+    loader=lambda: pdf_processor._get_reader(pdf_processor.languages[:1]),
+    probe=lambda: (pdf_processor.readers.loaded(), pdf_processor.reader_load_seconds),
+)
+warmup.register(
+    "summarizer",
+    loader=summarizer.fallback_summarizer._initialize_lazy,
+    probe=lambda: (summarizer.fallback_summarizer.initialized, summarizer.fallback_summarizer.load_seconds),
+)
+
+@app.on_event("startup")
+async def start_warmup():
+    warmup.start()
+
+@app.on_event("startup")
+async def start_event_loop_monitor():
+    # Event loop lag in /metrics: blocking work on the loop stalls every request
+    app.state.event_loop_monitor = asyncio.create_task(monitor_event_loop())
 
 def load_library():
     if os.path.exists(LIBRARY_FILE):
@@ -60,37 +153,73 @@ def load_library():
             return []
     return []
 
-def save_to_library(book_data):
+def import_legacy_library():
+    """Imports library.json (older versions) into the shared document store once.
+
+    Page text embedded in library.json is moved into page_store. The JSON
+    file itself is left untouched and is no longer written.
+    """
+    # Checked before parsing: library.json can be large, and this runs on every start
+    if doc_store.library_imported():
+        return
     library = load_library()
-    # Check if already exists
-    for i, book in enumerate(library):
-        if book["doc_id"] == book_data["doc_id"]:
-            # Preserve existing progress unless explicitly overwritten
-            if "last_page" not in book_data and "last_page" in book:
-                book_data["last_page"] = book["last_page"]
-            library[i] = book_data # Update entry
-            with open(LIBRARY_FILE, "w") as f:
-                json.dump(library, f, indent=2)
-            return
-
-    # New book
-    if "last_page" not in book_data:
-        book_data["last_page"] = 1
-        
-    library.append(book_data)
-    with open(LIBRARY_FILE, "w") as f:
-        json.dump(library, f, indent=2)
-
-# Load existing documents into memory on startup
-startup_library = load_library()
-for book in startup_library:
-    documents[book["doc_id"]] = {
-        "path": book["path"],
-        "filename": book["filename"],
-        "status": "ready",
-        "pages": book.get("pages", []), 
-        "last_page": book.get("last_page", 1)
-    }
+    if not library:
+        return
+    imported = set(doc_store.import_library(library))
+    # Only books inserted now: a book deleted since the import must not get its pages back
+    for book in library:
+        if book["doc_id"] in imported and "pages" in book and not page_store.exists(book["doc_id"]):
+            page_store.save(book["doc_id"], book["pages"])
+    if imported:
+        print(f"Imported {len(imported)} book(s) from library.json into {DB_FILE}")
+
+page_cache = PageCache(
+    page_store.load,
+    max_bytes=int(float(os.environ.get("AMORI_PAGE_CACHE_MB", "64")) * 1024 * 1024),
+)
+
+def get_document_pages(doc_id):
+    pages = page_cache.get(doc_id)
+    return pages if pages is not None else []
+
+def get_document_pages_range(doc_id, start=1, limit=None):
+    """Returns a window of pages, decompressing only that window on a cache miss."""
+    pages = page_cache.peek(doc_id)
+    if pages is not None:
+        return pages[start - 1:None if limit is None else start - 1 + limit]
+    return page_store.load_range(doc_id, start, limit) or []
+
+def get_document_page(doc_id, page_num):
+    """Returns the text of one page, reading only that page from disk on a cache miss."""
+    pages = page_cache.peek(doc_id)
+    if pages is not None:
+        if 1 <= page_num <= len(pages):
+            return pages[page_num - 1]["text"]
+        return None
+    return page_store.load_page(doc_id, page_num)
+
+def document_content_hash(doc):
+    """SHA-256 of the document's PDF, computed once for libraries imported from older versions."""
+    if doc["content_hash"]:
+        return doc["content_hash"]
+    try:
+        content_hash = hash_file(doc["path"])
+    except OSError:
+        # The PDF for a doc_id never changes, so the id is a safe fallback
+        return doc["doc_id"]
+    doc_store.update(doc["doc_id"], content_hash=content_hash)
+    return content_hash
+
+# Audio files are hashed once per (size, mtime) for their ETags
+audio_hashes = FileHashCache()
+
+def get_document_or_404(doc_id):
+    doc = doc_store.get(doc_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return doc
+
+import_legacy_library()
 
 class PageResponse(BaseModel):
     page: int
@@ -104,62 +233,241 @@ class InitResponse(BaseModel):
 class ProgressRequest(BaseModel):
     page: int
 
-def process_pdf_background(doc_id: str, file_path: str):
+def run_ingest_job(job):
+    """Extracts page text for an uploaded PDF, checkpointing every page in the job queue."""
+    doc_id = job["doc_id"]
+    doc = doc_store.get(doc_id)
+    if doc is None:
+        return # Deleted while queued
+
     try:
+        # Resume after the last checkpointed page if a previous attempt was interrupted
+        done = job_queue.checkpoint(job["job_id"])
+        start_page = max(done, default=0) + 1
+        if done:
+            print(f"Resuming document {doc_id} from page {start_page}.")
+
         # Optimization: Pass file path directly to avoid loading entire file into RAM twice
-        pages_data = pdf_processor.process_pdf(file_path)
-        
-        documents[doc_id]["pages"] = pages_data
-        documents[doc_id]["status"] = "ready"
-        documents[doc_id]["last_page"] = 1
-        
-        # Save to library
-        save_to_library({
-            "doc_id": doc_id,
-            "filename": documents[doc_id]["filename"],
-            "path": file_path,
-            "total_pages": len(pages_data),
-            "last_page": 1,
-            # saving pages here to persist text content. For optimization, could be separate.
-            "pages": pages_data 
-        })
+        process_started = time.perf_counter()
+        # OCR languages chosen at upload or detected on an earlier attempt; otherwise detected now
+        ocr_languages = doc["ocr_languages"].split(",") if doc["ocr_languages"] else None
+        pages = pdf_processor.iter_pages(
+            doc["path"], start_page=start_page, ocr_languages=ocr_languages,
+            on_ocr_languages=lambda languages: doc_store.update(doc_id, ocr_languages=",".join(languages)),
+        )
+        for page in pages:
+            job_queue.save_page(job["job_id"], page["page"], page["text"])
+            search_index.index_page(doc_id, page["page"], page["text"])
+            done[page["page"]] = page["text"]
+            event_log.publish(doc_id, "page", {
+                "page": page["page"],
+                "pages_done": len(done),
+                "total_pages": job["total_pages"],
+            })
+
+        if doc_store.get(doc_id) is None:
+            search_index.remove(doc_id)
+            return # Deleted while processing
+
+        STAGE_SECONDS.observe(time.perf_counter() - process_started, stage="process_pdf")
+
+        pages_data = [{"page": n, "text": done[n]} for n in sorted(done)]
+        page_store.save(doc_id, pages_data)
+        page_cache.put(doc_id, pages_data)
+        # Marking it ready also adds it to the library
+        doc_store.update(doc_id, status="ready", total_pages=len(pages_data), last_page=1)
+        event_log.publish(doc_id, "status", document_status(doc_store.get(doc_id)))
+        enqueue_thumbnails(doc_id, len(pages_data))
         
         print(f"Document {doc_id} processed successfully and saved to library.")
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        documents[doc_id]["status"] = "error"
-        documents[doc_id]["error"] = str(e)
+        doc_store.update(doc_id, status="error", error=str(e))
+        event_log.publish(doc_id, "status", {"status": "error", "error": str(e)})
+        raise
+
+def thumbnail_path(doc_id, page_num):
+    return os.path.join(THUMBNAIL_DIR, doc_id, f"{page_num}.webp")
+
+def save_thumbnail(doc_id, page_num, image_bytes):
+    path = thumbnail_path(doc_id, page_num)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(image_bytes)
+    os.replace(tmp_path, path)
+
+def run_thumbnails_job(job):
+    """Pre-renders small WebP thumbnails for every page, skipping ones already on disk."""
+    doc_id = job["doc_id"]
+    doc = doc_store.get(doc_id)
+    if doc is None:
+        return # Deleted while queued
+
+    missing = [n for n in range(1, doc["total_pages"] + 1) if not os.path.exists(thumbnail_path(doc_id, n))]
+    for page_num, image_bytes in pdf_processor.iter_page_images(
+        doc["path"], pages=missing, width=THUMBNAIL_WIDTH, fmt="webp", quality=70
+    ):
+        if doc_store.get(doc_id) is None:
+            return # Deleted while rendering
+        save_thumbnail(doc_id, page_num, image_bytes)
+
+def run_index_job(job):
+    """Indexes a document processed before search existed."""
+    pages = page_store.load(job["doc_id"])
+    if pages is not None and doc_store.get(job["doc_id"]) is not None:
+        search_index.index_document(job["doc_id"], pages)
+
+def audiobook_path(doc_id, voice):
+    return os.path.join(AUDIOBOOK_DIR, f"{doc_id}_{voice}.mp3")
+
+def run_audiobook_job(job):
+    """Synthesizes every page (reusing audio_cache) and joins them into one MP3 with chapters."""
+    doc_id = job["doc_id"]
+    voice = job["payload"]["voice"]
+    doc = doc_store.get(doc_id)
+    if doc is None:
+        return # Deleted while queued
+    total_pages = doc["total_pages"]
+
+    def publish(status, pages_done):
+        event_log.publish(doc_id, "audiobook", {
+            "voice": voice, "status": status, "pages_done": pages_done, "total_pages": total_pages,
+        })
+
+    async def synthesize_page(limit, page_num):
+        async with limit:
+            audio_path = audio_cache_path(doc_id, page_num, voice)
+            if not os.path.exists(audio_path):
+                text = get_document_page(doc_id, page_num) or ""
+                # One voice for the whole book: wait for its engine rather than mix in a fallback
+                await synthesize_audio(pdf_processor.clean_text(text), voice, audio_path, fallback=False)
+            job_queue.save_page(job["job_id"], page_num, "")
+            publish("running", job_queue.pages_done(job["job_id"]))
+
+    async def synthesize_all():
+        limit = asyncio.Semaphore(AUDIOBOOK_CONCURRENCY)
+        await asyncio.gather(*(synthesize_page(limit, n) for n in range(1, total_pages + 1)))
+
+    # Runs in a job worker thread, which has no event loop of its own
+    asyncio.run(synthesize_all())
+    if doc_store.get(doc_id) is None:
+        return # Deleted while synthesizing
+
+    chapters = page_chapters(pdf_processor.get_outline(doc["path"]), total_pages)
+    page_files = [audio_cache_path(doc_id, n, voice) for n in range(1, total_pages + 1)]
+    title = os.path.splitext(doc["filename"])[0]
+    duration_ms = write_audiobook(audiobook_path(doc_id, voice), title, page_files, chapters)
+    publish("ready", total_pages)
+    print(f"Audiobook for {doc_id} ({voice}) ready: {len(chapters)} chapters, {duration_ms // 1000}s.")
+
+def give_up_job(job, error):
+    """A job whose worker kept dying (e.g. a PDF that crashes the process) is not retried again."""
+    print(f"Giving up {job['kind']} job {job['job_id']} for {job['doc_id']}: {error}")
+    if job["kind"] == "ingest" and doc_store.get(job["doc_id"]) is not None:
+        # Otherwise the document stays "processing" and is re-queued on every start
+        doc_store.update(job["doc_id"], status="error", error=error)
+        event_log.publish(job["doc_id"], "status", {"status": "error", "error": error})
+
+job_workers = JobWorkerPool(
+    job_queue,
+    {"ingest": run_ingest_job},
+    # Host-wide limit on documents being extracted/OCR'd at the same time
+    concurrency=int(os.environ.get("AMORI_INGEST_CONCURRENCY", "2")),
+    name="ingest",
+    on_give_up=give_up_job,
+)
+# Nice-to-have work in its own slots, so it never holds up the extraction of a new upload
+background_workers = JobWorkerPool(
+    job_queue,
+    {
+        "thumbnails": run_thumbnails_job,
+        "index": run_index_job,
+    },
+    concurrency=int(os.environ.get("AMORI_BACKGROUND_CONCURRENCY", "1")),
+    name="background",
+    on_give_up=give_up_job,
+)
+# An export can take many minutes: exports wait for each other, not uploads or thumbnails for them
+audiobook_workers = JobWorkerPool(
+    job_queue,
+    {"audiobook": run_audiobook_job},
+    concurrency=int(os.environ.get("AMORI_AUDIOBOOK_JOBS", "1")),
+    name="audiobook",
+    on_give_up=give_up_job,
+)
+
+def enqueue_ingest(doc_id, file_path):
+    try:
+        total_pages = pdf_processor.count_pages(file_path)
+    except Exception:
+        total_pages = 0 # Broken PDF; the job itself will report the error
+    # Smaller documents first, so a short PDF isn't stuck behind a long scan
+    job_queue.enqueue(doc_id, "ingest", priority=total_pages, total_pages=total_pages)
+    job_workers.start()
+    job_workers.notify()
+
+def enqueue_thumbnails(doc_id, total_pages):
+    # Queued behind every ingest job: thumbnails are nice to have, text is not
+    job_queue.enqueue(doc_id, "thumbnails", priority=1_000_000 + total_pages, total_pages=total_pages)
+    background_workers.start()
+    background_workers.notify()
+
+@app.on_event("startup")
+async def start_job_workers():
+    # Documents left "processing" without a job (older versions) are queued again
+    for doc in doc_store.list_by_status("processing"):
+        if job_queue.active_job(doc["doc_id"], "ingest") is None:
+            print(f"Re-queuing unfinished document {doc['doc_id']}.")
+            enqueue_ingest(doc["doc_id"], doc["path"])
+    # Library documents from before the search index get indexed in the background
+    for doc in doc_store.list_by_status("ready"):
+        if not search_index.is_indexed(doc["doc_id"]) and job_queue.active_job(doc["doc_id"], "index") is None:
+            job_queue.enqueue(doc["doc_id"], "index", priority=1_000_000 + doc["total_pages"], total_pages=doc["total_pages"])
+    job_workers.start()
+    background_workers.start()
+    audiobook_workers.start()
 
 @app.post("/upload", response_model=InitResponse)
-async def upload_pdf(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def upload_pdf(file: UploadFile = File(...), languages: str = Form(None)):
+    """languages: OCR languages for scanned pages (e.g. "es" or "es,en"); detected when omitted."""
+    ocr_languages = None
+    if languages:
+        ocr_languages = [language.strip() for language in languages.split(",") if language.strip()]
+        unsupported = set(ocr_languages) - set(pdf_processor.languages)
+        if unsupported:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported OCR languages: {', '.join(sorted(unsupported))} (supported: {', '.join(pdf_processor.languages)})",
+            )
+
     # Check for duplicates
-    for stored_doc_id, doc_data in documents.items():
-        if doc_data.get("filename") == file.filename:
-            print(f"File {file.filename} already exists. Returning existing doc_id: {stored_doc_id}")
-            return {
-                "doc_id": stored_doc_id,
-                "status": doc_data.get("status", "ready"),
-                "filename": doc_data.get("filename")
-            }
+    existing = doc_store.find_by_filename(file.filename)
+    if existing:
+        print(f"File {file.filename} already exists. Returning existing doc_id: {existing['doc_id']}")
+        return {
+            "doc_id": existing["doc_id"],
+            "status": existing["status"],
+            "filename": existing["filename"]
+        }
 
     doc_id = str(uuid.uuid4())
     file_path = os.path.join(UPLOAD_DIR, f"{doc_id}.pdf")
     
+    # Hash while copying; the content hash versions page image ETags
+    hasher = hashlib.sha256()
     with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        while chunk := file.file.read(1024 * 1024):
+            hasher.update(chunk)
+            buffer.write(chunk)
     
     # Initialize document with processing status
-    documents[doc_id] = {
-        "path": file_path,
-        "filename": file.filename,
-        "status": "processing",
-        "pages": [],
-        "last_page": 1
-    }
+    doc_store.create(
+        doc_id, file.filename, file_path, status="processing", content_hash=hasher.hexdigest(),
+        ocr_languages=",".join(ocr_languages) if ocr_languages else None,
+    )
     
-    # Offload processing
-    background_tasks.add_task(process_pdf_background, doc_id, file_path)
+    # Offload processing to the durable job queue
+    enqueue_ingest(doc_id, file_path)
     
     return {
         "doc_id": doc_id,
@@ -167,50 +475,236 @@ async def upload_pdf(background_tasks: BackgroundTasks, file: UploadFile = File(
         "filename": file.filename
     }
 
-@app.get("/document/{doc_id}/status")
-async def get_document_status(doc_id: str):
-    if doc_id not in documents:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    doc = documents[doc_id]
-    return {
+def document_status(doc):
+    response = {
         "status": doc["status"],
-        "total_pages": len(doc["pages"]) if "pages" in doc else 0,
-        "error": doc.get("error"),
-        "last_page": doc.get("last_page", 1)
+        "total_pages": doc["total_pages"],
+        "error": doc["error"],
+        "last_page": doc["last_page"]
     }
+    if doc["status"] == "processing":
+        job = job_queue.active_job(doc["doc_id"], "ingest")
+        if job:
+            response["progress"] = {
+                "job_status": job["status"],
+                "pages_done": job_queue.pages_done(job["job_id"]),
+                "total_pages": job["total_pages"],
+            }
+    return response
+
+@app.get("/document/{doc_id}/status")
+def get_document_status(doc_id: str):
+    return document_status(get_document_or_404(doc_id))
+
+@app.get("/document/{doc_id}/events")
+async def stream_document_events(doc_id: str, request: Request, since: int = None):
+    """Server-Sent Events: ingestion progress, per-page readiness, summary and audio events.
+
+    The stream opens with a "status" snapshot unless the client is resuming
+    (Last-Event-ID header or ?since=), in which case missed events are replayed.
+    """
+    last_event_id = request.headers.get("last-event-id", "")
+    if since is None and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    # Read the sequence before the snapshot so nothing falls between them.
+    # In a thread: a writer holding the database would otherwise stall every stream
+    start_seq = since if since is not None else await asyncio.to_thread(event_log.last_seq)
+    doc = await asyncio.to_thread(get_document_or_404, doc_id)
+
+    async def event_stream():
+        if since is None:
+            status = await asyncio.to_thread(document_status, doc)
+            yield format_sse({"seq": start_seq, "type": "status", "data": dict(status, doc_id=doc_id)})
+        async for message in event_log.stream(doc_id, start_seq):
+            if await request.is_disconnected():
+                break
+            yield message
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Keep proxies (ngrok, nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/document/{doc_id}/progress")
-async def update_progress(doc_id: str, progress: ProgressRequest):
-    if doc_id not in documents:
+def update_progress(doc_id: str, progress: ProgressRequest):
+    if not doc_store.update(doc_id, last_page=progress.page):
         raise HTTPException(status_code=404, detail="Document not found")
-    
-    # Update in memory
-    documents[doc_id]["last_page"] = progress.page
-    
-    # Update in library file (need to load, find, update, save)
-    # Optimization: Only load/save if different to avoid excessive disk I/O?
-    # For now, let's just do it.
-    
-    library = load_library()
-    updated = False
-    for book in library:
-        if book["doc_id"] == doc_id:
-            book["last_page"] = progress.page
-            updated = True
-            break
-            
-    if updated:
-        with open(LIBRARY_FILE, "w") as f:
-            json.dump(library, f, indent=2)
             
     return {"status": "success", "page": progress.page}
 
+# Page object fields selectable through /pages?fields=
+PAGE_FIELDS = ("page", "text")
+# Pages read per chunk while streaming NDJSON
+NDJSON_CHUNK_PAGES = 50
+
 @app.get("/document/{doc_id}/pages")
-async def get_pages(doc_id: str):
-    if doc_id not in documents:
-        raise HTTPException(status_code=404, detail="Document not found")
-    return documents[doc_id]["pages"]
+def get_pages(doc_id: str, start: int = 1, limit: int = None, fields: str = None, format: str = "json"):
+    """Page objects, optionally a window (start/limit) with only some fields.
+
+    format=ndjson streams one JSON object per line instead of a single array.
+    X-Total-Pages always reports the whole document.
+    """
+    doc = get_document_or_404(doc_id)
+    if start < 1:
+        raise HTTPException(status_code=400, detail="start must be 1 or greater")
+    if limit is not None and limit < 0:
+        raise HTTPException(status_code=400, detail="limit must be 0 or greater")
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be json or ndjson")
+    selected = PAGE_FIELDS
+    if fields:
+        selected = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = set(selected) - set(PAGE_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown page fields: {', '.join(sorted(unknown))}")
+
+    total = doc["total_pages"] if doc["status"] == "ready" else 0
+    stop = total if limit is None else min(total, start - 1 + limit)
+
+    def read(first, count):
+        if "text" not in selected:
+            # Page numbers only: nothing to decompress
+            return [{"page": n} for n in range(first, first + count)]
+        pages = get_document_pages_range(doc_id, first, count)
+        if selected == PAGE_FIELDS:
+            return pages
+        return [{field: page[field] for field in selected} for page in pages]
+
+    headers = {"X-Total-Pages": str(total)}
+    if format == "json":
+        if start == 1 and limit is None and selected == PAGE_FIELDS:
+            # Whole document: keep it in the page cache for the reader
+            return JSONResponse(get_document_pages(doc_id), headers=headers)
+        return JSONResponse(read(start, max(stop - start + 1, 0)), headers=headers)
+
+    def lines():
+        for first in range(start, stop + 1, NDJSON_CHUNK_PAGES):
+            for page in read(first, min(NDJSON_CHUNK_PAGES, stop - first + 1)):
+                yield json.dumps(page, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
+
+@app.get("/ready")
+async def get_readiness():
+    return warmup.status()
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return {
+        "page_cache": page_cache.stats(),
+        "page_store": page_store.disk_usage(),
+        "documents": doc_store.count(),
+        "jobs": job_queue.stats(),
+        "search": search_index.stats(),
+        "audio": audio_cache_stats(),
+        "ocr_readers": pdf_processor.readers.stats(),
+        "frontend": static_site.stats(),
+    }
+
+def collect_metrics():
+    """Values kept elsewhere, read at scrape time."""
+    page_stats = page_cache.stats()
+    translations = _translate.cache_info()
+    outbound = outbound_stats()
+    audio = audio_cache_stats()
+    jobs = [
+        ({"kind": kind, "status": status}, n)
+        for kind, by_status in sorted(job_queue.stats().items())
+        for status, n in sorted(by_status.items())
+        if status in ("queued", "running")
+    ]
+    return [
+        ("amori_page_cache_requests_total", "counter", "Page text cache lookups (this process).", [
+            ({"result": "hit"}, page_stats["hits"]), ({"result": "miss"}, page_stats["misses"]),
+        ]),
+        ("amori_page_cache_bytes", "gauge", "Page text held in memory.", [({}, page_stats["bytes"])]),
+        ("amori_translation_cache_requests_total", "counter", "Translation cache lookups (this process).", [
+            ({"result": "hit"}, translations.hits), ({"result": "miss"}, translations.misses),
+        ]),
+        ("amori_jobs", "gauge", "Queued and running background jobs (all workers).", jobs),
+        ("amori_ocr_reader_bytes", "gauge", "Model weights of the loaded OCR readers.", [
+            ({}, pdf_processor.readers.stats()["bytes"]),
+        ]),
+        ("amori_audio_cache_bytes", "gauge", "Audio cache size by quality profile.", [
+            ({"profile": profile}, s["bytes"]) for profile, s in audio.items()
+        ]),
+        ("amori_outbound_in_flight", "gauge", "Remote service calls in progress.", [
+            ({"service": name}, s["in_flight"]) for name, s in outbound.items()
+        ]),
+        ("amori_outbound_waiting", "gauge", "Calls waiting for a free remote service slot.", [
+            ({"service": name}, s["waiting"]) for name, s in outbound.items()
+        ]),
+        ("amori_outbound_circuit_open", "gauge", "1 while a service's circuit breaker rejects calls.", [
+            ({"service": name}, int(s["state"] == "open")) for name, s in outbound.items()
+        ]),
+    ]
+
+REGISTRY.add_collector(collect_metrics)
+
+@app.get("/outbound/stats")
+async def get_outbound_stats():
+    """Concurrency, queueing and circuit breaker state of each remote service."""
+    return outbound_stats()
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text format. Counters and histograms are per worker process."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def require_admin(request):
+    # Admin endpoints only exist when a token is configured
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Bytes: compare_digest refuses non-ASCII str (Starlette decodes headers as latin-1)
+    token = request.headers.get("x-admin-token", "").encode("latin-1")
+    if not hmac.compare_digest(token, ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.post("/admin/profile")
+async def profile_process(request: Request, mode: str = "sample", seconds: float = 10, interval_ms: float = 5):
+    """Profiles this worker process for `seconds` (stack sampling or tracemalloc) and writes it to disk."""
+    require_admin(request)
+    if mode not in ("sample", "memory"):
+        raise HTTPException(status_code=400, detail="mode must be sample or memory")
+    if not 0 < seconds <= 300:
+        raise HTTPException(status_code=400, detail="seconds must be between 0 and 300")
+    if not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 1000")
+
+    profiler = await asyncio.to_thread(profile_recorder.begin, mode, interval_ms / 1000)
+    if profiler is None:
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+    await asyncio.sleep(seconds)
+    path = await asyncio.to_thread(profile_recorder.end, profiler, "process", mode)
+    return {"file": os.path.basename(path), "mode": mode, "seconds": seconds}
+
+@app.get("/admin/profiles")
+def list_profiles(request: Request):
+    require_admin(request)
+    return profile_recorder.list()
+
+@app.get("/admin/profiles/{name}")
+def download_profile(request: Request, name: str):
+    require_admin(request)
+    if name not in profile_recorder.list() and not (name.endswith(".snapshot") and name[:-9] in profile_recorder.list()):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(os.path.join(PROFILE_DIR, name), filename=name)
+
+@app.get("/search")
+def search_library(q: str, limit: int = 20, doc_id: str = None):
+    """Ranked pages matching every word of q; snippets are HTML with <mark> highlights."""
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    started = time.perf_counter()
+    results = search_index.search(q, limit=limit, doc_id=doc_id)
+    return {
+        "query": q,
+        "results": results,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
 
 @app.get("/voices")
 async def get_voices():
@@ -241,31 +735,32 @@ async def get_voices():
         {"ShortName": "de-DE-ConradNeural", "FriendlyName": "Conrad (Germany)"},
         {"ShortName": "de-DE-KatjaNeural", "FriendlyName": "Katja (Germany)"},
     ]
-    return voices
+    # Engines installed on this server, usable without network
+    return voices + tts_backends().local_voices()
 
 @app.get("/library")
-async def get_library():
-    return load_library()
+def get_library():
+    return doc_store.list_library()
+
+@app.get("/library/changes")
+def get_library_changes(since: int = 0):
+    """Delta sync: library entries changed and ids deleted after change sequence `since`."""
+    return doc_store.changes(since)
 
 @app.delete("/library/{doc_id}")
-async def delete_book(doc_id: str):
-    global documents 
-    # Load current library
-    current_lib = load_library()
-    
-    # Filter out the book to delete
-    new_lib = [book for book in current_lib if book.get("doc_id") != doc_id]
-    
-    if len(new_lib) == len(current_lib):
+def delete_book(doc_id: str):
+    if not doc_store.delete(doc_id):
         raise HTTPException(status_code=404, detail="Book not found")
 
-    # Save updated library
-    with open(LIBRARY_FILE, "w", encoding="utf-8") as f:
-        json.dump(new_lib, f, indent=4)
-
-    # Remove from memory documents if present
-    if doc_id in documents:
-        del documents[doc_id]
+    job_queue.cancel_document(doc_id)
+    event_log.publish(doc_id, "status", {"status": "deleted"})
+    page_cache.invalidate(doc_id)
+    page_store.delete(doc_id)
+    search_index.remove(doc_id)
+    shutil.rmtree(os.path.join(THUMBNAIL_DIR, doc_id), ignore_errors=True)
+    for name in os.listdir(AUDIOBOOK_DIR):
+        if name.startswith(f"{doc_id}_"):
+            os.remove(os.path.join(AUDIOBOOK_DIR, name))
 
     # Remove file
     file_path = os.path.join(UPLOAD_DIR, f"{doc_id}.pdf")
@@ -278,43 +773,113 @@ async def delete_book(doc_id: str):
         
     return {"status": "success", "message": "Book deleted"}
 
+@functools.lru_cache(maxsize=int(os.environ.get("AMORI_TRANSLATION_CACHE_SIZE", "256")))
+def _translate(text):
+    # Raises on failure, so errors are not cached
+    # Imported on first use to keep server startup fast
+    from deep_translator import GoogleTranslator
+    from langdetect import detect
+
+    # Detect source language
+    detected_lang = detect(text)
+    
+    # Logic: If EN -> ES, If ES -> EN
+    target_lang = None
+    
+    if detected_lang == 'en':
+        target_lang = 'es'
+    elif detected_lang == 'es':
+        target_lang = 'en'
+        
+    if target_lang:
+        # Perform translation
+        translator = GoogleTranslator(source='auto', target=target_lang)
+        with stage("translate_text"):
+            translated_text = TRANSLATE.call(translator.translate, text)
+        return translated_text, True, target_lang
+    return text, False, None
+
 def translate_text(text: str):
     if not text.strip():
         return text, False, None
 
     try:
-        # Detect source language
-        detected_lang = detect(text)
-        
-        # Logic: If EN -> ES, If ES -> EN
-        target_lang = None
-        
-        if detected_lang == 'en':
-            target_lang = 'es'
-        elif detected_lang == 'es':
-            target_lang = 'en'
-            
-        if target_lang:
-            # Perform translation
-            translator = GoogleTranslator(source='auto', target=target_lang)
-            translated_text = translator.translate(text)
-            return translated_text, True, target_lang
+        return _translate(text)
     except Exception as e:
         print(f"Translation error: {e}")
     
     return text, False, None
 
+def audio_cache_path(doc_id, page_num, voice, translated=False, preview=False, profile=DEFAULT_PROFILE):
+    # Include voice, 'smooth' tag, and 'trans' tag to version the cache
+    trans_tag = "_trans" if translated else ""
+    # The default profile keeps the original names, so existing cache files stay valid
+    profile_tag = f"_{profile}" if profile != DEFAULT_PROFILE else ""
+    preview_tag = "_preview" if preview else ""
+    return os.path.join(AUDIO_DIR, f"{doc_id}_p{page_num}_{voice}_smooth{trans_tag}{profile_tag}{preview_tag}.mp3")
+
+AUDIO_PROFILE_RE = re.compile(
+    r"_smooth(?:_trans)?(?:_(" + "|".join(p for p in AUDIO_PROFILES if p != DEFAULT_PROFILE) + r"))?(?:_preview)?(?:_fallback)?\.mp3$"
+)
+
+def audio_cache_stats():
+    """Files and bytes in audio_cache by quality profile."""
+    stats = {profile: {"files": 0, "bytes": 0} for profile in AUDIO_PROFILES}
+    with os.scandir(AUDIO_DIR) as entries:
+        for entry in entries:
+            match = AUDIO_PROFILE_RE.search(entry.name)
+            if match and entry.is_file():
+                profile = stats[match.group(1) or DEFAULT_PROFILE]
+                profile["files"] += 1
+                profile["bytes"] += entry.stat().st_size
+    return stats
+
+def fallback_audio_path(audio_path):
+    return audio_path[:-len(".mp3")] + "_fallback.mp3"
+
+async def synthesize_audio(tts_text, voice, audio_path, preview=False, fallback=True, profile=DEFAULT_PROFILE):
+    """Generates audio_path; the file only appears once it is complete.
+
+    Audio made by a fallback engine goes to fallback_audio_path() instead, so
+    the voice's own engine is tried again next time. Returns the path written.
+    """
+    # Create a temporary generator for this request
+    temp_tts = TTSGenerator(voice=voice)
+    if not tts_text.strip():
+        # Actually let's generate a silence or a message "No text"
+        tts_text = "Sin texto." if voice_language(voice)[0] == "es" else "No text."
+    tmp_path = f"{audio_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        _, is_fallback = await temp_tts.generate_audio(
+            tts_text, tmp_path, preview=preview, fallback=fallback, profile=profile,
+        )
+        final_path = fallback_audio_path(audio_path) if is_fallback else audio_path
+        os.replace(tmp_path, final_path)
+        return final_path
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 @app.get("/audio/{doc_id}/{page_num}")
-async def get_audio(doc_id: str, page_num: int, voice: str = "es-AR-TomasNeural", translate: bool = False):
-    if doc_id not in documents:
-        raise HTTPException(status_code=404, detail="Document not found")
+async def get_audio(
+    request: Request, doc_id: str, page_num: int, voice: str = "es-AR-TomasNeural", translate: bool = False,
+    preview: bool = False, quality: str = DEFAULT_PROFILE,
+):
+    """Page audio. preview=true answers fastest with a local engine when one is installed.
+
+    quality picks an AUDIO_PROFILES entry ("low" for mobile data); a profile this
+    server can't encode falls back to the default, named in X-Audio-Quality.
+    """
+    if quality not in AUDIO_PROFILES:
+        raise HTTPException(status_code=400, detail=f"quality must be one of: {', '.join(AUDIO_PROFILES)}")
+    requested_quality = quality
+    if not tts_backends().supports_profile(quality):
+        quality = DEFAULT_PROFILE
+    get_document_or_404(doc_id)
     
-    pages = documents[doc_id]["pages"]
-    if page_num < 1 or page_num > len(pages):
+    display_text = get_document_page(doc_id, page_num)
+    if display_text is None:
         raise HTTPException(status_code=404, detail="Page not found")
-        
-    page_data = pages[page_num - 1]
-    display_text = page_data["text"]
     
     # Process text for TTS (remove newlines, etc.)
     tts_text = pdf_processor.clean_text(display_text)
@@ -323,125 +888,435 @@ async def get_audio(doc_id: str, page_num: int, voice: str = "es-AR-TomasNeural"
     is_translated = False
     target_voice = voice
     
-    if translate:
-        translated_text, is_translated, target_lang = translate_text(tts_text)
-        if is_translated:
-            tts_text = translated_text
-            if target_lang == 'es':
-                target_voice = "es-AR-TomasNeural"
-            elif target_lang == 'en':
-                target_voice = "en-US-GuyNeural"
+    with deadline(AUDIO_DEADLINE):
+        if translate:
+            translated_text, is_translated, target_lang = await asyncio.to_thread(translate_text, tts_text)
+            if is_translated:
+                tts_text = translated_text
+                if voice.startswith(("local-", "piper-")):
+                    # Stay on the same local engine
+                    target_voice = f"{voice.split('-')[0]}-{target_lang}"
+                elif target_lang == 'es':
+                    target_voice = "es-AR-TomasNeural"
+                elif target_lang == 'en':
+                    target_voice = "en-US-GuyNeural"
 
-    # Include voice, 'smooth' tag, and 'trans' tag to version the cache
-    trans_tag = "_trans" if is_translated else ""
-    audio_filename = f"{doc_id}_p{page_num}_{target_voice}_smooth{trans_tag}.mp3"
-    audio_path = os.path.join(AUDIO_DIR, audio_filename)
-    
-    if not os.path.exists(audio_path):
-        if not tts_text.strip():
-             # Actually let's generate a silence or a message "No text"
-             # Create a temporary generator for this request
-             temp_tts = TTSGenerator(voice=target_voice)
-             msg = "Sin texto." if target_voice.startswith("es") else "No text."
-             await temp_tts.generate_audio(msg, audio_path)
-        else:
-             temp_tts = TTSGenerator(voice=target_voice)
-             await temp_tts.generate_audio(tts_text, audio_path)
+        audio_path = audio_cache_path(doc_id, page_num, target_voice, is_translated, preview, quality)
+        served_path = audio_path
+
+        audio_cached = os.path.exists(audio_path)
+        CACHE_REQUESTS.inc(cache="audio", result="hit" if audio_cached else "miss")
+        if not audio_cached:
+            try:
+                served_path = await synthesize_audio(tts_text, target_voice, audio_path, preview=preview, profile=quality)
+            except (OutboundError, TimeoutError) as e:
+                # Fail fast while the TTS service is down or saturated; the player retries later
+                print(f"Audio for {doc_id} page {page_num} unavailable: {e}")
+                retry_after = getattr(e, "retry_after", None) or 5
+                raise HTTPException(
+                    status_code=503,
+                    detail="Servicio de voz no disponible, intenta de nuevo en unos segundos",
+                    headers={"Retry-After": str(int(retry_after) + 1)},
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e)) # No engine for this voice
+            if served_path == audio_path and not preview:
+                event_log.publish(doc_id, "audio", {
+                    "page": page_num,
+                    "voice": voice,
+                    "translate": translate,
+                })
     
-    return FileResponse(audio_path)
+    etag = f'"{audio_hashes.get(served_path)[:32]}"'
+    # Only what was asked for is cached for good. Fallback audio, untranslated audio
+    # (translator down or failing) and a lower quality than requested get replaced
+    # by the right one later: revalidate them
+    as_requested = served_path == audio_path and is_translated == translate and quality == requested_quality
+    cache_control = IMMUTABLE if as_requested else "no-cache"
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    headers = {"ETag": etag, "Cache-Control": cache_control, "X-Audio-Quality": quality}
+    # FileResponse answers Range requests (206) so the player can seek
+    return FileResponse(served_path, media_type="audio/mpeg", headers=headers)
+
+VOICE_RE = re.compile(r"^[A-Za-z]{2,3}-[A-Za-z0-9]+-[A-Za-z0-9]+$")
+
+def audiobook_status(doc, voice):
+    if os.path.exists(audiobook_path(doc["doc_id"], voice)):
+        return {"status": "ready", "voice": voice, "pages_done": doc["total_pages"], "total_pages": doc["total_pages"]}
+    job = job_queue.active_job(doc["doc_id"], "audiobook", {"voice": voice})
+    if job is None:
+        return None
+    return {
+        "status": job["status"],
+        "voice": voice,
+        "pages_done": job_queue.pages_done(job["job_id"]),
+        "total_pages": doc["total_pages"],
+    }
+
+@app.post("/document/{doc_id}/audiobook")
+def export_audiobook(doc_id: str, voice: str = "es-AR-TomasNeural"):
+    """Starts (or reports) the export of the whole book as one MP3; progress also goes out as SSE."""
+    doc = get_document_or_404(doc_id)
+    if doc["status"] != "ready":
+        raise HTTPException(status_code=409, detail="Document is still being processed")
+    if not VOICE_RE.match(voice):
+        raise HTTPException(status_code=400, detail="Invalid voice")
+
+    status = audiobook_status(doc, voice)
+    if status is None:
+        # Own worker pool and slots: a long export never holds up new uploads. Shorter books first.
+        job_queue.enqueue(doc_id, "audiobook", priority=doc["total_pages"],
+                          total_pages=doc["total_pages"], payload={"voice": voice})
+        audiobook_workers.start()
+        audiobook_workers.notify()
+        status = audiobook_status(doc, voice)
+    return JSONResponse(status, status_code=200 if status["status"] == "ready" else 202)
+
+@app.get("/document/{doc_id}/audiobook")
+def get_audiobook(request: Request, doc_id: str, voice: str = "es-AR-TomasNeural"):
+    doc = get_document_or_404(doc_id)
+    if not VOICE_RE.match(voice):
+        raise HTTPException(status_code=400, detail="Invalid voice")
+    status = audiobook_status(doc, voice)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Audiobook not exported")
+    if status["status"] != "ready":
+        return JSONResponse(status, status_code=202)
+
+    path = audiobook_path(doc_id, voice)
+    etag = f'"{audio_hashes.get(path)[:32]}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    name = f"{os.path.splitext(doc['filename'])[0]}.mp3"
+    return FileResponse(path, media_type="audio/mpeg", headers={
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE,
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(name)}",
+    })
 
 @app.get("/document/{doc_id}/page/{page_num}/text")
 async def get_page_text(doc_id: str, page_num: int, translate: bool = False):
-    if doc_id not in documents:
-        raise HTTPException(status_code=404, detail="Document not found")
+    get_document_or_404(doc_id)
     
-    pages = documents[doc_id]["pages"]
-    if page_num < 1 or page_num > len(pages):
+    text = get_document_page(doc_id, page_num)
+    if text is None:
         raise HTTPException(status_code=404, detail="Page not found")
     
-    text = pages[page_num - 1]["text"]
     is_translated = False
     
     if translate:
-        text, is_translated, _ = translate_text(text)
+        with deadline(TRANSLATE_DEADLINE):
+            text, is_translated, _ = await asyncio.to_thread(translate_text, text)
         
     return {"text": text, "is_translated": is_translated}
 
+# Most pages a single /images request may render
+MAX_BATCH_PAGES = 50
+# Sprite sheets are for thumbnails: 50 pages at these sizes stay in the tens of MB
+MAX_SPRITE_WIDTH = 400
+MAX_SPRITE_DPI = 50
+
+def parse_image_params(request, width, dpi, format, quality):
+    """Validates page image query parameters; returns (format, negotiated)."""
+    # width (pixels) wins over dpi; neither keeps the original x2 zoom
+    if width is not None and not 16 <= width <= 4000:
+        raise HTTPException(status_code=400, detail="width must be between 16 and 4000")
+    if dpi is not None and not 18 <= dpi <= 300:
+        raise HTTPException(status_code=400, detail="dpi must be between 18 and 300")
+    if not 1 <= quality <= 100:
+        raise HTTPException(status_code=400, detail="quality must be between 1 and 100")
+    try:
+        return negotiate_image_format(request, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/document/{doc_id}/image/{page_num}")
-async def get_page_image(doc_id: str, page_num: int):
-    if doc_id not in documents:
-        raise HTTPException(status_code=404, detail="Document not found")
+def get_page_image(
+    request: Request, doc_id: str, page_num: int,
+    width: int = None, dpi: int = None, format: str = None, quality: int = 80,
+):
+    doc = get_document_or_404(doc_id)
+    if doc["status"] == "ready" and not 1 <= page_num <= doc["total_pages"]:
+        raise HTTPException(status_code=404, detail="Page not found")
+
+    fmt, negotiated = parse_image_params(request, width, dpi, format, quality)
+
+    headers = {"Cache-Control": IMMUTABLE}
+    if negotiated:
+        headers["Vary"] = "Accept"
+
+    # Answer revalidations without rendering the page again
+    size = f"w{width}" if width else f"dpi{dpi}" if dpi else 2
+    etag = make_etag(document_content_hash(doc), page_num, fmt, size, *([quality] if fmt != "png" else []))
+    headers["ETag"] = etag
+    # Images are not kept server-side; a hit is a client revalidation answered without rendering
+    if etag_matches(request, etag):
+        CACHE_REQUESTS.inc(cache="image", result="hit")
+        return Response(status_code=304, headers=headers)
+    CACHE_REQUESTS.inc(cache="image", result="miss")
     
-    file_path = documents[doc_id]["path"]
-    image_bytes = pdf_processor.get_page_image(file_path, page_num)
+    file_path = doc["path"]
+    image_bytes = pdf_processor.get_page_image(file_path, page_num, width=width, dpi=dpi, fmt=fmt, quality=quality)
     
     
     if not image_bytes:
         raise HTTPException(status_code=404, detail="Page not found")
         
-    return Response(content=image_bytes, media_type="image/png")
+    return Response(content=image_bytes, media_type=IMAGE_MEDIA_TYPES[fmt], headers=headers)
+
+@app.get("/document/{doc_id}/images")
+def get_page_images(
+    request: Request, doc_id: str, start: int = 1, count: int = 10, layout: str = "multipart",
+    width: int = None, dpi: int = None, format: str = None, quality: int = 80, columns: int = 10,
+):
+    """Renders a range of pages from one open PDF.
+
+    layout=multipart streams a multipart/mixed body with one part per page
+    (X-Page header); layout=sprite returns the pages tiled into a single
+    image, described by the X-Sprite-* headers.
+    """
+    doc = get_document_or_404(doc_id)
+    if layout not in ("multipart", "sprite"):
+        raise HTTPException(status_code=400, detail="layout must be multipart or sprite")
+    if not 1 <= count <= MAX_BATCH_PAGES:
+        raise HTTPException(status_code=400, detail=f"count must be between 1 and {MAX_BATCH_PAGES}")
+    if not 1 <= columns <= MAX_BATCH_PAGES:
+        raise HTTPException(status_code=400, detail=f"columns must be between 1 and {MAX_BATCH_PAGES}")
+    fmt, negotiated = parse_image_params(request, width, dpi, format, quality)
+    if layout == "sprite":
+        if not (width or dpi):
+            width = THUMBNAIL_WIDTH
+        if (width or 0) > MAX_SPRITE_WIDTH or (not width and dpi > MAX_SPRITE_DPI):
+            raise HTTPException(
+                status_code=400,
+                detail=f"sprite pages can be at most {MAX_SPRITE_WIDTH} px wide or {MAX_SPRITE_DPI} dpi",
+            )
+
+    last = start + count - 1
+    if doc["status"] == "ready":
+        last = min(last, doc["total_pages"])
+    if start < 1 or start > last:
+        raise HTTPException(status_code=404, detail="Page not found")
+    pages = range(start, last + 1)
+
+    headers = {"Cache-Control": IMMUTABLE}
+    if negotiated:
+        headers["Vary"] = "Accept"
+    size = f"w{width}" if width else f"dpi{dpi}" if dpi else 2
+    headers["ETag"] = make_etag(
+        document_content_hash(doc), "images", layout, start, last, fmt, size,
+        *([quality] if fmt != "png" else []), *([columns] if layout == "sprite" else []),
+    )
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if layout == "sprite":
+        sprite = pdf_processor.render_sprite(
+            doc["path"], pages, width=width, dpi=dpi, columns=columns, fmt=fmt, quality=quality
+        )
+        if sprite is None:
+            raise HTTPException(status_code=404, detail="Page not found")
+        image_bytes, cell_width, cell_height = sprite
+        headers.update({
+            "X-Sprite-Pages": f"{start}-{last}",
+            "X-Sprite-Columns": str(min(columns, len(pages))),
+            "X-Sprite-Cell-Width": str(cell_width),
+            "X-Sprite-Cell-Height": str(cell_height),
+        })
+        return Response(content=image_bytes, media_type=IMAGE_MEDIA_TYPES[fmt], headers=headers)
+
+    boundary = uuid.uuid4().hex
+    media_type = IMAGE_MEDIA_TYPES[fmt]
+
+    def parts():
+        # Runs in the threadpool; the PDF stays open until the last page is sent
+        for page_num, image_bytes in pdf_processor.iter_page_images(
+            doc["path"], pages=pages, width=width, dpi=dpi, fmt=fmt, quality=quality
+        ):
+            yield (
+                f"--{boundary}\r\nContent-Type: {media_type}\r\nX-Page: {page_num}\r\n"
+                f"Content-Length: {len(image_bytes)}\r\n\r\n"
+            ).encode("ascii") + image_bytes + b"\r\n"
+        yield f"--{boundary}--\r\n".encode("ascii")
+
+    return StreamingResponse(parts(), media_type=f"multipart/mixed; boundary={boundary}", headers=headers)
+
+# Pages rendered per thread hop (and per PDF open) while streaming a bundle
+BUNDLE_IMAGE_BATCH = 10
+
+@app.get("/document/{doc_id}/bundle")
+async def get_offline_bundle(
+    doc_id: str, start: int = 1, count: int = None, archive: str = "zip",
+    width: int = None, image_format: str = "webp", quality: int = 75,
+    audio: str = "cached", voice: str = "es-AR-TomasNeural",
+):
+    """Streams a zip/tar with the text, page images and audio of a page range for offline reading.
+
+    audio=cached includes only audio already generated, audio=generate also
+    generates the missing pages (BUNDLE_AUDIO_CONCURRENCY at a time) and
+    audio=none leaves audio out. manifest.json, written last, lists what
+    the bundle contains.
+    """
+    doc = get_document_or_404(doc_id)
+    if doc["status"] != "ready":
+        raise HTTPException(status_code=409, detail="Document is still being processed")
+    if archive not in ARCHIVE_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="archive must be zip or tar")
+    if audio not in ("cached", "generate", "none"):
+        raise HTTPException(status_code=400, detail="audio must be cached, generate or none")
+    if not VOICE_RE.match(voice):
+        raise HTTPException(status_code=400, detail="Invalid voice") # Part of the audio file names
+    if image_format not in ("png", "jpeg", "webp"):
+        raise HTTPException(status_code=400, detail="image_format must be png, jpeg or webp")
+    if width is not None and not 16 <= width <= 4000:
+        raise HTTPException(status_code=400, detail="width must be between 16 and 4000")
+    if not 1 <= quality <= 100:
+        raise HTTPException(status_code=400, detail="quality must be between 1 and 100")
+
+    last = doc["total_pages"] if count is None else min(doc["total_pages"], start + count - 1)
+    if start < 1 or start > last:
+        raise HTTPException(status_code=404, detail="Page not found")
+    pages = list(range(start, last + 1))
+
+    async def generate_missing_audio(limit, page_num, text, audio_path):
+        async with limit:
+            if not os.path.exists(audio_path):
+                await synthesize_audio(pdf_processor.clean_text(text), voice, audio_path, fallback=False)
+
+    async def chunks():
+        bundle = ArchiveStream(archive)
+        texts = {page["page"]: page["text"] for page in get_document_pages_range(doc_id, start, len(pages))}
+        audio_tasks = {}
+        if audio == "generate":
+            # Started now so TTS runs while text and images are being streamed
+            limit = asyncio.Semaphore(BUNDLE_AUDIO_CONCURRENCY)
+            for page_num in pages:
+                audio_path = audio_cache_path(doc_id, page_num, voice)
+                if not os.path.exists(audio_path):
+                    audio_tasks[page_num] = asyncio.create_task(
+                        generate_missing_audio(limit, page_num, texts.get(page_num, ""), audio_path)
+                    )
+
+        manifest = {
+            "doc_id": doc_id,
+            "filename": doc["filename"],
+            "total_pages": doc["total_pages"],
+            "pages": [],
+        }
+        try:
+            for page_num in pages:
+                bundle.add_bytes(f"text/{page_num:04d}.txt", texts.get(page_num, "").encode("utf-8"))
+            yield bundle.drain()
+
+            extension = "jpg" if image_format == "jpeg" else image_format
+            images = {}
+            for i in range(0, len(pages), BUNDLE_IMAGE_BATCH):
+                batch = pages[i:i + BUNDLE_IMAGE_BATCH]
+                rendered = await asyncio.to_thread(lambda: list(pdf_processor.iter_page_images(
+                    doc["path"], pages=batch, width=width, fmt=image_format, quality=quality
+                )))
+                for page_num, image_bytes in rendered:
+                    images[page_num] = f"images/{page_num:04d}.{extension}"
+                    bundle.add_bytes(images[page_num], image_bytes, compress=False)
+                yield bundle.drain()
+
+            for page_num in pages:
+                entry = {"page": page_num, "text": f"text/{page_num:04d}.txt", "image": images.get(page_num)}
+                if audio != "none":
+                    if page_num in audio_tasks:
+                        try:
+                            await audio_tasks[page_num]
+                        except Exception as e:
+                            print(f"Bundle audio for {doc_id} page {page_num} failed: {e}")
+                    audio_path = audio_cache_path(doc_id, page_num, voice)
+                    if os.path.exists(audio_path):
+                        entry["audio"] = f"audio/{page_num:04d}.mp3"
+                        await asyncio.to_thread(bundle.add_file, entry["audio"], audio_path)
+                        yield bundle.drain()
+                manifest["pages"].append(entry)
+
+            bundle.add_bytes("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+            bundle.close()
+            yield bundle.drain()
+        finally:
+            # Client went away: stop generating audio nobody will receive
+            for task in audio_tasks.values():
+                task.cancel()
+
+    stem = os.path.splitext(doc["filename"])[0]
+    name = f"{stem}_p{start}-{last}.{archive}"
+    return StreamingResponse(
+        chunks(),
+        media_type=ARCHIVE_MEDIA_TYPES[archive],
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(name)}"},
+    )
+
+@app.get("/document/{doc_id}/thumbnail/{page_num}")
+def get_page_thumbnail(request: Request, doc_id: str, page_num: int):
+    doc = get_document_or_404(doc_id)
+    if doc["status"] == "ready" and not 1 <= page_num <= doc["total_pages"]:
+        raise HTTPException(status_code=404, detail="Page not found")
+
+    etag = make_etag(document_content_hash(doc), page_num, "thumbnail", THUMBNAIL_WIDTH)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    path = thumbnail_path(doc_id, page_num)
+    thumbnail_cached = os.path.exists(path)
+    CACHE_REQUESTS.inc(cache="thumbnail", result="hit" if thumbnail_cached else "miss")
+    if not thumbnail_cached:
+        # Not pre-rendered yet (or thumbnails job still queued): render it now
+        image_bytes = pdf_processor.get_page_image(doc["path"], page_num, width=THUMBNAIL_WIDTH, fmt="webp", quality=70)
+        if not image_bytes:
+            raise HTTPException(status_code=404, detail="Page not found")
+        save_thumbnail(doc_id, page_num, image_bytes)
+
+    return FileResponse(path, media_type="image/webp", headers={"ETag": etag, "Cache-Control": IMMUTABLE})
 
 @app.post("/document/{doc_id}/summary")
 async def get_document_summary(doc_id: str):
-    if doc_id not in documents:
-        raise HTTPException(status_code=404, detail="Document not found")
+    doc = get_document_or_404(doc_id)
     
-    # Check if summary already exists in memory or file?
-    # For now, generate on demand or cache simple in doc object
-    if "summary" in documents[doc_id] and documents[doc_id]["summary"]:
-        return {"summary": documents[doc_id]["summary"]}
+    # Summaries are generated once and persisted with the document
+    if doc["summary"]:
+        return {"summary": doc["summary"]}
 
     # Collect text from all pages
     full_text = ""
-    for page in documents[doc_id]["pages"]:
+    for page in get_document_pages(doc_id):
         full_text += page["text"] + "\n"
     
     if len(full_text.strip()) < 50:
         return {"summary": "El documento no tiene suficiente texto para generar un resumen."}
 
-    summary = summarizer.generate_summary(full_text)
-    
-    # Save to memory
-    documents[doc_id]["summary"] = summary
+    # In a thread: the call (or the local fallback) takes seconds and would block the event loop
+    with stage("generate_summary"), deadline(SUMMARY_DEADLINE):
+        summary = await asyncio.to_thread(summarizer.generate_summary, full_text)
     
-    # Save to library?
-    # It would be good to persist it, but for now memory is fine or we can update library.json
-    # Updating library.json
-    library = load_library()
-    updated = False
-    for book in library:
-        if book["doc_id"] == doc_id:
-            book["summary"] = summary
-            updated = True
-            break
-    
-    if updated:
-        with open(LIBRARY_FILE, "w") as f:
-            json.dump(library, f, indent=2)
+    doc_store.update(doc_id, summary=summary)
+    event_log.publish(doc_id, "summary", {"summary": summary})
 
     return {"summary": summary}
 
 # --- Static File Serving for React Frontend ---
-# Make sure "frontend/dist" exists (run 'npm run build' first)
+# Make sure "frontend/dist" exists (run 'npm run build' first); its files are listed at startup
 frontend_dist = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend", "dist")
-assets_path = os.path.join(frontend_dist, "assets")
+static_site = StaticSite(frontend_dist)
 
-if os.path.exists(assets_path):
-    app.mount("/assets", StaticFiles(directory=assets_path), name="assets")
+@app.on_event("startup")
+async def precompress_frontend():
+    # In the background: until a file is done, requests get it uncompressed (or a .gz/.br from the build)
+    asyncio.get_running_loop().run_in_executor(None, static_site.precompress)
 
 @app.get("/{catchall:path}")
-async def serve_react_app(catchall: str):
-    # If the request matches a file in dist (e.g. favicon.ico), serve it
-    if os.path.exists(os.path.join(frontend_dist, catchall)) and catchall != "":
-        return FileResponse(os.path.join(frontend_dist, catchall))
-    
-    # Otherwise, serve index.html for SPA routing
+def serve_react_app(request: Request, catchall: str):
+    # Files in dist (e.g. favicon.ico, assets/...), or index.html for SPA routing
+    response = static_site.response(request, catchall)
+    if response is not None:
+        return response
+
     index_path = os.path.join(frontend_dist, "index.html")
-    if os.path.exists(index_path):
-        resp = FileResponse(index_path)
-        resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-        return resp
-    
     print(f"CRITICAL ERROR: Frontend index.html not found at {index_path}")
     return {"error": "Frontend not built. Please run 'npm run build' in frontend directory."}
 
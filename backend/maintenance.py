@@ -0,0 +1,447 @@
+"""Library maintenance for the backend's data directory.
+
+Steps, run in this order:
+  * duplicates: documents with the same PDF content (SHA-256); the ready,
+    oldest copy is kept and gets the furthest reading progress.
+  * orphans: uploads, page text, thumbnails, audiobooks and audio_cache
+    files of documents that no longer exist (or of pages past the end of
+    their document), audio left by fallback engines and temporary files
+    of interrupted writes.
+  * integrity: documents whose PDF or page text is missing or doesn't match
+    the library, and search index rows or jobs of deleted documents.
+    Broken documents are re-queued for extraction when their PDF exists.
+  * compact: page text rewritten with the current codec, old events and
+    finished jobs deleted, SQLite indexes rebuilt and the database vacuumed.
+
+Nothing is changed without --apply; either way the report lists every
+action and the bytes it reclaims. Files younger than --min-age are left
+alone, so uploads and audio being written by a running server are safe.
+
+Usage:
+    python maintenance.py [--apply] [--only orphans,compact] [--min-age 3600] [--json]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sqlite3
+import struct
+import time
+import zlib
+from collections import defaultdict
+
+from document_store import DocumentStore
+from events import EventLog
+from http_cache import hash_file
+from job_queue import JobQueue
+from page_store import PageStore
+from search_index import SearchIndex
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STEPS = ("duplicates", "orphans", "integrity", "compact")
+
+# Leftovers of writes interrupted by a crash: "<file>.<hex>.tmp", "<file>.<pid>.<thread>.tmp"
+# and the intermediate WAV/MP3 of a TTS engine, "<file>.tmp.<hex>.wav"
+TEMP_RE = re.compile(r"\.tmp(?:\.[0-9a-f]{32}\.(?:wav|mp3))?$")
+# "<doc_id>_p<page>_<voice>_smooth[_trans][_<profile>][_preview][_fallback].mp3"
+AUDIO_RE = re.compile(r"^(?P<doc_id>[^_]+)_p(?P<page>\d+)_.+\.mp3$")
+# Finished jobs are only history; kept a week for /cache/stats and debugging
+JOB_RETENTION = 7 * 24 * 3600
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def path_size(path):
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path) for name in names
+        )
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+class Maintenance:
+    """Finds problems in the library and its files and, with apply=True, fixes them.
+
+    Every finding is recorded in `actions` as {step, action, target, bytes,
+    detail}; `bytes` is what the action reclaims (or would, in a dry run).
+    Safe to run next to live servers: documents go through the same stores
+    they use, and deletions publish the same "deleted" event as the API.
+    """
+
+    def __init__(self, db_path, upload_dir, audio_dir, audiobook_dir, page_dir, thumbnail_dir, apply=False, min_age=3600.0):
+        self.db_path = db_path
+        self.upload_dir = upload_dir
+        self.audio_dir = audio_dir
+        self.audiobook_dir = audiobook_dir
+        self.page_dir = page_dir
+        self.thumbnail_dir = thumbnail_dir
+        self.apply = apply
+        self.min_age = min_age
+        self.doc_store = DocumentStore(db_path)
+        self.job_queue = JobQueue(db_path)
+        self.search_index = SearchIndex(db_path)
+        self.event_log = EventLog(db_path)
+        self.page_store = PageStore(page_dir)
+        self.actions = []
+        self._removed = set() # doc_ids removed (or, in a dry run, to be removed) by this run
+        self._claimed = set() # Paths already counted by an earlier action
+
+    @classmethod
+    def from_env(cls, base_dir=None, **kwargs):
+        """The directories and database main.py uses."""
+        base_dir = base_dir or os.environ.get("AMORI_DATA_DIR", BACKEND_DIR)
+        return cls(
+            db_path=os.environ.get("AMORI_DB", os.path.join(base_dir, "amori.db")),
+            upload_dir=os.path.join(base_dir, "uploads"),
+            audio_dir=os.path.join(base_dir, "audio_cache"),
+            audiobook_dir=os.path.join(base_dir, "audiobooks"),
+            page_dir=os.path.join(base_dir, "page_text"),
+            thumbnail_dir=os.path.join(base_dir, "thumbnails"),
+            **kwargs,
+        )
+
+    def run(self, steps=STEPS):
+        for step in STEPS:
+            if step in steps:
+                getattr(self, step)()
+        return self.report()
+
+    def record(self, step, action, target, size=0, detail=None):
+        self.actions.append({"step": step, "action": action, "target": target, "bytes": size, "detail": detail})
+
+    def report(self):
+        steps = {}
+        for action in self.actions:
+            summary = steps.setdefault(action["step"], {"actions": 0, "bytes": 0})
+            summary["actions"] += 1
+            summary["bytes"] += action["bytes"]
+        return {
+            "dry_run": not self.apply,
+            "bytes_reclaimed": sum(action["bytes"] for action in self.actions),
+            "steps": steps,
+            "actions": self.actions,
+        }
+
+    def documents(self):
+        return {doc["doc_id"]: doc for doc in self.doc_store.list_all() if doc["doc_id"] not in self._removed}
+
+    def _old_enough(self, path):
+        try:
+            return time.time() - os.path.getmtime(path) >= self.min_age
+        except FileNotFoundError:
+            return False
+
+    def _remove_path(self, step, path, detail):
+        if path in self._claimed or not os.path.exists(path):
+            return 0
+        self._claimed.add(path)
+        size = path_size(path)
+        self.record(step, "remove", path, size, detail)
+        if self.apply:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return size
+
+    def _listdir(self, directory):
+        try:
+            return sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return []
+
+    def pdf_path(self, doc):
+        """The document's PDF: its recorded path, else its file in the upload directory (None if neither exists)."""
+        for path in (doc["path"], os.path.join(self.upload_dir, f"{doc['doc_id']}.pdf")):
+            if os.path.exists(path):
+                return path
+        return None
+
+    def document_files(self, doc):
+        """Every file on disk belonging to a document."""
+        doc_id = doc["doc_id"]
+        paths = [
+            doc["path"],
+            os.path.join(self.upload_dir, f"{doc_id}.pdf"),
+            os.path.join(self.page_dir, f"{doc_id}.pages"),
+            os.path.join(self.page_dir, f"{doc_id}.json"),
+            os.path.join(self.thumbnail_dir, doc_id),
+        ]
+        paths += [os.path.join(self.audiobook_dir, name) for name in self._listdir(self.audiobook_dir) if name.startswith(f"{doc_id}_")]
+        paths += [os.path.join(self.audio_dir, name) for name in self._listdir(self.audio_dir) if name.startswith(f"{doc_id}_p")]
+        return [path for path in dict.fromkeys(paths) if os.path.exists(path)]
+
+    def _remove_document(self, step, doc, detail):
+        in_use = {other["path"] for other in self.documents().values() if other["doc_id"] != doc["doc_id"]}
+        self._removed.add(doc["doc_id"])
+        size = 0
+        for path in self.document_files(doc):
+            if path not in in_use:
+                size += self._remove_path(step, path, f"file of {doc['doc_id']}")
+        self.record(step, "remove_document", doc["doc_id"], 0, detail)
+        if self.apply:
+            self.doc_store.delete(doc["doc_id"])
+            self.job_queue.cancel_document(doc["doc_id"])
+            self.search_index.remove(doc["doc_id"])
+            self.event_log.publish(doc["doc_id"], "status", {"status": "deleted"})
+        return size
+
+    def duplicates(self):
+        by_hash = defaultdict(list)
+        for doc in self.documents().values():
+            if doc["status"] == "processing":
+                continue
+            content_hash = doc["content_hash"]
+            if not content_hash:
+                if self.pdf_path(doc) is None:
+                    continue # Reported by the integrity step
+                content_hash = hash_file(self.pdf_path(doc))
+                if self.apply:
+                    self.doc_store.update(doc["doc_id"], content_hash=content_hash)
+            by_hash[content_hash].append(doc)
+
+        for docs in by_hash.values():
+            if len(docs) < 2:
+                continue
+            # Keep a ready copy, the oldest: its id is the one most clients already have
+            keep = min(docs, key=lambda doc: (doc["status"] != "ready", doc["created_at"]))
+            progress = {"last_page": max(doc["last_page"] for doc in docs)}
+            summary = next((doc["summary"] for doc in docs if doc["summary"]), None)
+            if summary and not keep["summary"]:
+                progress["summary"] = summary
+            for doc in docs:
+                if doc is not keep:
+                    self._remove_document("duplicates", doc, f"duplicate of {keep['doc_id']} ({doc['filename']})")
+            if progress["last_page"] != keep["last_page"] or "summary" in progress:
+                self.record("duplicates", "merge", keep["doc_id"], 0, f"last_page={progress['last_page']}")
+                if self.apply:
+                    self.doc_store.update(keep["doc_id"], **progress)
+
+    def orphans(self):
+        docs = self.documents()
+        paths = {os.path.abspath(doc["path"]) for doc in docs.values()}
+
+        def sweep(directory, orphan_reason):
+            for name in self._listdir(directory):
+                path = os.path.join(directory, name)
+                if not self._old_enough(path):
+                    continue
+                if TEMP_RE.search(name):
+                    self._remove_path("orphans", path, "temporary file")
+                    continue
+                reason = orphan_reason(name, path)
+                if reason:
+                    self._remove_path("orphans", path, reason)
+
+        def upload(name, path):
+            if os.path.abspath(path) not in paths and os.path.splitext(name)[0] not in docs:
+                return "upload without document"
+
+        def page_text(name, path):
+            if os.path.splitext(name)[0] not in docs:
+                return "page text without document"
+
+        def thumbnails(name, path):
+            if name not in docs:
+                return "thumbnails without document"
+            doc = docs[name]
+            for page_file in self._listdir(path):
+                page = os.path.splitext(page_file)[0]
+                page_path = os.path.join(path, page_file)
+                if not self._old_enough(page_path):
+                    continue
+                if TEMP_RE.search(page_file):
+                    self._remove_path("orphans", page_path, "temporary file")
+                elif doc["status"] == "ready" and page.isdigit() and int(page) > doc["total_pages"]:
+                    self._remove_path("orphans", page_path, "thumbnail past the last page")
+
+        def audiobook(name, path):
+            if name.split("_", 1)[0] not in docs:
+                return "audiobook without document"
+
+        def audio(name, path):
+            match = AUDIO_RE.match(name)
+            if match is None:
+                return None
+            doc = docs.get(match.group("doc_id"))
+            if doc is None:
+                return "audio without document"
+            if doc["status"] == "ready" and int(match.group("page")) > doc["total_pages"]:
+                return "audio past the last page"
+            if name.endswith("_fallback.mp3"):
+                # Served once while the voice's engine was down, never read again
+                return "fallback audio"
+
+        sweep(self.upload_dir, upload)
+        sweep(self.page_dir, page_text)
+        sweep(self.thumbnail_dir, thumbnails)
+        sweep(self.audiobook_dir, audiobook)
+        sweep(self.audio_dir, audio)
+
+    def _load_pages(self, doc_id):
+        # Read legacy JSON directly: the page store would convert it on the spot, even in a dry run
+        legacy = os.path.join(self.page_dir, f"{doc_id}.json")
+        if os.path.exists(legacy) and not os.path.exists(os.path.join(self.page_dir, f"{doc_id}.pages")):
+            with open(legacy, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return self.page_store.load(doc_id)
+
+    def _requeue(self, doc, problem):
+        if self.pdf_path(doc) is None:
+            self.record("integrity", "report", doc["doc_id"], 0, f"{problem}; PDF missing, cannot re-extract")
+            return
+        self.record("integrity", "requeue", doc["doc_id"], 0, problem)
+        if self.apply and self.job_queue.active_job(doc["doc_id"], "ingest") is None:
+            self.doc_store.update(doc["doc_id"], status="processing", error=None)
+            self.job_queue.enqueue(doc["doc_id"], "ingest", priority=doc["total_pages"], total_pages=doc["total_pages"])
+
+    def integrity(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+        finally:
+            conn.close()
+        if problems != ["ok"]:
+            self.record("integrity", "report", self.db_path, 0, "; ".join(problems[:5]))
+
+        docs = self.documents()
+        indexed = self.search_index.document_ids()
+        for doc in docs.values():
+            doc_id = doc["doc_id"]
+            pdf_path = self.pdf_path(doc)
+            if pdf_path is not None and pdf_path != doc["path"]:
+                # Libraries imported from another machine (e.g. "uploads\<id>.pdf" from Windows)
+                self.record("integrity", "fix_path", doc_id, 0, f"{doc['path']} -> {pdf_path}")
+                if self.apply:
+                    self.doc_store.update(doc_id, path=pdf_path)
+                doc["path"] = pdf_path
+            if doc["status"] != "ready":
+                if pdf_path is None:
+                    self.record("integrity", "report", doc_id, 0, f"PDF missing ({doc['status']})")
+                continue
+            try:
+                pages = self._load_pages(doc_id)
+                page_count = None if pages is None else len(pages)
+            except (ValueError, struct.error, zlib.error):
+                self._requeue(doc, "page text unreadable")
+                continue
+            if page_count is None:
+                self._requeue(doc, "page text missing")
+            elif page_count != doc["total_pages"]:
+                self._requeue(doc, f"{page_count} pages of text for {doc['total_pages']} pages")
+            elif pdf_path is None:
+                # Text and audio still work; page images and thumbnails don't
+                self.record("integrity", "report", doc_id, 0, "PDF missing")
+            elif doc_id not in indexed:
+                self.record("integrity", "reindex", doc_id, 0, "not in the search index")
+                if self.apply and self.job_queue.active_job(doc_id, "index") is None:
+                    self.job_queue.enqueue(doc_id, "index", priority=1_000_000 + doc["total_pages"], total_pages=doc["total_pages"])
+
+        for doc_id in sorted(indexed - set(docs)):
+            self.record("integrity", "remove_index", doc_id, 0, "search index rows of a deleted document")
+            if self.apply:
+                self.search_index.remove(doc_id)
+        for doc_id in sorted(self.job_queue.document_ids() - set(docs)):
+            self.record("integrity", "cancel_jobs", doc_id, 0, "jobs of a deleted document")
+            if self.apply:
+                self.job_queue.cancel_document(doc_id)
+
+    def _database_bytes(self):
+        return sum(path_size(self.db_path + suffix) for suffix in ("", "-wal"))
+
+    def compact(self):
+        for doc_id in self.documents():
+            if not self.page_store.needs_compaction(doc_id):
+                continue
+            before = sum(path_size(os.path.join(self.page_dir, f"{doc_id}{ext}")) for ext in (".pages", ".json"))
+            pages = self._load_pages(doc_id)
+            after = len(self.page_store.encode(pages))
+            self.record("compact", "recompress", doc_id, max(before - after, 0), "page text")
+            if self.apply:
+                self.page_store.save(doc_id, pages)
+                legacy = os.path.join(self.page_dir, f"{doc_id}.json")
+                if os.path.exists(legacy):
+                    os.remove(legacy)
+
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            now = time.time()
+            events = conn.execute(
+                "SELECT COUNT(*) FROM events WHERE created_at < ?", (now - self.event_log.retention,)
+            ).fetchone()[0]
+            jobs = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('done', 'error') AND updated_at < ?", (now - JOB_RETENTION,)
+            ).fetchone()[0]
+            if events or jobs:
+                self.record("compact", "prune", self.db_path, 0, f"{events} old events, {jobs} finished jobs")
+                if self.apply:
+                    self.event_log.prune(now)
+                    self.job_queue.prune(JOB_RETENTION)
+
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            wal_bytes = path_size(self.db_path + "-wal")
+            if not self.apply:
+                self.record("compact", "vacuum", self.db_path, free_pages * page_size + wal_bytes, "free pages and WAL")
+                return
+            before = self._database_bytes()
+            self.search_index.optimize()
+            conn.execute("REINDEX")
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("PRAGMA optimize")
+        finally:
+            conn.close()
+        self.record("compact", "vacuum", self.db_path, max(before - self._database_bytes(), 0), "indexes rebuilt")
+
+
+def print_report(report):
+    for action in report["actions"]:
+        size = f" {format_bytes(action['bytes'])}" if action["bytes"] else ""
+        detail = f" ({action['detail']})" if action["detail"] else ""
+        print(f"[{action['step']}] {action['action']} {action['target']}{size}{detail}")
+    for step, summary in report["steps"].items():
+        print(f"{step}: {summary['actions']} action(s), {format_bytes(summary['bytes'])}")
+    total = format_bytes(report["bytes_reclaimed"])
+    if report["dry_run"]:
+        print(f"Dry run: nothing was changed. Run with --apply to reclaim {total}.")
+    else:
+        print(f"Reclaimed {total}.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find and clean up orphaned files, duplicates and inconsistencies in the library.")
+    parser.add_argument("--apply", action="store_true", help="Make the changes (default: dry run, report only)")
+    parser.add_argument("--only", default=",".join(STEPS), help=f"Comma-separated steps to run: {', '.join(STEPS)}")
+    parser.add_argument("--min-age", type=float, default=3600, help="Leave files modified in the last N seconds alone")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    steps = [step.strip() for step in args.only.split(",") if step.strip()]
+    unknown = set(steps) - set(STEPS)
+    if unknown:
+        parser.error(f"unknown steps: {', '.join(sorted(unknown))}")
+
+    report = Maintenance.from_env(apply=args.apply, min_age=args.min_age).run(steps)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
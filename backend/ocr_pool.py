@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def reader_size(reader):
+    """Bytes of model weights held by an EasyOCR reader (detector + recognizer)."""
+    total = 0
+    for model in (getattr(reader, "detector", None), getattr(reader, "recognizer", None)):
+        if hasattr(model, "parameters"):
+            total += sum(p.numel() * p.element_size() for p in model.parameters())
+    return total
+
+
+class ReaderPool:
+    """OCR readers keyed by language set, least recently used evicted first.
+
+    At most `max_readers` readers are kept, and their weights stay under
+    `max_bytes` when set (the newest reader is always kept, even if it alone
+    exceeds the budget). A reader evicted while a page is being read stays
+    alive until that call returns.
+    """
+
+    def __init__(self, factory, max_readers=2, max_bytes=None, size=reader_size):
+        self.factory = factory
+        self.max_readers = max_readers
+        self.max_bytes = max_bytes
+        self.size = size
+        self._readers = OrderedDict() # (languages) -> {"reader", "bytes", "uses", "load_seconds"}
+        self._lock = threading.Lock()
+        # One reader built at a time: each load briefly needs its full weights in memory
+        self._build_lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+        self.last_load_seconds = None
+
+    @staticmethod
+    def key(languages):
+        return tuple(sorted(set(languages)))
+
+    def _lookup(self, key):
+        entry = self._readers.get(key)
+        if entry is not None:
+            self._readers.move_to_end(key)
+            entry["uses"] += 1
+        return entry
+
+    def get(self, languages):
+        key = self.key(languages)
+        with self._lock:
+            entry = self._lookup(key)
+        if entry is not None:
+            return entry["reader"]
+
+        with self._build_lock:
+            with self._lock:
+                entry = self._lookup(key)
+            if entry is not None:
+                return entry["reader"] # Built by another thread while we waited
+
+            start = time.perf_counter()
+            reader = self.factory(list(key))
+            load_seconds = time.perf_counter() - start
+            size = self.size(reader)
+            with self._lock:
+                self._readers[key] = {"reader": reader, "bytes": size, "uses": 1, "load_seconds": load_seconds}
+                self.loads += 1
+                self.last_load_seconds = load_seconds
+                self._evict()
+        return reader
+
+    def _evict(self):
+        while len(self._readers) > 1 and (
+            len(self._readers) > self.max_readers
+            or (self.max_bytes and sum(e["bytes"] for e in self._readers.values()) > self.max_bytes)
+        ):
+            key, _ = self._readers.popitem(last=False)
+            self.evictions += 1
+            print(f"Evicted OCR reader for {','.join(key)}.")
+
+    def loaded(self):
+        return bool(self._readers)
+
+    def stats(self):
+        with self._lock:
+            readers = [
+                {"languages": list(key), "bytes": e["bytes"], "uses": e["uses"], "load_seconds": round(e["load_seconds"], 2)}
+                for key, e in self._readers.items()
+            ]
+        return {
+            "readers": readers,
+            "bytes": sum(r["bytes"] for r in readers),
+            "max_readers": self.max_readers,
+            "max_bytes": self.max_bytes,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,97 @@
+"""Local stand-ins for the network and model dependencies, for benchmarks and offline runs.
+
+install() puts fake `edge_tts`, `deep_translator`, `anthropic` and `easyocr`
+modules in sys.modules. services.py, ai_service.py and main.py import those
+lazily, so the stubs are used as long as install() runs before the first
+call that needs them. Each stub sleeps for a configurable latency so a
+benchmark can model the remote service or measure only our own overhead
+(latency 0).
+"""
+import asyncio
+import sys
+import time
+import types
+
+# One MPEG-2 Layer III frame (24 kHz, 48 kbps, mono), the format edge-tts produces: 24 ms of audio
+MP3_FRAME = b"\xff\xf3\x64\xc4" + bytes(140)
+
+# Roughly how fast edge-tts voices speak
+CHARS_PER_SECOND = 15
+
+
+class StubCommunicate:
+    latency = 0.0
+
+    def __init__(self, text, voice, **kwargs):
+        self.text = text
+        self.voice = voice
+
+    async def save(self, audio_fname, metadata_fname=None):
+        await asyncio.sleep(self.latency)
+        frames = max(1, int(len(self.text) / CHARS_PER_SECOND / 0.024))
+        with open(audio_fname, "wb") as f:
+            f.write(MP3_FRAME * frames)
+
+
+class StubGoogleTranslator:
+    latency = 0.0
+
+    def __init__(self, source="auto", target="en", **kwargs):
+        self.source = source
+        self.target = target
+
+    def translate(self, text, **kwargs):
+        time.sleep(self.latency)
+        return f"[{self.target}] {text}"
+
+
+class _StubMessages:
+    latency = 0.0
+
+    def create(self, model, max_tokens, messages, **kwargs):
+        time.sleep(self.latency)
+        words = messages[-1]["content"].split()
+        text = " ".join(words[-min(len(words), max_tokens // 4):])
+        return types.SimpleNamespace(content=[types.SimpleNamespace(type="text", text=text)])
+
+
+class StubAnthropic:
+    def __init__(self, api_key=None, **kwargs):
+        self.messages = _StubMessages()
+
+
+class StubReader:
+    latency = 0.0
+
+    def __init__(self, lang_list, gpu=True, **kwargs):
+        self.lang_list = lang_list
+
+    def readtext(self, image, detail=1, **kwargs):
+        time.sleep(self.latency)
+        words = ["texto", "reconocido", "por", "ocr"] * 20
+        return words if detail == 0 else [([[0, 0], [1, 0], [1, 1], [0, 1]], word, 0.99) for word in words]
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    module.__amori_stub__ = True
+    return module
+
+
+def install(tts_latency=0.0, translate_latency=0.0, summary_latency=0.0, ocr_latency=0.0, ocr=True):
+    """Registers the stub modules; returns the names replaced."""
+    StubCommunicate.latency = tts_latency
+    StubGoogleTranslator.latency = translate_latency
+    _StubMessages.latency = summary_latency
+    StubReader.latency = ocr_latency
+
+    stubs = {
+        "edge_tts": _module("edge_tts", Communicate=StubCommunicate),
+        "deep_translator": _module("deep_translator", GoogleTranslator=StubGoogleTranslator),
+        "anthropic": _module("anthropic", Anthropic=StubAnthropic),
+    }
+    if ocr:
+        stubs["easyocr"] = _module("easyocr", Reader=StubReader)
+    sys.modules.update(stubs)
+    return sorted(stubs)
@@ -0,0 +1,367 @@
+"""Calls to remote services (edge-tts, Google Translate, Claude) with limits.
+
+Every service gets a concurrency cap shared by all threads and event loops
+of the process, a per-attempt timeout, jittered exponential retry and a
+circuit breaker. Once a service keeps failing, the breaker rejects calls
+immediately (CircuitOpenError) so callers fall back instead of queueing
+behind a service that is throttling us.
+
+Callers can bound the total time through `with deadline(seconds):`; the
+deadline follows the request into threads (contextvars) and caps queueing,
+attempts and backoff.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from metrics import REGISTRY, Counter
+
+OUTBOUND_CALLS = REGISTRY.register(Counter(
+    "amori_outbound_calls_total", "Remote service call attempts by result.", ["service", "result"],
+))
+
+# Absolute time.monotonic() by which the current request must be done
+DEADLINE = ContextVar("amori_outbound_deadline", default=None)
+
+
+class OutboundError(Exception):
+    def __init__(self, service, message, retry_after=None):
+        super().__init__(f"{service}: {message}")
+        self.service = service
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(OutboundError):
+    pass
+
+
+class DeadlineExceeded(OutboundError):
+    pass
+
+
+@contextmanager
+def deadline(seconds):
+    """Bounds all outbound calls in this block; an enclosing, earlier deadline wins."""
+    current = DEADLINE.get()
+    target = time.monotonic() + seconds
+    token = DEADLINE.set(target if current is None else min(current, target))
+    try:
+        yield
+    finally:
+        DEADLINE.reset(token)
+
+
+def remaining():
+    """Seconds left before the current deadline, or None without one."""
+    current = DEADLINE.get()
+    return None if current is None else current - time.monotonic()
+
+
+def is_retryable(exc):
+    # HTTP errors carry a status: only throttling and server errors are worth repeating
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in (408, 429) or status >= 500
+    return True
+
+
+class Limiter:
+    """Counting semaphore shared by threads and by any number of event loops.
+
+    asyncio.Semaphore belongs to one loop, but audio is synthesized both on
+    the server loop and in job threads running their own loops.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def _take(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        return False
+
+    def acquire(self, timeout=None):
+        with self._lock:
+            if self._take():
+                return True
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+        if waiter.wait(timeout):
+            return True
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                return False
+        return True # Granted right as the wait timed out
+
+    async def acquire_async(self, timeout=None):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._take():
+                return True
+            future = loop.create_future()
+            self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                queued = future in self._waiters
+                if queued:
+                    self._waiters.remove(future)
+            if not queued and future.done() and not future.cancelled():
+                self.release() # Granted just as the wait ended
+            # A grant still on its way finds the future cancelled and hands the slot back
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return False
+
+    def _grant(self, future):
+        if future.done():
+            self.release() # The waiter gave up in the meantime
+        else:
+            future.set_result(True)
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self.active -= 1
+                return
+            # The slot passes straight to the oldest waiter
+            waiter = self._waiters.popleft()
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+                return
+        try:
+            waiter.get_loop().call_soon_threadsafe(self._grant, waiter)
+        except RuntimeError:
+            self.release() # Its loop is closed
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures; after `reset_after`
+    seconds one trial call is let through (half-open) and decides."""
+
+    def __init__(self, threshold=5, reset_after=30.0):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self.opened_at < self.reset_after else "half_open"
+
+    def retry_after(self):
+        if self.opened_at is None:
+            return 0
+        return max(0.0, self.reset_after - (time.monotonic() - self.opened_at))
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "open":
+                return False
+            # Half-open: one trial at a time (a trial that never reported back expires)
+            now = time.monotonic()
+            if self._trial_started is None or now - self._trial_started > self.reset_after:
+                self._trial_started = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_started is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                self._trial_started = None
+
+
+class OutboundService:
+    def __init__(self, name, concurrency=4, timeout=30.0, retries=2, backoff=0.5, max_backoff=8.0,
+                 failure_threshold=5, reset_after=30.0, retryable=is_retryable):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retryable = retryable
+        self.limiter = Limiter(concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_after)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, name, **defaults):
+        """Defaults overridable with AMORI_<NAME>_CONCURRENCY, _TIMEOUT and _RETRIES."""
+        prefix = f"AMORI_{name.upper()}_"
+        for key, cast in (("concurrency", int), ("timeout", float), ("retries", int)):
+            value = os.environ.get(prefix + key.upper())
+            if value is not None:
+                defaults[key] = cast(value)
+        return cls(name, **defaults)
+
+    def _budget(self):
+        """(time allowed to wait for a slot, time allowed for one attempt)."""
+        left = remaining()
+        if left is None:
+            return self.timeout, self.timeout
+        if left <= 0:
+            OUTBOUND_CALLS.inc(service=self.name, result="deadline")
+            raise DeadlineExceeded(self.name, "deadline exceeded")
+        return left, min(self.timeout, left)
+
+    def _admit(self):
+        if not self.breaker.allow():
+            OUTBOUND_CALLS.inc(service=self.name, result="rejected")
+            raise CircuitOpenError(self.name, "circuit open", retry_after=self.breaker.retry_after())
+
+    def _failed(self, exc, attempt):
+        """Records a failed attempt; returns the backoff before the next one, or None to give up."""
+        self.breaker.record_failure()
+        timed_out = isinstance(exc, (TimeoutError, asyncio.TimeoutError, concurrent.futures.TimeoutError))
+        OUTBOUND_CALLS.inc(service=self.name, result="timeout" if timed_out else "error")
+        if attempt >= self.retries or not self.retryable(exc):
+            return None
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        left = remaining()
+        if left is not None and delay >= left:
+            return None
+        return delay
+
+    def _succeeded(self):
+        self.breaker.record_success()
+        OUTBOUND_CALLS.inc(service=self.name, result="ok")
+
+    def _queue_timeout(self, wait):
+        OUTBOUND_CALLS.inc(service=self.name, result="deadline")
+        return DeadlineExceeded(self.name, f"no free slot within {wait:.1f}s")
+
+    def _get_executor(self):
+        # Sync calls run in this pool so a hung call can be abandoned at its timeout;
+        # the slot stays taken until the call really returns
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.limiter.limit, thread_name_prefix=f"amori-{self.name}",
+                )
+            return self._executor
+
+    def call(self, fn, *args, **kwargs):
+        """Runs a blocking call with the service's limits, retries and breaker."""
+        attempt = 0
+        while True:
+            self._admit()
+            wait, timeout = self._budget()
+            if not self.limiter.acquire(wait):
+                raise self._queue_timeout(wait)
+            try:
+                future = self._get_executor().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+            except BaseException:
+                self.limiter.release()
+                raise
+            future.add_done_callback(lambda _: self.limiter.release())
+            try:
+                result = future.result(timeout=timeout)
+            except Exception as e:
+                if isinstance(e, concurrent.futures.TimeoutError):
+                    e = TimeoutError(f"{self.name} call timed out after {timeout:.1f}s")
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise e
+                OUTBOUND_CALLS.inc(service=self.name, result="retry")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._succeeded()
+            return result
+
+    async def call_async(self, fn, *args, **kwargs):
+        """Awaits fn(*args, **kwargs) with the service's limits, retries and breaker.
+
+        fn is called again for every attempt, so it must create a fresh coroutine.
+        """
+        attempt = 0
+        while True:
+            self._admit()
+            wait, timeout = self._budget()
+            if not await self.limiter.acquire_async(wait):
+                raise self._queue_timeout(wait)
+            try:
+                result = await asyncio.wait_for(fn(*args, **kwargs), timeout)
+            except Exception as e:
+                error = e
+            else:
+                error = None
+            finally:
+                # Released before any backoff so other callers can use the slot
+                self.limiter.release()
+            if error is None:
+                self._succeeded()
+                return result
+
+            if isinstance(error, asyncio.TimeoutError):
+                error = TimeoutError(f"{self.name} call timed out after {timeout:.1f}s")
+            delay = self._failed(error, attempt)
+            if delay is None:
+                raise error
+            OUTBOUND_CALLS.inc(service=self.name, result="retry")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self):
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "retry_after": round(self.breaker.retry_after(), 1),
+            "in_flight": self.limiter.active,
+            "waiting": self.limiter.waiting,
+            "concurrency": self.limiter.limit,
+            "timeout": self.timeout,
+            "retries": self.retries,
+        }
+
+
+SERVICES = {}
+
+
+def register(service):
+    SERVICES[service.name] = service
+    return service
+
+
+def stats():
+    return {name: service.stats() for name, service in SERVICES.items()}
+
+
+# A page of speech takes edge-tts a few seconds; a whole-book summary much longer
+TTS = register(OutboundService.from_env("tts", concurrency=8, timeout=60.0))
+TRANSLATE = register(OutboundService.from_env("translate", concurrency=4, timeout=15.0))
+CLAUDE = register(OutboundService.from_env("claude", concurrency=2, timeout=180.0, retries=1))
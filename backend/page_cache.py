@@ -0,0 +1,88 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+def estimate_pages_size(pages):
+    """Approximate in-memory size (bytes) of a list of page dicts."""
+    size = sys.getsizeof(pages)
+    for page in pages:
+        size += sys.getsizeof(page) + sys.getsizeof(page.get("text", ""))
+    return size
+
+
+class PageCache:
+    """LRU cache of per-document page lists, bounded by a byte budget.
+
+    `loader(doc_id)` is called on a miss and must return the page list for
+    the document, or None if it does not exist.
+    """
+
+    def __init__(self, loader, max_bytes):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # doc_id -> (pages, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, doc_id):
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is not None:
+                self._entries.move_to_end(doc_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Load outside the lock so a slow read doesn't block other documents
+        pages = self.loader(doc_id)
+        if pages is not None:
+            self.put(doc_id, pages)
+        return pages
+
+    def peek(self, doc_id):
+        """Returns cached pages without loading them on a miss."""
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(doc_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, doc_id, pages):
+        size = estimate_pages_size(pages)
+        with self._lock:
+            self._remove(doc_id)
+            # A document bigger than the whole budget is served but not kept
+            if size > self.max_bytes:
+                return
+            self._entries[doc_id] = (pages, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        entry = self._entries.pop(doc_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,175 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# File layout (little-endian):
+#   header  : magic "AMPG", version u8, codec u8, reserved u16, page_count u32
+#   index   : page_count x (offset u64, length u32), fixed width
+#   blobs   : compressed UTF-8 page text, one blob per page
+MAGIC = b"AMPG"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHI")
+INDEX_ENTRY = struct.Struct("<QI")
+
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+
+
+class PageStore:
+    """Persistent per-document page text, one compressed file per document.
+
+    Each page is compressed on its own and located through a fixed-width
+    offset index, so a single page is read through mmap without touching
+    the rest of the document.
+    """
+
+    def __init__(self, root_dir, codec=None):
+        self.root_dir = root_dir
+        os.makedirs(self.root_dir, exist_ok=True)
+        if codec is None:
+            codec = CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+        if codec == CODEC_ZSTD and zstandard is None:
+            raise RuntimeError("zstandard is not installed; use the zlib codec")
+        self.codec = codec
+
+    def _path(self, doc_id):
+        return os.path.join(self.root_dir, f"{doc_id}.pages")
+
+    def _legacy_path(self, doc_id):
+        return os.path.join(self.root_dir, f"{doc_id}.json")
+
+    def _compress(self, data):
+        if self.codec == CODEC_ZSTD:
+            return zstandard.ZstdCompressor(level=6).compress(data)
+        return zlib.compress(data, 6)
+
+    @staticmethod
+    def _decompress(codec, data):
+        if codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise RuntimeError("Page file uses zstd but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return zlib.decompress(data)
+
+    def exists(self, doc_id):
+        return os.path.exists(self._path(doc_id)) or os.path.exists(self._legacy_path(doc_id))
+
+    def encode(self, pages):
+        """The page file for `pages`, as bytes."""
+        blobs = [self._compress(page.get("text", "").encode("utf-8")) for page in pages]
+
+        offset = HEADER.size + INDEX_ENTRY.size * len(blobs)
+        index = bytearray()
+        for blob in blobs:
+            index += INDEX_ENTRY.pack(offset, len(blob))
+            offset += len(blob)
+        return b"".join([HEADER.pack(MAGIC, VERSION, self.codec, 0, len(blobs)), index, *blobs])
+
+    def save(self, doc_id, pages):
+        data = self.encode(pages)
+        path = self._path(doc_id)
+        # Unique temp name: several worker processes may write the same document
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        # Atomic replace so readers never see a half-written file
+        os.replace(tmp_path, path)
+
+    def _migrate_legacy(self, doc_id):
+        # Earlier versions stored uncompressed JSON; convert on first read
+        try:
+            with open(self._legacy_path(doc_id), "r", encoding="utf-8") as f:
+                pages = json.load(f)
+        except FileNotFoundError:
+            return False
+        self.save(doc_id, pages)
+        os.remove(self._legacy_path(doc_id))
+        return True
+
+    def _open(self, doc_id):
+        try:
+            return open(self._path(doc_id), "rb")
+        except FileNotFoundError:
+            if not self._migrate_legacy(doc_id):
+                return None
+            return open(self._path(doc_id), "rb")
+
+    @staticmethod
+    def _read_header(mm):
+        magic, version, codec, _, count = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not an Amori page file")
+        return codec, count
+
+    def needs_compaction(self, doc_id):
+        """True for legacy JSON files and files written with another codec than this store's."""
+        if os.path.exists(self._legacy_path(doc_id)):
+            return True
+        try:
+            with open(self._path(doc_id), "rb") as f:
+                codec, _ = self._read_header(f.read(HEADER.size))
+        except (FileNotFoundError, ValueError, struct.error):
+            return False
+        return codec != self.codec
+
+    def page_count(self, doc_id):
+        f = self._open(doc_id)
+        if f is None:
+            return None
+        with f:
+            header = f.read(HEADER.size)
+        return self._read_header(header)[1]
+
+    def load_page(self, doc_id, page_num):
+        """Returns the text of one page (1-based), or None if it doesn't exist."""
+        f = self._open(doc_id)
+        if f is None:
+            return None
+        with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            codec, count = self._read_header(mm)
+            if page_num < 1 or page_num > count:
+                return None
+            offset, length = INDEX_ENTRY.unpack_from(mm, HEADER.size + INDEX_ENTRY.size * (page_num - 1))
+            return self._decompress(codec, mm[offset:offset + length]).decode("utf-8")
+
+    def load(self, doc_id):
+        return self.load_range(doc_id)
+
+    def load_range(self, doc_id, start=1, limit=None):
+        """Returns up to `limit` pages starting at page `start` (1-based), or None if the document doesn't exist."""
+        f = self._open(doc_id)
+        if f is None:
+            return None
+        with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            codec, count = self._read_header(mm)
+            stop = count if limit is None else min(count, start - 1 + limit)
+            pages = []
+            for i in range(max(start - 1, 0), stop):
+                offset, length = INDEX_ENTRY.unpack_from(mm, HEADER.size + INDEX_ENTRY.size * i)
+                text = self._decompress(codec, mm[offset:offset + length]).decode("utf-8")
+                pages.append({"page": i + 1, "text": text})
+            return pages
+
+    def delete(self, doc_id):
+        for path in (self._path(doc_id), self._legacy_path(doc_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def disk_usage(self):
+        total = 0
+        count = 0
+        for name in os.listdir(self.root_dir):
+            if name.endswith(".pages") or name.endswith(".json"):
+                total += os.path.getsize(os.path.join(self.root_dir, name))
+                count += 1
+        return {"documents": count, "bytes": total}
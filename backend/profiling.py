@@ -0,0 +1,197 @@
+import hmac
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from metrics import REQUEST_SPANS
+
+
+class StackSampler:
+    """Statistical profiler: samples the Python stacks of all threads at a fixed interval.
+
+    Results are written in the "folded stacks" format (one `thread;frame;frame count`
+    line per distinct stack), which flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="amori-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class MemoryTracer:
+    """tracemalloc snapshots at start and stop; writes the raw snapshot and a top-50 diff."""
+
+    def __init__(self, frames=10):
+        self.frames = frames
+        self._started_here = False
+        self._before = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_here = True
+        self._before = tracemalloc.take_snapshot()
+
+    def stop(self):
+        self._after = tracemalloc.take_snapshot()
+        self.peak = tracemalloc.get_traced_memory()[1]
+        if self._started_here:
+            tracemalloc.stop()
+
+    def write(self, path):
+        # Raw snapshot for offline analysis: tracemalloc.Snapshot.load(path)
+        self._after.dump(path + ".snapshot")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Peak traced memory: {self.peak / 1024:.1f} KiB\n\n")
+            for stat in self._after.compare_to(self._before, "lineno")[:50]:
+                f.write(f"{stat}\n")
+
+
+class ProfileRecorder:
+    """Runs a profiler over a time window and writes the result to profile_dir."""
+
+    def __init__(self, profile_dir):
+        self.profile_dir = profile_dir
+        self._lock = threading.Lock()
+
+    def _new(self, mode, interval):
+        return StackSampler(interval) if mode == "sample" else MemoryTracer()
+
+    def path(self, label, mode):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        extension = "folded" if mode == "sample" else "txt"
+        safe_label = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)[:60]
+        return os.path.join(self.profile_dir, f"{stamp}-{safe_label}-{os.getpid()}.{mode}.{extension}")
+
+    def begin(self, mode, interval=0.005):
+        """Starts a profiler, or returns None if another profile is already running in this process."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            profiler = self._new(mode, interval)
+            profiler.start()
+        except Exception:
+            self._lock.release()
+            raise
+        return profiler
+
+    def end(self, profiler, label, mode):
+        try:
+            profiler.stop()
+            path = self.path(label, mode)
+            profiler.write(path)
+            return path
+        finally:
+            self._lock.release()
+
+    def list(self):
+        if not os.path.isdir(self.profile_dir):
+            return []
+        return sorted(
+            (name for name in os.listdir(self.profile_dir) if not name.endswith(".snapshot")),
+            reverse=True,
+        )
+
+
+def format_server_timing(spans, total):
+    """Server-Timing header value; repeated stages are summed, with their count as description."""
+    totals = {}
+    for name, seconds in spans:
+        previous = totals.get(name, (0.0, 0))
+        totals[name] = (previous[0] + seconds, previous[1] + 1)
+    parts = []
+    for name, (seconds, count) in totals.items():
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if count > 1:
+            part += f';desc="x{count}"'
+        parts.append(part)
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding a Server-Timing header with the stages each request went through.
+
+    An admin request carrying `X-Amori-Profile: sample` or `memory` is also
+    profiled from start to finish; the file written is named in the
+    X-Amori-Profile-File response header.
+    """
+
+    def __init__(self, app, recorder, admin_token=None):
+        self.app = app
+        self.recorder = recorder
+        self.admin_token = admin_token
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        mode = headers.get(b"x-amori-profile", b"").decode("latin-1")
+        # Bytes: compare_digest refuses non-ASCII str, and the header may be anything
+        token = headers.get(b"x-admin-token", b"")
+        profiler = None
+        if (
+            mode in ("sample", "memory") and self.admin_token
+            and hmac.compare_digest(token, self.admin_token.encode("utf-8"))
+        ):
+            profiler = self.recorder.begin(mode)
+
+        spans = []
+        reset = REQUEST_SPANS.set(spans)
+        started = time.perf_counter()
+        profile_path = None
+
+        async def send_timed(message):
+            nonlocal profile_path, profiler
+            if message["type"] == "http.response.start":
+                extra = [(b"server-timing", format_server_timing(spans, time.perf_counter() - started).encode("latin-1"))]
+                if profiler is not None:
+                    # Headers can't wait for the body: the profile covers the request up to here
+                    profile_path = self.recorder.end(profiler, scope["path"], mode)
+                    profiler = None
+                    extra.append((b"x-amori-profile-file", os.path.basename(profile_path).encode("latin-1")))
+                message = dict(message, headers=list(message.get("headers", [])) + extra)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            REQUEST_SPANS.reset(reset)
+            if profiler is not None:
+                self.recorder.end(profiler, scope["path"], mode)
@@ -0,0 +1,156 @@
+import html
+import re
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_pages (
+    rowid INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    UNIQUE (doc_id, page)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS search_text USING fts5(
+    text,
+    tokenize = "unicode61 remove_diacritics 2"
+);
+"""
+
+# Snippet highlight markers; replaced by <mark> after the snippet is HTML-escaped
+MARK_START = "\x02"
+MARK_END = "\x03"
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MIN_PREFIX_LENGTH = 3
+
+
+def build_match_query(query):
+    """Turns free text into an FTS5 query: every word must appear, the last one as a prefix (search as you type)."""
+    words = TOKEN_RE.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    # Very short prefixes match most of the vocabulary; complete those words only
+    if len(words[-1]) >= MIN_PREFIX_LENGTH:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """Full-text index of page text, stored in the shared SQLite database (FTS5).
+
+    Pages are indexed one at a time as ingestion produces them. search_pages
+    maps each FTS row to its (doc_id, page), so a document's rows can be
+    found and removed through an ordinary index.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def index_page(self, doc_id, page, text):
+        """Adds or replaces one page of a document."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT rowid FROM search_pages WHERE doc_id = ? AND page = ?", (doc_id, page)
+            ).fetchone()
+            if row is None:
+                rowid = conn.execute(
+                    "INSERT INTO search_pages (doc_id, page) VALUES (?, ?)", (doc_id, page)
+                ).lastrowid
+            else:
+                rowid = row["rowid"]
+                conn.execute("DELETE FROM search_text WHERE rowid = ?", (rowid,))
+            conn.execute("INSERT INTO search_text (rowid, text) VALUES (?, ?)", (rowid, text))
+
+    def index_document(self, doc_id, pages):
+        self.remove(doc_id)
+        for page in pages:
+            self.index_page(doc_id, page["page"], page["text"])
+
+    def remove(self, doc_id):
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM search_text WHERE rowid IN (SELECT rowid FROM search_pages WHERE doc_id = ?)",
+                (doc_id,),
+            )
+            conn.execute("DELETE FROM search_pages WHERE doc_id = ?", (doc_id,))
+
+    def is_indexed(self, doc_id):
+        row = self._connect().execute(
+            "SELECT 1 FROM search_pages WHERE doc_id = ? LIMIT 1", (doc_id,)
+        ).fetchone()
+        return row is not None
+
+    def document_ids(self):
+        rows = self._connect().execute("SELECT DISTINCT doc_id FROM search_pages").fetchall()
+        return {row["doc_id"] for row in rows}
+
+    def optimize(self):
+        """Merges the FTS index segments into one (smaller index, faster queries)."""
+        with self._connect() as conn:
+            conn.execute("INSERT INTO search_text (search_text) VALUES ('optimize')")
+
+    def search(self, query, limit=20, doc_id=None):
+        """Best-matching pages of ready documents as [{doc_id, filename, page, snippet, score}]."""
+        match = build_match_query(query)
+        if match is None:
+            return []
+        # Rank first and build snippets only for the hits returned: snippet()
+        # is far more expensive than bm25() and would otherwise run for every match
+        sql = (
+            "SELECT m.rowid, p.doc_id, d.filename, p.page, m.rank "
+            "FROM (SELECT rowid, rank FROM search_text WHERE search_text MATCH ?) m "
+            "JOIN search_pages p ON p.rowid = m.rowid "
+            "JOIN documents d ON d.doc_id = p.doc_id "
+            "WHERE d.status = 'ready'"
+        )
+        params = [match]
+        if doc_id is not None:
+            sql += " AND p.doc_id = ?"
+            params.append(doc_id)
+        sql += " ORDER BY m.rank LIMIT ?"
+        params.append(limit)
+
+        conn = self._connect()
+        hits = conn.execute(sql, params).fetchall()
+        if not hits:
+            return []
+        rowids = [hit["rowid"] for hit in hits]
+        snippets = dict(conn.execute(
+            f"SELECT rowid, snippet(search_text, 0, '{MARK_START}', '{MARK_END}', '…', 16) FROM search_text "
+            f"WHERE search_text MATCH ? AND rowid IN ({', '.join('?' * len(rowids))})",
+            (match, *rowids),
+        ).fetchall())
+
+        results = []
+        for hit in hits:
+            # Escape the page text, then turn the markers into highlights
+            snippet = html.escape(snippets.get(hit["rowid"], ""))
+            results.append({
+                "doc_id": hit["doc_id"],
+                "filename": hit["filename"],
+                "page": hit["page"],
+                "snippet": snippet.replace(MARK_START, "<mark>").replace(MARK_END, "</mark>"),
+                # bm25 ranks are lower for better matches
+                "score": round(-hit["rank"], 4),
+            })
+        return results
+
+    def stats(self):
+        row = self._connect().execute(
+            "SELECT COUNT(DISTINCT doc_id) AS documents, COUNT(*) AS pages FROM search_pages"
+        ).fetchone()
+        return {"documents": row["documents"], "pages": row["pages"]}
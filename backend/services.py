@@ -1,26 +1,66 @@
 import fitz  # PyMuPDF
-import easyocr
-import edge_tts
 import io
-from PIL import Image
-import numpy as np
+import time
+
+from metrics import stage
+from ocr_pool import ReaderPool
+from tts_backends import DEFAULT_PROFILE, default_registry
+
+# Languages EasyOCR reads when a document's own can't be told
+OCR_LANGUAGES = ['es', 'en', 'pt', 'fr']
+# Characters of text needed to detect a document's language
+MIN_DETECT_CHARS = 200
+# Pages looked at to detect it
+DETECT_SAMPLE_PAGES = 20
+
+# Render limits for page images: ~0.1x thumbnails up to ~300 DPI
+MIN_ZOOM = 0.1
+MAX_ZOOM = 300 / 72
+
+def encode_pixmap(pix, fmt="png", quality=80):
+    """Encodes a PyMuPDF pixmap as PNG (lossless), JPEG or WebP bytes."""
+    if fmt == "png":
+        return pix.tobytes("png")
+
+    from PIL import Image
+
+    mode = "RGBA" if pix.alpha else "RGB"
+    image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        image.convert("RGB").save(buffer, format="JPEG", quality=quality, optimize=True)
+    elif fmt == "webp":
+        image.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        raise ValueError(f"Unsupported image format: {fmt}")
+    return buffer.getvalue()
 
 class PDFProcessor:
-    def __init__(self):
-        # Initialize EasyOCR reader lazily
-        self.reader = None
-        self.languages = ['es', 'en', 'pt', 'fr']
-
-    def _get_reader(self):
-        if self.reader is None:
-            print("Initializing EasyOCR Reader (Lazy Loading)...")
-            try:
-                self.reader = easyocr.Reader(self.languages, verbose=False)
-                print("EasyOCR Reader Initialized.")
-            except Exception as e:
-                print(f"Error initializing EasyOCR: {e}")
-                raise e
-        return self.reader
+    def __init__(self, languages=None, max_readers=2, max_reader_bytes=None):
+        # Every language OCR may use; each document gets only its own (see detect_ocr_languages)
+        self.languages = languages or OCR_LANGUAGES
+        # EasyOCR readers are built lazily, one per language set
+        self.readers = ReaderPool(self._build_reader, max_readers=max_readers, max_bytes=max_reader_bytes)
+
+    @property
+    def reader_load_seconds(self):
+        return self.readers.last_load_seconds
+
+    def _build_reader(self, languages):
+        print(f"Initializing EasyOCR Reader for {','.join(languages)} (Lazy Loading)...")
+        try:
+            start = time.perf_counter()
+            # Imported here: easyocr pulls in torch, which takes seconds to import
+            import easyocr
+            reader = easyocr.Reader(languages, verbose=False)
+            print(f"EasyOCR Reader Initialized in {time.perf_counter() - start:.1f}s.")
+            return reader
+        except Exception as e:
+            print(f"Error initializing EasyOCR: {e}")
+            raise e
+
+    def _get_reader(self, languages=None):
+        return self.readers.get(languages or self.languages)
 
     def clean_text(self, text):
         """Cleans text for smoother TTS: removes newlines, fixes spacing."""
@@ -30,64 +70,202 @@ class PDFProcessor:
         text = ' '.join(text.split())
         return text
 
-    def process_pdf(self, source):
+    def _open(self, source):
         # Support both file path (str) and bytes
         if isinstance(source, str):
-            doc = fitz.open(source)
-        else:
-            doc = fitz.open(stream=source, filetype="pdf")
-            
-        pages_data = []
+            return fitz.open(source)
+        return fitz.open(stream=source, filetype="pdf")
 
-        for page_num, page in enumerate(doc):
-            text = page.get_text()
-            
-            # Simple heuristic: if text is very short, try OCR
-            if len(text.strip()) < 50:
-                print(f"Page {page_num + 1}: Low text content, attempting OCR...")
-                try:
-                    reader = self._get_reader()
-                    pix = page.get_pixmap()
-                    img_bytes = pix.tobytes("png")
-                    image = Image.open(io.BytesIO(img_bytes))
-                    
-                    # Convert to numpy array for EasyOCR
-                    image_np = np.array(image)
-                    
-                    # Perform OCR
-                    result = reader.readtext(image_np, detail=0)
-                    text = " ".join(result)
-                except Exception as e:
-                    print(f"OCR Error on page {page_num + 1}: {e}")
-                    text = "" # Fallback
-            
-            # Clean the text for better TTS fluidity
-            cleaned_text = self.clean_text(text)
+    def count_pages(self, source):
+        with self._open(source) as doc:
+            return len(doc)
 
-            pages_data.append({
-                "page": page_num + 1,
-                "text": cleaned_text
-            })
-            
-        return pages_data
+    def get_outline(self, source):
+        """PDF bookmarks as [(level, title, page)], page 1-based; empty if the PDF has none."""
+        with self._open(source) as doc:
+            return [(level, title, page) for level, title, page in doc.get_toc(simple=True)]
 
-    def get_page_image(self, file_path, page_num):
-        with fitz.open(file_path) as doc:
+    def process_pdf(self, source):
+        return list(self.iter_pages(source))
+
+    def iter_pages(self, source, start_page=1, ocr_languages=None, on_ocr_languages=None):
+        """Yields {"page", "text"} for each page from start_page on, so callers can checkpoint.
+
+        Scanned pages are read with ocr_languages. Without them, the languages are
+        detected at the first scanned page and passed to on_ocr_languages, so the
+        caller can keep them for later runs.
+        """
+        with self._open(source) as doc:
+            languages = ocr_languages
+            detected_texts = {} # Pages already OCR'd to detect the languages
+            for page_num in range(start_page - 1, len(doc)):
+                page = doc[page_num]
+                with stage("extract_text"):
+                    text = page.get_text()
+                # Simple heuristic: if text is very short, try OCR
+                if len(text.strip()) < 50:
+                    if languages is None:
+                        languages = self.detect_ocr_languages(doc, ocr_texts=detected_texts)
+                        if on_ocr_languages:
+                            on_ocr_languages(languages)
+                    if page_num in detected_texts:
+                        text = detected_texts.pop(page_num)
+                    else:
+                        text = self._ocr_page(page, page_num, languages)
+                # Clean the text for better TTS fluidity
+                yield {"page": page_num + 1, "text": self.clean_text(text)}
+
+    def detect_ocr_languages(self, doc, ocr_texts=None):
+        """The document's language as a one-language OCR set, or all of self.languages if unsure.
+
+        Read from the text layer when there is enough of it; otherwise one scanned
+        page is OCR'd with every language first. The text of the pages OCR'd here
+        goes into ocr_texts (page index -> text), so they aren't read twice.
+        """
+        sample = range(min(len(doc), DETECT_SAMPLE_PAGES))
+        text = " ".join(doc[n].get_text() for n in sample)
+        if len(text.strip()) < MIN_DETECT_CHARS:
+            for n in sample:
+                if len(doc[n].get_text().strip()) < 50:
+                    text = self._ocr_page(doc[n], n, self.languages)
+                    if ocr_texts is not None:
+                        ocr_texts[n] = text
+                    if len(text.strip()) >= MIN_DETECT_CHARS:
+                        break
+        try:
+            from langdetect import DetectorFactory, detect
+            DetectorFactory.seed = 0 # Same answer for the same text
+            language = detect(text)
+        except Exception:
+            language = None
+        languages = [language] if language in self.languages else self.languages
+        print(f"OCR languages: {','.join(languages)}")
+        return languages
+
+    def _ocr_page(self, page, page_num, languages):
+        print(f"Page {page_num + 1}: Low text content, attempting OCR...")
+        try:
+            from PIL import Image
+            import numpy as np
+
+            reader = self._get_reader(languages)
+            pix = page.get_pixmap()
+            img_bytes = pix.tobytes("png")
+            image = Image.open(io.BytesIO(img_bytes))
+
+            # Convert to numpy array for EasyOCR
+            image_np = np.array(image)
+
+            # Perform OCR
+            with stage("ocr"):
+                result = reader.readtext(image_np, detail=0)
+            return " ".join(result)
+        except Exception as e:
+            print(f"OCR Error on page {page_num + 1}: {e}")
+            return "" # Fallback
+
+    def get_page_image(self, file_path, page_num, width=None, dpi=None, fmt="png", quality=80):
+        with stage("pdf_open"):
+            doc = fitz.open(file_path)
+        with doc:
             if page_num < 1 or page_num > len(doc):
                 return None
             
-            page = doc[page_num - 1]
-            # Render page to an image (pixmap)
-            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2)) # Zoom x2 for better quality
-            return pix.tobytes("png")
+            return self.render_page(doc[page_num - 1], width=width, dpi=dpi, fmt=fmt, quality=quality)
+
+    def render_page(self, page, width=None, dpi=None, fmt="png", quality=80):
+        """Renders a page at a target pixel width or DPI (default: zoom x2) and encodes it."""
+        pix = self._render_pixmap(page, width, dpi)
+        with stage("encode"):
+            return encode_pixmap(pix, fmt, quality)
+
+    def _render_pixmap(self, page, width=None, dpi=None):
+        zoom = self._zoom(page, width, dpi)
+        # Render page to an image (pixmap)
+        with stage("render"):
+            return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+
+    @staticmethod
+    def _zoom(page, width=None, dpi=None):
+        if width:
+            zoom = width / page.rect.width
+        elif dpi:
+            zoom = dpi / 72
+        else:
+            zoom = 2 # Zoom x2 for better quality
+        return max(MIN_ZOOM, min(zoom, MAX_ZOOM))
+
+    def iter_page_images(self, file_path, pages=None, width=None, dpi=None, fmt="png", quality=80):
+        """Yields (page_num, image_bytes) for several pages, opening the PDF only once."""
+        with stage("pdf_open"):
+            doc = fitz.open(file_path)
+        with doc:
+            if pages is None:
+                pages = range(1, len(doc) + 1)
+            for page_num in pages:
+                if 1 <= page_num <= len(doc):
+                    yield page_num, self.render_page(doc[page_num - 1], width=width, dpi=dpi, fmt=fmt, quality=quality)
+
+    def render_sprite(self, file_path, pages, width=None, dpi=None, columns=10, fmt="webp", quality=80):
+        """Renders pages side by side into one sprite sheet, row-major, `columns` per row.
+
+        Returns (image_bytes, cell_width, cell_height), or None if no page exists.
+        Every cell is cell_width wide; shorter pages are top-aligned in their cell.
+        Pages are pasted one at a time, so only the sheet and a single page are
+        in memory at once.
+        """
+        from PIL import Image
+
+        with fitz.open(file_path) as doc:
+            pages = [doc[n - 1] for n in pages if 1 <= n <= len(doc)]
+            if not pages:
+                return None
+
+            # Cell size from the page sizes, before rendering any of them
+            sizes = []
+            for page in pages:
+                zoom = self._zoom(page, width, dpi)
+                size = (page.rect * fitz.Matrix(zoom, zoom)).irect
+                sizes.append((size.width, size.height))
+            cell_width = max(w for w, _ in sizes)
+            cell_height = max(h for _, h in sizes)
+            columns = min(columns, len(pages))
+            rows = -(-len(pages) // columns)
+            sheet = Image.new("RGB", (cell_width * columns, cell_height * rows), "white")
+            for i, page in enumerate(pages):
+                pix = self._render_pixmap(page, width, dpi)
+                tile = Image.frombytes("RGBA" if pix.alpha else "RGB", (pix.width, pix.height), pix.samples)
+                sheet.paste(tile, ((i % columns) * cell_width, (i // columns) * cell_height))
+                del pix, tile
+
+        buffer = io.BytesIO()
+        if fmt == "png":
+            sheet.save(buffer, format="PNG", optimize=True)
+        elif fmt == "jpeg":
+            sheet.save(buffer, format="JPEG", quality=quality, optimize=True)
+        else:
+            sheet.save(buffer, format="WEBP", quality=quality, method=4)
+        return buffer.getvalue(), cell_width, cell_height
+
+_tts_backends = None
+
+def tts_backends():
+    """Engine registry shared by every TTSGenerator, built on first use."""
+    global _tts_backends
+    if _tts_backends is None:
+        _tts_backends = default_registry()
+    return _tts_backends
 
 class TTSGenerator:
-    def __init__(self, voice="es-AR-TomasNeural"): # Default to Spanish voice
+    def __init__(self, voice="es-AR-TomasNeural", backends=None): # Default to Spanish voice
         self.voice = voice
+        self.backends = backends or tts_backends()
 
-    async def generate_audio(self, text, output_file):
+    async def generate_audio(self, text, output_file, preview=False, fallback=True, profile=DEFAULT_PROFILE):
+        """Writes output_file; returns (engine name, whether a fallback engine was used)."""
         if not text.strip():
             return None
-        communicate = edge_tts.Communicate(text, self.voice)
-        await communicate.save(output_file)
-        return output_file
+        with stage("generate_audio"):
+            return await self.backends.synthesize(
+                text, self.voice, output_file, preview=preview, fallback=fallback, profile=profile,
+            )
@@ -0,0 +1,169 @@
+"""The built frontend (frontend/dist), served from an in-memory manifest.
+
+Files are listed once at startup, so a request never has to ask the
+filesystem whether a path exists. Text files go out gzip- or
+Brotli-compressed when the client accepts it: `.gz`/`.br` files next to them
+in dist are used as they are, the rest are compressed once by precompress()
+and kept in memory (Brotli needs the `brotli` package). A request never
+compresses anything itself: until precompress() gets to a file, it goes out
+as it is.
+
+Vite names everything under assets/ after its content, so those files are
+cached forever. index.html and the files copied from public/ are revalidated
+with their ETag instead.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from fastapi.responses import FileResponse, Response
+
+from http_cache import IMMUTABLE, etag_matches, negotiate_encoding, not_modified
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Vite's default output names: "assets/index-B7a9_kQ2.js"
+HASHED_RE = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+COMPRESSIBLE_TYPES = (
+    "text/", "application/javascript", "application/json", "application/manifest+json",
+    "application/xml", "application/wasm", "image/svg+xml",
+)
+# Below this, compression saves less than it costs
+MIN_COMPRESS_SIZE = 1024
+# Preferred first
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+REVALIDATE = "no-cache"
+
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+mimetypes.add_type("text/javascript", ".js")
+mimetypes.add_type("text/javascript", ".mjs")
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class StaticSite:
+    """A single-page app: its files by URL path, index.html for every other path."""
+
+    def __init__(self, root, index="index.html"):
+        self.root = root
+        self.index = index
+        self.files = {}
+        self._compressed = {} # (path, encoding) -> bytes, or None when not smaller
+        self._lock = threading.Lock()
+        self.scan()
+
+    def scan(self):
+        files = {}
+        if os.path.isdir(self.root):
+            for directory, _, names in os.walk(self.root):
+                for name in names:
+                    full_path = os.path.join(directory, name)
+                    if name.endswith(tuple(ENCODINGS.values())) and os.path.exists(full_path[:-3]):
+                        continue # A variant of another file
+                    path = os.path.relpath(full_path, self.root).replace(os.sep, "/")
+                    files[path] = self._entry(path, full_path)
+        self.files = files
+        self._compressed = {}
+        print(f"Frontend: {len(files)} files in {self.root}.")
+
+    @staticmethod
+    def _entry(path, full_path):
+        with open(full_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        size = os.path.getsize(full_path)
+        variants = {
+            encoding: full_path + suffix
+            for encoding, suffix in ENCODINGS.items() if os.path.exists(full_path + suffix)
+        }
+        compressible = media_type.startswith(COMPRESSIBLE_TYPES) and size >= MIN_COMPRESS_SIZE
+        return {
+            "path": path,
+            "file": full_path,
+            "media_type": media_type,
+            "etag": f'"{digest[:32]}"',
+            "hashed": bool(HASHED_RE.match(path)),
+            "variants": variants,
+            "encodings": [
+                encoding for encoding in ENCODINGS
+                if encoding in variants or (compressible and (encoding != "br" or brotli is not None))
+            ],
+        }
+
+    def ready_encodings(self, entry):
+        """The encodings of `entry` that can be sent without compressing anything now."""
+        with self._lock:
+            return [
+                encoding for encoding in entry["encodings"]
+                if encoding in entry["variants"] or self._compressed.get((entry["path"], encoding)) is not None
+            ]
+
+    def encoded(self, entry, encoding):
+        """The file's bytes in `encoding`, or None when that isn't smaller than the file itself."""
+        key = (entry["path"], encoding)
+        with self._lock:
+            if key in self._compressed:
+                return self._compressed[key]
+        if encoding in entry["variants"]:
+            with open(entry["variants"][encoding], "rb") as f:
+                data = f.read()
+        else:
+            with open(entry["file"], "rb") as f:
+                original = f.read()
+            data = compress(original, encoding)
+            if len(data) >= len(original):
+                data = None
+        with self._lock:
+            self._compressed[key] = data
+        return data
+
+    def precompress(self):
+        """Compresses every file up front, so no request waits for it."""
+        for entry in list(self.files.values()):
+            for encoding in entry["encodings"]:
+                self.encoded(entry, encoding)
+
+    def response(self, request, path):
+        """The file at `path`, index.html for client-side routes, or None if the frontend isn't built."""
+        entry = self.files.get(path) if path else None
+        if entry is None:
+            if HASHED_RE.match(path):
+                # An asset of an older build: index.html would fail to parse as a script
+                return Response(status_code=404, headers={"Cache-Control": "no-store"})
+            entry = self.files.get(self.index)
+            if entry is None:
+                return None
+
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""), self.ready_encodings(entry))
+        data = self.encoded(entry, encoding) if encoding else None
+        if data is None:
+            encoding = None
+        # Each encoding is its own representation, with its own ETag
+        etag = entry["etag"] if encoding is None else f'{entry["etag"][:-1]}-{encoding}"'
+        cache_control = IMMUTABLE if entry["hashed"] else REVALIDATE
+        vary = {"Vary": "Accept-Encoding"} if entry["encodings"] else {}
+        if etag_matches(request, etag):
+            response = not_modified(etag, cache_control)
+            response.headers.update(vary)
+            return response
+
+        headers = {"ETag": etag, "Cache-Control": cache_control, **vary}
+        if encoding is None:
+            return FileResponse(entry["file"], media_type=entry["media_type"], headers=headers)
+        headers["Content-Encoding"] = encoding
+        return Response(data, media_type=entry["media_type"], headers=headers)
+
+    def stats(self):
+        with self._lock:
+            compressed = [data for data in self._compressed.values() if data is not None]
+        return {"files": len(self.files), "compressed": len(compressed), "compressed_bytes": sum(map(len, compressed))}
@@ -0,0 +1,92 @@
+import os
+import struct
+import sys
+import uuid
+
+import fitz
+
+# Setup path to find audiobook
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+from audiobook import build_chapter_tag, mp3_duration_ms, page_chapters, strip_tags, write_audiobook
+
+# One MPEG-2 Layer III frame, 24 kHz / 48 kbps mono like edge-tts output: 144 bytes, 24 ms
+FRAME = b"\xff\xf3\x64\xc4" + bytes(140)
+
+def mp3(seconds, tagged=False):
+    data = FRAME * int(seconds * 1000 / 24)
+    if tagged:
+        data = b"ID3\x04\x00\x00\x00\x00\x00\x05" + bytes(5) + data + b"TAG" + bytes(125)
+    return data
+
+def test_duration_is_summed_over_frames_without_tags():
+    assert mp3_duration_ms(mp3(1.2)) == 1200
+    assert strip_tags(mp3(1.2, tagged=True)) == mp3(1.2)
+    # Garbage between frames is skipped
+    assert mp3_duration_ms(FRAME + b"\x00\x01" + FRAME) == 48
+
+def test_chapters_come_from_top_level_outline_entries():
+    outline = [(1, "Prólogo", 2), (2, "Sección", 3), (1, "Capítulo 1", 4), (1, "Fuera", 40)]
+    assert page_chapters(outline, 10) == [("Inicio", 1), ("Prólogo", 2), ("Capítulo 1", 4)]
+    # Without an outline, pages are grouped so there are at most 255 chapters
+    assert len(page_chapters([], 600)) == 200
+    assert page_chapters([], 2) == [("Página 1", 1), ("Página 2", 2)]
+
+def test_audiobook_joins_pages_with_chapter_frames(tmp_path):
+    pages = []
+    for n, seconds in enumerate([1.2, 2.4, 0.48], start=1):
+        path = tmp_path / f"p{n}.mp3"
+        path.write_bytes(mp3(seconds, tagged=n == 2))
+        pages.append(str(path))
+
+    output = tmp_path / "libro.mp3"
+    duration = write_audiobook(str(output), "Libro", pages, [("Uno", 1), ("Dos", 2)])
+    assert duration == 4080
+
+    data = output.read_bytes()
+    tag = build_chapter_tag("Libro", [("Uno", 0, 1200), ("Dos", 1200, 4080)])
+    assert data.startswith(tag)
+    assert data[len(tag):] == mp3(1.2) + mp3(2.4) + mp3(0.48)
+    chap = data.index(b"CHAP")
+    # Element id, then start/end times in ms
+    assert data[chap + 10:chap + 14] == b"ch0\x00"
+    assert struct.unpack(">II", data[chap + 14:chap + 22]) == (0, 1200)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp") or name.endswith(".frames")]
+
+def test_export_job_reuses_cached_page_audio(tmp_path):
+    import main
+
+    pdf = fitz.open()
+    for i in range(3):
+        pdf.new_page().insert_text((72, 72), f"Página {i + 1}")
+    pdf.set_toc([[1, "Primera parte", 1], [1, "Segunda parte", 3]])
+    pdf_path = str(tmp_path / "libro.pdf")
+    pdf.save(pdf_path)
+
+    doc_id = str(uuid.uuid4())
+    main.doc_store.create(doc_id, "libro.pdf", pdf_path, status="ready", total_pages=3)
+    voice = "es-AR-TomasNeural"
+    for n in range(1, 4):
+        with open(main.audio_cache_path(doc_id, n, voice), "wb") as f:
+            f.write(mp3(0.48))
+    try:
+        main.run_audiobook_job({"job_id": -1, "doc_id": doc_id, "payload": {"voice": voice}})
+        data = open(main.audiobook_path(doc_id, voice), "rb").read()
+        assert data.count(b"CHAP") == 2
+        assert data.endswith(mp3(0.48) * 3)
+        assert main.event_log.since(doc_id, 0)[-1]["data"]["status"] == "ready"
+    finally:
+        for n in range(1, 4):
+            os.remove(main.audio_cache_path(doc_id, n, voice))
+        main.job_queue.fail(-1, "test")
+        main.doc_store.delete(doc_id)
+        os.remove(main.audiobook_path(doc_id, voice))
+
+def test_exports_have_their_own_job_slots():
+    import main
+
+    pools = [main.job_workers, main.background_workers, main.audiobook_workers]
+    # No pool shares a kind (and so a concurrency limit) with exports
+    assert [pool for pool in pools if "audiobook" in pool.handlers] == [main.audiobook_workers]
+    assert list(main.audiobook_workers.handlers) == ["audiobook"]
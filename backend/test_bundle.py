@@ -0,0 +1,40 @@
+import io
+import json
+import os
+import sys
+import tarfile
+import zipfile
+
+from fastapi.testclient import TestClient
+
+# Setup path to find main
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+import main
+
+client = TestClient(main.app)
+
+def test_offline_bundle_streams_text_images_and_cached_audio(make_document):
+    doc_id = make_document()
+    audio_path = main.audio_cache_path(doc_id, 2, "es-AR-TomasNeural")
+    with open(audio_path, "wb") as f:
+        f.write(b"ID3" + bytes(100))
+    response = client.get(f"/document/{doc_id}/bundle", params={"width": 100})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    bundle = zipfile.ZipFile(io.BytesIO(response.content))
+    assert bundle.read("text/0001.txt").decode("utf-8") == "Página 1"
+    assert bundle.read("audio/0002.mp3") == b"ID3" + bytes(100)
+    manifest = json.loads(bundle.read("manifest.json"))
+    assert [page.get("audio") for page in manifest["pages"]] == [None, "audio/0002.mp3"]
+    assert manifest["pages"][0]["image"] == "images/0001.webp"
+    assert bundle.read("images/0001.webp")[8:12] == b"WEBP"
+
+    tar = client.get(f"/document/{doc_id}/bundle", params={"start": 2, "archive": "tar", "audio": "none", "image_format": "png"})
+    names = tarfile.open(fileobj=io.BytesIO(tar.content)).getnames()
+    assert names == ["text/0002.txt", "images/0002.png", "manifest.json"]
+
+    assert client.get(f"/document/{doc_id}/bundle", params={"start": 3}).status_code == 404
+    assert client.get(f"/document/{doc_id}/bundle", params={"archive": "rar"}).status_code == 400
+    assert client.get(f"/document/{doc_id}/bundle", params={"voice": "../../uploads/x"}).status_code == 400
@@ -0,0 +1,84 @@
+import os
+import sys
+
+# Setup path to find document_store
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+from document_store import DocumentStore
+
+def test_library_lists_ready_documents_with_progress(tmp_path):
+    store = DocumentStore(str(tmp_path / "amori.db"))
+    store.create("a", "uno.pdf", "uploads/a.pdf")
+    store.create("b", "dos.pdf", "uploads/b.pdf")
+    store.update("a", status="ready", total_pages=10)
+    store.update("a", last_page=4)
+
+    assert store.list_library() == [{
+        "doc_id": "a", "filename": "uno.pdf", "path": "uploads/a.pdf",
+        "total_pages": 10, "last_page": 4,
+    }]
+    assert store.find_by_filename("dos.pdf")["status"] == "processing"
+    assert store.delete("b") is True
+    assert store.get("b") is None
+
+def test_legacy_library_is_imported_once(tmp_path):
+    db_path = str(tmp_path / "amori.db")
+    library = [
+        {"doc_id": "x", "filename": "x.pdf", "path": "uploads/x.pdf", "total_pages": 3, "last_page": 2},
+        {"doc_id": "y", "filename": "y.pdf", "path": "uploads/y.pdf", "pages": [{"page": 1, "text": "hola"}], "summary": "Resumen"},
+    ]
+    assert DocumentStore(db_path).import_library(library) == ["x", "y"]
+    # A second worker starting up doesn't import again
+    assert DocumentStore(db_path).import_library(library) == []
+    assert DocumentStore(db_path).library_imported()
+
+    books = DocumentStore(db_path).list_library()
+    assert [b["doc_id"] for b in books] == ["x", "y"]
+    assert books[1]["total_pages"] == 1
+    assert books[1]["summary"] == "Resumen"
+
+def test_changes_since_sequence_with_tombstones(tmp_path):
+    store = DocumentStore(str(tmp_path / "amori.db"))
+    store.create("a", "uno.pdf", "uploads/a.pdf", status="ready", total_pages=3)
+    store.create("b", "dos.pdf", "uploads/b.pdf", status="ready", total_pages=5)
+
+    first = store.changes(0)
+    assert first["reset"] is True
+    assert [book["doc_id"] for book in first["changes"]] == ["a", "b"]
+
+    store.update("b", last_page=4)
+    store.create("c", "tres.pdf", "uploads/c.pdf") # Still processing: not in the library yet
+    store.delete("a")
+    delta = store.changes(first["seq"])
+    assert delta["reset"] is False
+    assert delta["changes"] == [{
+        "doc_id": "b", "filename": "dos.pdf", "path": "uploads/b.pdf", "total_pages": 5, "last_page": 4,
+    }]
+    assert delta["deleted"] == ["a"]
+
+    assert store.changes(delta["seq"]) == {"seq": delta["seq"], "reset": False, "changes": [], "deleted": []}
+    # A sequence this database never issued (e.g. it was recreated) forces a full reload
+    assert store.changes(delta["seq"] + 100)["reset"] is True
+
+def test_deleted_legacy_book_keeps_its_pages_deleted(tmp_path, monkeypatch):
+    import json
+    import main
+    from page_store import PageStore
+
+    library_file = tmp_path / "library.json"
+    library_file.write_text(json.dumps([
+        {"doc_id": "viejo", "filename": "viejo.pdf", "path": "uploads/viejo.pdf", "pages": [{"page": 1, "text": "hola"}]},
+    ]))
+    monkeypatch.setattr(main, "LIBRARY_FILE", str(library_file))
+    monkeypatch.setattr(main, "doc_store", DocumentStore(str(tmp_path / "amori.db")))
+    monkeypatch.setattr(main, "page_store", PageStore(str(tmp_path / "page_text")))
+
+    main.import_legacy_library()
+    assert main.page_store.load_page("viejo", 1) == "hola"
+
+    main.doc_store.delete("viejo")
+    main.page_store.delete("viejo")
+    main.import_legacy_library() # Next start
+    assert not main.page_store.exists("viejo")
+    assert main.doc_store.get("viejo") is None
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import sys
+
+# Setup path to find events
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+from events import EventLog, format_sse
+
+def test_events_are_scoped_per_document_and_resumable(tmp_path):
+    log = EventLog(str(tmp_path / "amori.db"))
+    log.publish("a", "page", {"page": 1})
+    log.publish("b", "page", {"page": 1})
+    log.publish("a", "status", {"status": "ready"})
+
+    events = log.since("a", 0)
+    assert [e["type"] for e in events] == ["page", "status"]
+    assert events[1]["data"] == {"status": "ready", "doc_id": "a"}
+    # A reconnecting client only gets what it missed
+    assert log.since("a", events[0]["seq"]) == events[1:]
+
+def test_format_sse_message():
+    message = format_sse({"seq": 7, "type": "summary", "data": {"summary": "Resumen"}})
+    assert message == 'id: 7\nevent: summary\ndata: {"summary": "Resumen"}\n\n'
+
+def test_stream_wakes_immediately_on_publish(tmp_path):
+    log = EventLog(str(tmp_path / "amori.db"))
+
+    async def scenario():
+        stream = log.stream("doc", log.last_seq(), poll_interval=30)
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.1)
+        # Published from a worker thread, like the ingestion job does
+        await asyncio.to_thread(log.publish, "doc", "page", {"page": 3})
+        message = await asyncio.wait_for(first, timeout=2)
+        await stream.aclose()
+        return message
+
+    message = asyncio.run(scenario())
+    assert "event: page" in message
+    assert '"page": 3' in message
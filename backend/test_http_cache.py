@@ -0,0 +1,108 @@
+import os
+import sys
+
+import fitz
+from fastapi.testclient import TestClient
+
+# Setup path to find main
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+import main
+
+client = TestClient(main.app)
+
+def test_page_image_is_immutable_and_revalidates_with_304(make_document):
+    doc_id = make_document()
+    first = client.get(f"/document/{doc_id}/image/1")
+    assert first.status_code == 200
+    assert "immutable" in first.headers["cache-control"]
+    etag = first.headers["etag"]
+
+    again = client.get(f"/document/{doc_id}/image/1", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+    other_page = client.get(f"/document/{doc_id}/image/2", headers={"If-None-Match": etag})
+    assert other_page.status_code == 200
+    assert client.get(f"/document/{doc_id}/image/3").status_code == 404
+
+def test_cached_audio_supports_etag_and_byte_ranges(make_document):
+    doc_id = make_document()
+    audio_path = os.path.join(main.AUDIO_DIR, f"{doc_id}_p1_es-AR-TomasNeural_smooth.mp3")
+    with open(audio_path, "wb") as f:
+        f.write(bytes(range(256)) * 8)
+    full = client.get(f"/audio/{doc_id}/1")
+    assert full.status_code == 200
+    assert full.headers["accept-ranges"] == "bytes"
+    assert "immutable" in full.headers["cache-control"]
+    etag = full.headers["etag"]
+
+    assert client.get(f"/audio/{doc_id}/1", headers={"If-None-Match": etag}).status_code == 304
+
+    partial = client.get(f"/audio/{doc_id}/1", headers={"Range": "bytes=100-199"})
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == "bytes 100-199/2048"
+    assert partial.content == full.content[100:200]
+
+def test_page_image_sizes_and_formats(make_document):
+    doc_id = make_document()
+    png = client.get(f"/document/{doc_id}/image/1", params={"width": 300})
+    assert png.headers["content-type"] == "image/png"
+    assert "Accept" in png.headers["vary"]
+    assert fitz.Pixmap(png.content).width == 300
+
+    webp = client.get(f"/document/{doc_id}/image/1", params={"width": 300}, headers={"Accept": "image/webp,*/*"})
+    assert webp.headers["content-type"] == "image/webp"
+    assert webp.headers["etag"] != png.headers["etag"]
+
+    jpeg = client.get(f"/document/{doc_id}/image/1", params={"dpi": 72, "format": "jpg", "quality": 50})
+    assert jpeg.headers["content-type"] == "image/jpeg"
+    assert "Accept" not in jpeg.headers.get("vary", "")
+    assert jpeg.content[:2] == b"\xff\xd8"
+
+    assert client.get(f"/document/{doc_id}/image/1", params={"format": "gif"}).status_code == 400
+    assert client.get(f"/document/{doc_id}/image/1", params={"width": 100000}).status_code == 400
+
+def test_thumbnails_are_rendered_by_job_and_on_demand(make_document):
+    doc_id = make_document()
+    main.run_thumbnails_job({"doc_id": doc_id})
+    assert os.path.exists(main.thumbnail_path(doc_id, 2))
+    os.remove(main.thumbnail_path(doc_id, 2))
+
+    thumb = client.get(f"/document/{doc_id}/thumbnail/2")
+    assert thumb.status_code == 200
+    assert thumb.headers["content-type"] == "image/webp"
+    assert os.path.exists(main.thumbnail_path(doc_id, 2))
+    assert client.get(f"/document/{doc_id}/thumbnail/2", headers={"If-None-Match": thumb.headers["etag"]}).status_code == 304
+    assert client.get(f"/document/{doc_id}/thumbnail/3").status_code == 404
+
+    # Deleting the book removes its thumbnails
+    client.delete(f"/library/{doc_id}")
+    assert not os.path.exists(os.path.join(main.THUMBNAIL_DIR, doc_id))
+
+def test_batch_page_images_multipart_and_sprite(make_document):
+    doc_id = make_document()
+    batch = client.get(f"/document/{doc_id}/images", params={"start": 1, "count": 5, "width": 100, "format": "png"})
+    assert batch.status_code == 200
+    boundary = batch.headers["content-type"].split("boundary=")[1]
+    parts = batch.content.split(f"--{boundary}".encode())[1:-1]
+    # Clamped to the two pages the document has
+    assert len(parts) == 2
+    head, body = parts[1].split(b"\r\n\r\n", 1)
+    assert b"X-Page: 2" in head
+    assert fitz.Pixmap(body[:-2]).width == 100
+    assert client.get(f"/document/{doc_id}/images", params={"start": 1, "count": 5, "width": 100, "format": "png"},
+                      headers={"If-None-Match": batch.headers["etag"]}).status_code == 304
+
+    sprite = client.get(f"/document/{doc_id}/images", params={"layout": "sprite", "format": "png", "width": 80})
+    assert sprite.headers["x-sprite-columns"] == "2"
+    cell_width = int(sprite.headers["x-sprite-cell-width"])
+    assert fitz.Pixmap(sprite.content).width == 2 * cell_width == 160
+    assert fitz.Pixmap(sprite.content).height == int(sprite.headers["x-sprite-cell-height"])
+    # Thumbnail sizes only
+    assert client.get(f"/document/{doc_id}/images", params={"layout": "sprite", "width": 2000}).status_code == 400
+    assert client.get(f"/document/{doc_id}/images", params={"layout": "sprite", "dpi": 300}).status_code == 400
+
+    assert client.get(f"/document/{doc_id}/images", params={"start": 3}).status_code == 404
+    assert client.get(f"/document/{doc_id}/images", params={"count": 500}).status_code == 400
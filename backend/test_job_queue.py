@@ -0,0 +1,120 @@
+import os
+import sys
+import threading
+import time
+
+# Setup path to find job_queue
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+from job_queue import JobQueue, JobWorkerPool
+
+def test_job_is_claimed_by_exactly_one_worker(tmp_path):
+    db_path = str(tmp_path / "amori.db")
+    JobQueue(db_path).enqueue("doc", "ingest")
+
+    claimed = []
+    def worker(n):
+        # Each thread opens its own queue, like separate worker processes
+        job = JobQueue(db_path).claim_next(f"worker-{n}", max_running=10)
+        if job:
+            claimed.append(job["job_id"])
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(claimed) == 1
+
+def test_small_documents_run_first_within_the_concurrency_limit(tmp_path):
+    queue = JobQueue(str(tmp_path / "amori.db"))
+    queue.enqueue("scan", "ingest", priority=900)
+    queue.enqueue("short", "ingest", priority=5)
+    queue.enqueue("medium", "ingest", priority=40)
+
+    assert queue.claim_next("w", max_running=2)["doc_id"] == "short"
+    assert queue.claim_next("w", max_running=2)["doc_id"] == "medium"
+    # Admission control: two jobs already running
+    assert queue.claim_next("w", max_running=2) is None
+
+def test_stale_job_is_requeued_with_its_checkpoint(tmp_path):
+    queue = JobQueue(str(tmp_path / "amori.db"), stale_after=0.05)
+    job_id = queue.enqueue("doc", "ingest", total_pages=3)
+    job = queue.claim_next("crashed-worker", max_running=1)
+    queue.save_page(job_id, 1, "uno")
+    queue.save_page(job_id, 2, "dos")
+
+    time.sleep(0.1)
+    assert queue.requeue_stale() == [job_id]
+
+    resumed = queue.claim_next("new-worker", max_running=1)
+    assert resumed["job_id"] == job_id
+    assert resumed["attempts"] == 2
+    assert queue.checkpoint(job_id) == {1: "uno", 2: "dos"}
+
+    queue.complete(job_id)
+    assert queue.get(job_id)["status"] == "done"
+    assert queue.checkpoint(job_id) == {}
+
+def test_job_that_keeps_crashing_is_given_up(tmp_path):
+    queue = JobQueue(str(tmp_path / "amori.db"), stale_after=0.01, max_attempts=2)
+    job_id = queue.enqueue("doc", "ingest")
+    given_up = []
+    for _ in range(2):
+        queue.claim_next("w", max_running=1)
+        time.sleep(0.02)
+        queue.requeue_stale(lambda job, error: given_up.append((job["job_id"], job["kind"], error)))
+    assert queue.get(job_id)["status"] == "error"
+    assert given_up == [(job_id, "ingest", queue.get(job_id)["error"])]
+
+def test_worker_pool_runs_handlers_and_records_failures(tmp_path):
+    queue = JobQueue(str(tmp_path / "amori.db"))
+    seen = []
+
+    def handle(job):
+        if job["doc_id"] == "broken":
+            raise RuntimeError("PDF dañado")
+        seen.append(job["doc_id"])
+
+    ok_id = queue.enqueue("ok", "ingest")
+    broken_id = queue.enqueue("broken", "ingest")
+    pool = JobWorkerPool(queue, {"ingest": handle}, concurrency=2, poll_interval=0.05)
+    pool.start()
+    try:
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            if queue.get(ok_id)["status"] == "done" and queue.get(broken_id)["status"] == "error":
+                break
+            time.sleep(0.02)
+    finally:
+        pool.stop()
+
+    assert seen == ["ok"]
+    assert queue.get(broken_id)["error"] == "PDF dañado"
+
+def test_each_group_of_kinds_has_its_own_limit(tmp_path):
+    queue = JobQueue(str(tmp_path / "amori.db"))
+    queue.enqueue("a", "thumbnails", priority=0)
+    queue.enqueue("b", "thumbnails", priority=0)
+    queue.enqueue("c", "ingest", priority=10)
+
+    assert queue.claim_next("w", max_running=1, kinds=["thumbnails"])["doc_id"] == "a"
+    assert queue.claim_next("w", max_running=1, kinds=["thumbnails"]) is None
+    # A running thumbnail job doesn't take the ingest slot
+    assert queue.claim_next("w", max_running=1, kinds=["ingest"])["doc_id"] == "c"
+
+def test_given_up_ingest_marks_the_document_as_failed(tmp_path):
+    import main
+
+    doc_id = f"poison-{os.getpid()}"
+    main.doc_store.create(doc_id, "veneno.pdf", str(tmp_path / "veneno.pdf"), status="processing")
+    try:
+        main.give_up_job({"job_id": -1, "doc_id": doc_id, "kind": "ingest"}, "Worker stopped repeatedly")
+        doc = main.doc_store.get(doc_id)
+        assert (doc["status"], doc["error"]) == ("error", "Worker stopped repeatedly")
+        assert main.event_log.since(doc_id, 0)[-1]["data"]["status"] == "error"
+        # Not picked up again by the next start
+        assert doc_id not in [d["doc_id"] for d in main.doc_store.list_by_status("processing")]
+    finally:
+        main.doc_store.delete(doc_id)
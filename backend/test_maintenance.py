@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+
+# Setup path to find maintenance
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+from maintenance import Maintenance
+
+def make_maintenance(tmp_path, **kwargs):
+    dirs = {name: str(tmp_path / name) for name in ("uploads", "audio_cache", "audiobooks", "page_text", "thumbnails")}
+    for directory in dirs.values():
+        os.makedirs(directory, exist_ok=True)
+    return Maintenance(
+        str(tmp_path / "amori.db"), dirs["uploads"], dirs["audio_cache"], dirs["audiobooks"],
+        dirs["page_text"], dirs["thumbnails"], min_age=0, **kwargs,
+    )
+
+def write(path, data=b"x" * 100):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+def add_document(m, doc_id, pdf=b"%PDF libro", pages=2, **fields):
+    path = write(os.path.join(m.upload_dir, f"{doc_id}.pdf"), pdf)
+    m.doc_store.create(doc_id, f"{doc_id}.pdf", path, status="ready", total_pages=pages, **fields)
+    m.page_store.save(doc_id, [{"page": n, "text": f"Página {n}"} for n in range(1, pages + 1)])
+    m.search_index.index_document(doc_id, [{"page": n, "text": f"Página {n}"} for n in range(1, pages + 1)])
+    return path
+
+def test_dry_run_reports_orphans_without_touching_them(tmp_path):
+    m = make_maintenance(tmp_path)
+    add_document(m, "libro")
+    kept = [
+        write(os.path.join(m.audio_dir, "libro_p1_es-AR-TomasNeural_smooth.mp3")),
+        write(os.path.join(m.audio_dir, "libro_p2_es-AR-TomasNeural_smooth_low.mp3")),
+        write(os.path.join(m.thumbnail_dir, "libro", "1.webp")),
+    ]
+    orphans = [
+        write(os.path.join(m.upload_dir, "borrado.pdf")),
+        write(os.path.join(m.page_dir, "borrado.pages")),
+        write(os.path.join(m.audio_dir, "borrado_p1_es-AR-TomasNeural_smooth.mp3")),
+        write(os.path.join(m.audio_dir, "libro_p9_es-AR-TomasNeural_smooth.mp3")),
+        write(os.path.join(m.audio_dir, "libro_p1_es-AR-TomasNeural_smooth_fallback.mp3")),
+        write(os.path.join(m.audio_dir, f"libro_p1_es-AR-TomasNeural_smooth.mp3.{'a' * 32}.tmp")),
+        write(os.path.join(m.audiobook_dir, "borrado_es-AR-TomasNeural.mp3")),
+    ]
+    write(os.path.join(m.thumbnail_dir, "borrado", "1.webp"))
+    orphans.append(os.path.join(m.thumbnail_dir, "borrado"))
+
+    report = m.run(["orphans"])
+    assert report["dry_run"] is True
+    assert sorted(a["target"] for a in report["actions"]) == sorted(orphans)
+    assert report["bytes_reclaimed"] == 100 * len(orphans)
+    assert all(os.path.exists(path) for path in orphans + kept)
+
+    applied = make_maintenance(tmp_path, apply=True).run(["orphans"])
+    assert applied["bytes_reclaimed"] == report["bytes_reclaimed"]
+    assert not any(os.path.exists(path) for path in orphans)
+    assert all(os.path.exists(path) for path in kept)
+
+def test_recent_files_are_left_alone(tmp_path):
+    m = make_maintenance(tmp_path)
+    m.min_age = 3600
+    upload = write(os.path.join(m.upload_dir, "subiendo.pdf"))
+    old = write(os.path.join(m.upload_dir, "viejo.pdf"))
+    past = time.time() - 7200
+    os.utime(old, (past, past))
+    assert [a["target"] for a in m.run(["orphans"])["actions"]] == [old]
+    assert os.path.exists(upload)
+
+def test_duplicates_keep_the_oldest_copy_with_the_furthest_progress(tmp_path):
+    m = make_maintenance(tmp_path, apply=True)
+    add_document(m, "original", last_page=1)
+    copy = add_document(m, "copia", last_page=2, summary="Resumen")
+    copy_audio = write(os.path.join(m.audio_dir, "copia_p1_es-AR-TomasNeural_smooth.mp3"))
+    add_document(m, "otro", pdf=b"%PDF otro libro")
+
+    report = m.run(["duplicates"])
+    assert [a["target"] for a in report["actions"] if a["action"] == "remove_document"] == ["copia"]
+    assert m.doc_store.get("copia") is None
+    assert not os.path.exists(copy) and not os.path.exists(copy_audio)
+    assert not m.search_index.is_indexed("copia")
+    original = m.doc_store.get("original")
+    assert (original["last_page"], original["summary"]) == (2, "Resumen")
+    assert m.doc_store.get("otro") is not None
+    assert m.doc_store.changes(1)["deleted"] == ["copia"]
+
+def test_integrity_requeues_documents_with_broken_page_text(tmp_path):
+    m = make_maintenance(tmp_path, apply=True)
+    add_document(m, "sin-texto")
+    add_document(m, "incompleto", pages=3)
+    add_document(m, "sano")
+    m.page_store.delete("sin-texto")
+    m.page_store.save("incompleto", [{"page": 1, "text": "Uno"}])
+    m.search_index.index_page("borrado", 1, "Texto viejo")
+
+    report = m.run(["integrity"])
+    actions = {(a["action"], a["target"]) for a in report["actions"]}
+    assert actions == {("requeue", "sin-texto"), ("requeue", "incompleto"), ("remove_index", "borrado")}
+    assert m.doc_store.get("sin-texto")["status"] == "processing"
+    assert m.job_queue.active_job("incompleto", "ingest") is not None
+    assert m.job_queue.active_job("sano", "ingest") is None
+    assert m.search_index.document_ids() == {"sin-texto", "incompleto", "sano"}
+
+def test_compact_recompresses_legacy_page_text_and_vacuums(tmp_path):
+    m = make_maintenance(tmp_path)
+    add_document(m, "libro")
+    m.page_store.delete("libro")
+    legacy = write(os.path.join(m.page_dir, "libro.json"), ('[{"page": 1, "text": "%s"}, {"page": 2, "text": "Dos"}]' % ("palabra " * 200)).encode())
+
+    dry = m.run(["compact"])
+    recompress = [a for a in dry["actions"] if a["action"] == "recompress"]
+    assert recompress[0]["bytes"] > 0
+    assert os.path.exists(legacy) # Not converted by a dry run
+
+    make_maintenance(tmp_path, apply=True).run(["compact"])
+    assert not os.path.exists(legacy)
+    assert m.page_store.load_page("libro", 2) == "Dos"
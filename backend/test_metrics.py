@@ -0,0 +1,67 @@
+import asyncio
+import os
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+# Setup path to find metrics
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+from metrics import EVENT_LOOP_LAG, Counter, Histogram, Registry, monitor_event_loop
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.register(Histogram("t_seconds", "Test.", ["stage"], buckets=(0.1, 1)))
+    latency.observe(0.05, stage="ocr")
+    latency.observe(0.5, stage="ocr")
+    latency.observe(7, stage="ocr")
+
+    lines = registry.render().splitlines()
+    assert 't_seconds_bucket{stage="ocr",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="ocr",le="1.0"} 2' in lines
+    assert 't_seconds_bucket{stage="ocr",le="+Inf"} 3' in lines
+    assert 't_seconds_count{stage="ocr"} 3' in lines
+    assert "# TYPE t_seconds histogram" in lines
+
+def test_counters_and_collectors_escape_labels():
+    registry = Registry()
+    hits = registry.register(Counter("t_total", "Test.", ["cache"]))
+    hits.inc(cache='a"b')
+    hits.inc(2, cache='a"b')
+    registry.add_collector(lambda: [("t_jobs", "gauge", "Jobs.", [({"kind": "ingest"}, 4)])])
+    # A failing collector doesn't break the scrape
+    registry.add_collector(lambda: 1 / 0)
+
+    text = registry.render()
+    assert 't_total{cache="a\\"b"} 3' in text
+    assert 't_jobs{kind="ingest"} 4' in text
+
+def test_event_loop_monitor_records_blocking():
+    async def block_loop():
+        monitor = asyncio.create_task(monitor_event_loop(interval=0.01))
+        await asyncio.sleep(0.03)
+        time.sleep(0.1) # Blocking call on the loop
+        await asyncio.sleep(0.03)
+        monitor.cancel()
+
+    before = EVENT_LOOP_LAG.count()
+    asyncio.run(block_loop())
+    assert EVENT_LOOP_LAG.count() > before
+    assert EVENT_LOOP_LAG._series[()][-2] >= 0.05
+
+def test_metrics_endpoint_reports_routes_by_template():
+    import main
+
+    client = TestClient(main.app)
+    client.get("/voices")
+    client.get("/document/no-such-doc/status")
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'amori_http_request_duration_seconds_count{method="GET",route="/voices",status="200"}' in text
+    assert 'route="/document/{doc_id}/status",status="404"' in text
+    assert "amori_page_cache_requests_total" in text
+    assert "amori_translation_cache_requests_total" in text
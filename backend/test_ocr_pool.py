@@ -0,0 +1,90 @@
+import os
+import sys
+import threading
+import time
+
+import fitz
+
+# Setup path to find ocr_pool
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+from ocr_pool import ReaderPool
+from services import PDFProcessor
+
+SPANISH = (
+    "El viento de la tarde movía las hojas del jardín mientras la ciudad se preparaba para la noche. "
+    "Nadie recordaba cuándo había comenzado la historia, pero todos sabían que el río guardaba sus secretos "
+    "y que las palabras de los viejos seguían vivas en cada calle."
+).split()
+
+class FakeReader:
+    def __init__(self, languages):
+        self.languages = languages
+        self.pages = 0
+
+    def readtext(self, image, detail=1):
+        self.pages += 1
+        return SPANISH
+
+def test_pool_evicts_least_recently_used():
+    built = []
+    pool = ReaderPool(lambda languages: built.append(languages) or FakeReader(languages), max_readers=2, size=lambda r: 10)
+
+    es = pool.get(["es"])
+    pool.get(["en"])
+    assert pool.get(["es"]) is es # Reused, and now the most recent
+    pool.get(["fr", "es"])
+
+    assert [r["languages"] for r in pool.stats()["readers"]] == [["es"], ["es", "fr"]]
+    assert pool.stats()["evictions"] == 1
+    assert built == [["es"], ["en"], ["es", "fr"]]
+
+def test_pool_respects_memory_budget():
+    sizes = {"es": 60, "en": 60, "pt": 200}
+    pool = ReaderPool(FakeReader, max_readers=5, max_bytes=100, size=lambda r: sizes[r.languages[0]])
+    pool.get(["es"])
+    pool.get(["en"])
+    assert [r["languages"] for r in pool.stats()["readers"]] == [["en"]]
+    # Larger than the whole budget: kept anyway, as the only reader
+    pool.get(["pt"])
+    assert pool.stats()["bytes"] == 200
+
+def test_concurrent_requests_build_one_reader():
+    def slow_factory(languages):
+        time.sleep(0.05)
+        return FakeReader(languages)
+
+    pool = ReaderPool(slow_factory, size=lambda r: 1)
+    readers = []
+    threads = [threading.Thread(target=lambda: readers.append(pool.get(["es"]))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pool.loads == 1
+    assert all(reader is readers[0] for reader in readers)
+
+def test_scanned_document_is_read_with_its_detected_language(tmp_path):
+    pdf_path = str(tmp_path / "escaneado.pdf")
+    pdf = fitz.open()
+    for _ in range(3):
+        pdf.new_page() # No text layer: every page needs OCR
+    pdf.save(pdf_path)
+
+    processor = PDFProcessor()
+    processor.readers = ReaderPool(FakeReader, size=lambda r: 1)
+    detected = []
+    pages = list(processor.iter_pages(pdf_path, on_ocr_languages=detected.append))
+
+    assert detected == [["es"]]
+    assert len(pages) == 3 and pages[0]["text"].startswith("El viento")
+    loaded = {tuple(r["languages"]): r["uses"] for r in processor.readers.stats()["readers"]}
+    # One page read with every language for detection (and kept), then only the Spanish reader
+    assert loaded == {("en", "es", "fr", "pt"): 1, ("es",): 2}
+
+    # Languages given up front skip detection
+    processor.readers = ReaderPool(FakeReader, size=lambda r: 1)
+    list(processor.iter_pages(pdf_path, ocr_languages=["pt"], on_ocr_languages=detected.append))
+    assert detected == [["es"]]
+    assert [r["languages"] for r in processor.readers.stats()["readers"]] == [["pt"]]
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Setup path to find outbound
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+from outbound import CircuitOpenError, DeadlineExceeded, OutboundService, deadline
+
+def make_service(**kwargs):
+    options = dict(concurrency=2, timeout=1.0, retries=2, backoff=0.001, failure_threshold=3, reset_after=0.2)
+    options.update(kwargs)
+    return OutboundService("test", **options)
+
+def test_concurrency_is_capped_across_threads_and_loops():
+    service = make_service()
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.pop()
+
+    async def work_async():
+        work()
+
+    threads = [threading.Thread(target=service.call, args=(work,)) for _ in range(4)]
+    threads += [threading.Thread(target=lambda: asyncio.run(service.call_async(work_async))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) <= 2
+    assert service.limiter.active == 0
+
+def test_retries_transient_errors_then_succeeds():
+    service = make_service()
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    assert service.call(flaky) == "ok"
+    assert len(calls) == 3
+    assert service.stats()["state"] == "closed"
+
+def test_client_errors_are_not_retried():
+    service = make_service()
+    calls = []
+
+    class BadRequest(Exception):
+        status_code = 400
+
+    def invalid():
+        calls.append(1)
+        raise BadRequest()
+
+    with pytest.raises(BadRequest):
+        service.call(invalid)
+    assert len(calls) == 1
+
+def test_breaker_opens_rejects_and_recovers_after_trial():
+    service = make_service(retries=0)
+
+    def down():
+        raise ConnectionError("down")
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            service.call(down)
+    assert service.stats()["state"] == "open"
+
+    # Fails fast without calling the service
+    calls = []
+    with pytest.raises(CircuitOpenError) as rejected:
+        service.call(lambda: calls.append(1))
+    assert calls == []
+    assert rejected.value.retry_after > 0
+
+    time.sleep(0.25)
+    assert service.call(lambda: "back") == "back"
+    assert service.stats()["state"] == "closed"
+
+def test_async_timeout_and_deadline():
+    service = make_service(timeout=0.05, retries=0)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(service.call_async(slow))
+
+    with deadline(0):
+        with pytest.raises(DeadlineExceeded):
+            service.call(lambda: "late")
+
+def test_waiting_for_a_slot_respects_the_deadline():
+    service = make_service(concurrency=1)
+    release = threading.Event()
+    holder = threading.Thread(target=service.call, args=(release.wait,))
+    holder.start()
+    time.sleep(0.02)
+    try:
+        with deadline(0.05):
+            with pytest.raises(DeadlineExceeded):
+                service.call(lambda: "queued")
+    finally:
+        release.set()
+        holder.join()
+    assert service.stats()["in_flight"] == 0
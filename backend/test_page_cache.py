@@ -0,0 +1,96 @@
+import os
+import sys
+
+# Setup path to find page_cache
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+from page_cache import PageCache, estimate_pages_size
+from page_store import PageStore
+
+def make_pages(count, words=50):
+    return [{"page": i + 1, "text": "palabra " * words} for i in range(count)]
+
+def test_cache_loads_on_demand_and_hits_afterwards():
+    calls = []
+    store = {"a": make_pages(3)}
+
+    def loader(doc_id):
+        calls.append(doc_id)
+        return store.get(doc_id)
+
+    cache = PageCache(loader, max_bytes=10 * 1024 * 1024)
+    assert cache.get("a") == store["a"]
+    assert cache.get("a") == store["a"]
+    assert cache.get("missing") is None
+    assert calls == ["a", "missing"]
+    assert cache.stats()["hits"] == 1
+
+def test_cache_evicts_least_recently_used_within_budget():
+    docs = {name: make_pages(5) for name in ("a", "b", "c")}
+    one_doc = estimate_pages_size(docs["a"])
+    cache = PageCache(docs.get, max_bytes=one_doc * 2)
+
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")  # "b" is now the least recently used
+    cache.get("c")
+
+    stats = cache.stats()
+    assert stats["documents"] == 2
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert stats["evictions"] == 1
+    misses = stats["misses"]
+    cache.get("a")
+    assert cache.stats()["misses"] == misses
+    cache.get("b")
+    assert cache.stats()["misses"] == misses + 1
+
+def test_oversized_document_is_served_but_not_cached():
+    big = make_pages(50)
+    cache = PageCache(lambda doc_id: big, max_bytes=1024)
+    assert cache.get("big") == big
+    assert cache.stats()["documents"] == 0
+
+def test_page_store_round_trip_backs_the_cache(tmp_path):
+    store = PageStore(str(tmp_path))
+    pages = [{"page": 1, "text": "Canción de Hielo y Fuego"}]
+    store.save("doc", pages)
+
+    cache = PageCache(store.load, max_bytes=1024 * 1024)
+    assert cache.get("doc") == pages
+    assert cache.get("other") is None
+    assert store.disk_usage()["documents"] == 1
+
+    store.delete("doc")
+    cache.invalidate("doc")
+    assert cache.get("doc") is None
+
+def test_page_store_reads_single_pages_and_migrates_json(tmp_path):
+    import json
+
+    pages = [{"page": i + 1, "text": f"Página {i + 1} " * 20} for i in range(400)]
+    with open(tmp_path / "legacy.json", "w", encoding="utf-8") as f:
+        json.dump(pages, f)
+
+    store = PageStore(str(tmp_path))
+    assert store.load_page("legacy", 400) == pages[399]["text"]
+    assert store.load_page("legacy", 401) is None
+    assert store.load_page("legacy", 0) is None
+    assert store.page_count("legacy") == 400
+    assert not (tmp_path / "legacy.json").exists()
+    assert store.load("legacy") == pages
+
+    # Compressed pages take far less room than the JSON they replace
+    raw_size = len(json.dumps(pages).encode("utf-8"))
+    assert store.disk_usage()["bytes"] < raw_size / 2
+
+def test_page_store_loads_a_window_of_pages(tmp_path):
+    store = PageStore(str(tmp_path))
+    pages = make_pages(30, words=5)
+    store.save("doc", pages)
+
+    assert store.load_range("doc", 11, 5) == pages[10:15]
+    assert store.load_range("doc", 28, 10) == pages[27:]
+    assert store.load_range("doc", 31, 10) == []
+    assert store.load_range("missing", 1, 10) is None
@@ -0,0 +1,29 @@
+import json
+import os
+import sys
+
+from fastapi.testclient import TestClient
+
+# Setup path to find main
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+import main
+
+client = TestClient(main.app)
+
+def test_pages_window_projection_and_ndjson(make_document):
+    doc_id = make_document()
+    window = client.get(f"/document/{doc_id}/pages", params={"start": 2, "limit": 5})
+    assert window.json() == [{"page": 2, "text": "Página 2"}]
+    assert window.headers["x-total-pages"] == "2"
+
+    numbers = client.get(f"/document/{doc_id}/pages", params={"fields": "page"})
+    assert numbers.json() == [{"page": 1}, {"page": 2}]
+    assert client.get(f"/document/{doc_id}/pages", params={"fields": "page,image"}).status_code == 400
+
+    stream = client.get(f"/document/{doc_id}/pages", params={"format": "ndjson", "fields": "text"})
+    assert stream.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in stream.text.splitlines()] == [{"text": "Página 1"}, {"text": "Página 2"}]
+
+    assert client.get(f"/document/{doc_id}/pages").json() == [{"page": 1, "text": "Página 1"}, {"page": 2, "text": "Página 2"}]
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Setup path to find profiling
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+from metrics import stage
+from profiling import ProfileRecorder, ServerTimingMiddleware, format_server_timing
+
+def make_app(tmp_path):
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware, recorder=ProfileRecorder(str(tmp_path)), admin_token="secreto")
+
+    @app.get("/slow")
+    def slow():
+        # Sync endpoint: runs in the threadpool, spans must still reach the request
+        with stage("pdf_open"):
+            time.sleep(0.01)
+        for _ in range(2):
+            with stage("render"):
+                time.sleep(0.01)
+        return {"ok": True}
+
+    return app
+
+def test_server_timing_header_sums_repeated_stages():
+    header = format_server_timing([("render", 0.002), ("encode", 0.001), ("render", 0.003)], 0.01)
+    assert header == 'render;dur=5.0;desc="x2", encode;dur=1.0, total;dur=10.0'
+
+def test_middleware_reports_spans_from_threadpool(tmp_path):
+    client = TestClient(make_app(tmp_path))
+    timing = client.get("/slow").headers["server-timing"]
+    assert timing.startswith("pdf_open;dur=")
+    assert 'render;dur=' in timing and 'desc="x2"' in timing
+    assert "x-amori-profile-file" not in client.get("/slow").headers
+
+def test_admin_requests_can_be_profiled(tmp_path):
+    client = TestClient(make_app(tmp_path))
+
+    # Without the admin token the header is ignored
+    assert "x-amori-profile-file" not in client.get("/slow", headers={"X-Amori-Profile": "sample"}).headers
+    wrong = client.get("/slow", headers={"X-Amori-Profile": "sample", "X-Admin-Token": "secret\u00f1".encode("latin-1")})
+    assert "x-amori-profile-file" not in wrong.headers
+
+    sampled = client.get("/slow", headers={"X-Amori-Profile": "sample", "X-Admin-Token": "secreto"})
+    folded = (tmp_path / sampled.headers["x-amori-profile-file"]).read_text()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded.splitlines())
+
+    traced = client.get("/slow", headers={"X-Amori-Profile": "memory", "X-Admin-Token": "secreto"})
+    name = traced.headers["x-amori-profile-file"]
+    assert (tmp_path / name).read_text().startswith("Peak traced memory")
+    assert (tmp_path / (name + ".snapshot")).exists()
+    assert ProfileRecorder(str(tmp_path)).list() == sorted([name, sampled.headers["x-amori-profile-file"]], reverse=True)
+
+def test_admin_profile_endpoint_requires_token(tmp_path, monkeypatch):
+    import main
+
+    client = TestClient(main.app)
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    assert client.post("/admin/profile").status_code == 404
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secreto")
+    monkeypatch.setattr(main, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "profile_recorder", ProfileRecorder(str(tmp_path)))
+    assert client.post("/admin/profile", headers={"X-Admin-Token": "otro"}).status_code == 403
+    assert client.get("/admin/profiles", headers={"X-Admin-Token": "caf\u00e9".encode("latin-1")}).status_code == 403
+
+    headers = {"X-Admin-Token": "secreto"}
+    result = client.post("/admin/profile", params={"seconds": 0.05}, headers=headers).json()
+    assert client.get("/admin/profiles", headers=headers).json() == [result["file"]]
+    download = client.get(f"/admin/profiles/{result['file']}", headers=headers)
+    assert download.status_code == 200
+    assert client.get("/admin/profiles/main.py", headers=headers).status_code == 404
@@ -0,0 +1,59 @@
+import os
+import sys
+
+# Setup path to find search_index
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+from document_store import DocumentStore
+from search_index import SearchIndex, build_match_query
+
+def make_index(tmp_path):
+    db_path = str(tmp_path / "amori.db")
+    docs = DocumentStore(db_path)
+    index = SearchIndex(db_path)
+    docs.create("a", "quijote.pdf", "uploads/a.pdf", status="ready", total_pages=2)
+    docs.create("b", "cocina.pdf", "uploads/b.pdf", status="ready", total_pages=1)
+    index.index_document("a", [
+        {"page": 1, "text": "En un lugar de la Mancha, de cuyo nombre no quiero acordarme"},
+        {"page": 2, "text": "Los molinos de viento eran gigantes <para> don Quijote"},
+    ])
+    index.index_page("b", 1, "Receta de tortilla: huevos, patatas y cebolla")
+    return docs, index
+
+def test_search_ranks_pages_and_ignores_accents(tmp_path):
+    _, index = make_index(tmp_path)
+
+    hits = index.search("mancha")
+    assert [(hit["doc_id"], hit["page"]) for hit in hits] == [("a", 1)]
+    assert hits[0]["filename"] == "quijote.pdf"
+    assert "<mark>Mancha</mark>" in hits[0]["snippet"]
+
+    # Prefix on the last word, accents ignored, page text HTML-escaped
+    hits = index.search("gigantes quijót")
+    assert hits[0]["page"] == 2
+    assert "&lt;para&gt;" in hits[0]["snippet"]
+
+    assert index.search("de", doc_id="b")[0]["doc_id"] == "b"
+    assert index.search("¿?") == []
+
+def test_reindexing_and_removal(tmp_path):
+    docs, index = make_index(tmp_path)
+
+    index.index_page("b", 1, "Receta de gazpacho")
+    assert index.search("tortilla") == []
+    assert index.search("gazpacho")[0]["doc_id"] == "b"
+    assert index.stats() == {"documents": 2, "pages": 3}
+
+    # Documents that are not ready (or gone) never show up
+    docs.update("a", status="processing")
+    assert index.search("molinos") == []
+
+    index.remove("a")
+    assert not index.is_indexed("a")
+    assert index.stats() == {"documents": 1, "pages": 1}
+
+def test_match_query_quotes_user_input():
+    assert build_match_query('hola "mundo" OR') == '"hola" "mundo" "OR"'
+    assert build_match_query('hola mun') == '"hola" "mun"*'
+    assert build_match_query("  ") is None
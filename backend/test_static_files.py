@@ -0,0 +1,81 @@
+import gzip
+import os
+import sys
+
+from fastapi.testclient import TestClient
+
+# Setup path to find static_files
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+import main
+from http_cache import negotiate_encoding
+from static_files import StaticSite
+
+SCRIPT = b"export function leer(pagina) { return pagina + 1; }\n" * 200
+
+def make_site(tmp_path, monkeypatch):
+    dist = tmp_path / "dist"
+    (dist / "assets").mkdir(parents=True)
+    (dist / "index.html").write_bytes(b"<!doctype html><div id=root></div>" + b" " * 2000)
+    (dist / "assets" / "index-B7a9_kQ2.js").write_bytes(SCRIPT)
+    (dist / "assets" / "index-Cx1_9aZb.css").write_bytes(b"body { margin: 0 }\n" * 200)
+    # Built by a compression plugin: served as it is
+    (dist / "assets" / "index-Cx1_9aZb.css.gz").write_bytes(gzip.compress(b"/* prebuilt */"))
+    (dist / "favicon.ico").write_bytes(b"\x00" * 2000)
+    site = StaticSite(str(dist))
+    monkeypatch.setattr(main, "static_site", site)
+    return site, TestClient(main.app)
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, deflate, br", ["br", "gzip"]) == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("br;q=0, *", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("identity", ["br", "gzip"]) is None
+    assert negotiate_encoding("", ["gzip"]) is None
+
+def test_hashed_assets_are_compressed_and_immutable(tmp_path, monkeypatch):
+    site, client = make_site(tmp_path, monkeypatch)
+    # Not compressed yet: sent as it is rather than compressed in the request
+    early = client.get("/assets/index-B7a9_kQ2.js", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in early.headers
+    assert "Accept-Encoding" in early.headers["vary"]
+    # Built with the frontend: available right away
+    css = client.get("/assets/index-Cx1_9aZb.css", headers={"Accept-Encoding": "gzip"})
+    assert css.content == b"/* prebuilt */"
+    assert "assets/index-Cx1_9aZb.css.gz" not in site.files
+
+    site.precompress()
+    response = client.get("/assets/index-B7a9_kQ2.js", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert "javascript" in response.headers["content-type"]
+    assert response.content == SCRIPT # Decoded by the client
+    assert int(response.headers["content-length"]) < len(SCRIPT) // 10
+
+    plain = client.get("/assets/index-B7a9_kQ2.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] != response.headers["etag"]
+    assert plain.headers["etag"] == early.headers["etag"]
+
+    # Assets of an older build are gone, not answered with index.html
+    assert client.get("/assets/index-Old12345.js").status_code == 404
+
+def test_index_is_revalidated_with_its_etag(tmp_path, monkeypatch):
+    site, client = make_site(tmp_path, monkeypatch)
+    first = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["cache-control"] == "no-cache"
+    assert first.content.startswith(b"<!doctype html>")
+
+    again = client.get("/library/shelf", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert again.headers["etag"] == first.headers["etag"]
+
+    icon = client.get("/favicon.ico", headers={"Accept-Encoding": "gzip"})
+    assert icon.headers["cache-control"] == "no-cache"
+    assert "content-encoding" not in icon.headers # Not a text file
+
+    site.precompress()
+    assert client.get("/cache/stats").json()["frontend"]["files"] == 4
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import sys
+import uuid
+
+import pytest
+
+# Setup path to find tts_backends
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+import tts_backends
+from tts_backends import EspeakBackend, TTSBackendRegistry, mp3_encoder, voice_language
+
+class FakeBackend:
+    def __init__(self, name, local, prefix=None, fail=False):
+        self.name = name
+        self.local = local
+        self.voice_prefix = prefix
+        self.fail = fail
+        self.calls = []
+
+    def available(self):
+        return True
+
+    def supports(self, voice):
+        return voice.endswith("Neural") if not self.local else voice.startswith(self.voice_prefix + "-")
+
+    def languages(self):
+        return {"es", "en"} if self.local else set()
+
+    async def synthesize(self, text, voice, output_file, profile="standard"):
+        self.calls.append(voice)
+        if self.fail:
+            raise ConnectionError("network down")
+        suffix = f":{profile}" if profile != "standard" else ""
+        with open(output_file, "wb") as f:
+            f.write(f"{self.name}:{voice}{suffix}".encode())
+
+def test_voice_language():
+    assert voice_language("es-AR-TomasNeural") == ("es", "es-AR")
+    assert voice_language("local-en") == ("en", "en")
+    assert voice_language("piper-es-ES") == ("es", "es-ES")
+
+def test_falls_back_to_a_local_engine_of_the_same_language(tmp_path):
+    edge = FakeBackend("edge", local=False, fail=True)
+    espeak = FakeBackend("espeak", local=True, prefix="local")
+    registry = TTSBackendRegistry([edge, espeak])
+    output = str(tmp_path / "page.mp3")
+
+    assert asyncio.run(registry.synthesize("Hola", "es-AR-TomasNeural", output)) == ("espeak", True)
+    assert espeak.calls == ["local-es-AR"]
+    assert open(output, "rb").read() == b"espeak:local-es-AR"
+
+    # Jobs that need one consistent voice opt out
+    with pytest.raises(ConnectionError):
+        asyncio.run(registry.synthesize("Hola", "es-AR-TomasNeural", output, fallback=False))
+
+def test_preview_prefers_local_engines(tmp_path):
+    edge = FakeBackend("edge", local=False)
+    espeak = FakeBackend("espeak", local=True, prefix="local")
+    registry = TTSBackendRegistry([edge, espeak])
+
+    result = asyncio.run(registry.synthesize("Hi", "en-US-GuyNeural", str(tmp_path / "p.mp3"), preview=True))
+    assert result == ("espeak", False)
+    assert edge.calls == []
+    assert registry.local_voices()[0]["ShortName"] == "local-en"
+
+    with pytest.raises(ValueError):
+        asyncio.run(TTSBackendRegistry([edge]).synthesize("Hi", "local-en", str(tmp_path / "x.mp3")))
+
+def test_espeak_command_maps_regions():
+    espeak = EspeakBackend()
+    espeak.binary = "espeak-ng"
+    assert espeak.command("local-es-AR", "out.wav")[:3] == ["espeak-ng", "-v", "es-419"]
+    assert espeak.command("local-es-ES", "out.wav")[2] == "es"
+    assert espeak.supports("local-fr") and not espeak.supports("local-zz")
+
+def test_audio_endpoint_serves_fallback_audio_without_caching_it(tmp_path, monkeypatch):
+    import fitz
+    from fastapi.testclient import TestClient
+    import main
+    import services
+
+    edge = FakeBackend("edge", local=False, fail=True)
+    registry = TTSBackendRegistry([edge, FakeBackend("espeak", local=True, prefix="local")])
+    monkeypatch.setattr(services, "_tts_backends", registry)
+    monkeypatch.setattr(main, "AUDIO_DIR", str(tmp_path))
+
+    pdf_path = str(tmp_path / "libro.pdf")
+    pdf = fitz.open()
+    pdf.new_page()
+    pdf.save(pdf_path)
+    doc_id = str(uuid.uuid4())
+    main.doc_store.create(doc_id, f"{doc_id}.pdf", pdf_path, status="ready", total_pages=1)
+    main.page_store.save(doc_id, [{"page": 1, "text": "Página 1"}])
+    client = TestClient(main.app)
+    try:
+        response = client.get(f"/audio/{doc_id}/1")
+        assert response.status_code == 200
+        assert response.content == b"espeak:local-es-AR"
+        assert response.headers["cache-control"] == "no-cache"
+        # The voice's own file is still missing, so its engine is tried again next time
+        assert not os.path.exists(main.audio_cache_path(doc_id, 1, "es-AR-TomasNeural"))
+
+        edge.fail = False
+        response = client.get(f"/audio/{doc_id}/1")
+        assert response.content == b"edge:es-AR-TomasNeural"
+        assert "immutable" in response.headers["cache-control"]
+    finally:
+        client.delete(f"/library/{doc_id}")
+
+def test_encoder_commands_follow_the_profile(monkeypatch):
+    monkeypatch.setattr(tts_backends.shutil, "which", lambda name: "/usr/bin/lame" if name == "lame" else None)
+    command = mp3_encoder()("page.mp3", "page_low.mp3", "low")
+    assert command[:3] == ["lame", "--quiet", "--mp3input"]
+    assert command[command.index("-b") + 1] == "32"
+    assert command[command.index("--resample") + 1] == "16"
+
+    monkeypatch.setattr(tts_backends.shutil, "which", lambda name: "/usr/bin/ffmpeg" if name == "ffmpeg" else None)
+    command = mp3_encoder()("page.wav", "page.mp3", "standard")
+    assert command[command.index("-b:a") + 1] == "48k"
+
+def test_audio_quality_is_part_of_the_cache_key(tmp_path, monkeypatch):
+    import fitz
+    from fastapi.testclient import TestClient
+    from http_cache import IMMUTABLE
+    import main
+    import services
+
+    registry = TTSBackendRegistry([FakeBackend("edge", local=False)])
+    monkeypatch.setattr(services, "_tts_backends", registry)
+    monkeypatch.setattr(main, "AUDIO_DIR", str(tmp_path))
+    monkeypatch.setattr(tts_backends, "mp3_encoder", lambda: object())
+
+    pdf_path = str(tmp_path / "libro.pdf")
+    pdf = fitz.open()
+    pdf.new_page()
+    pdf.save(pdf_path)
+    doc_id = str(uuid.uuid4())
+    main.doc_store.create(doc_id, f"{doc_id}.pdf", pdf_path, status="ready", total_pages=1)
+    main.page_store.save(doc_id, [{"page": 1, "text": "Página 1"}])
+    client = TestClient(main.app)
+    try:
+        low = client.get(f"/audio/{doc_id}/1", params={"quality": "low"})
+        assert low.content == b"edge:es-AR-TomasNeural:low"
+        assert low.headers["x-audio-quality"] == "low"
+        standard = client.get(f"/audio/{doc_id}/1")
+        assert standard.content == b"edge:es-AR-TomasNeural"
+        assert os.path.exists(main.audio_cache_path(doc_id, 1, "es-AR-TomasNeural", profile="low"))
+        assert client.get(f"/audio/{doc_id}/1", params={"quality": "ultra"}).status_code == 400
+
+        stats = client.get("/cache/stats").json()["audio"]
+        assert stats["low"] == {"files": 1, "bytes": len(low.content)}
+        assert stats["standard"]["files"] == 1
+
+        # Without an encoder only edge-tts's own format can be produced
+        monkeypatch.setattr(tts_backends, "mp3_encoder", lambda: None)
+        fallback = client.get(f"/audio/{doc_id}/1", params={"quality": "low"})
+        assert fallback.headers["x-audio-quality"] == "standard"
+        assert fallback.headers["cache-control"] == "no-cache"
+        assert client.get(f"/audio/{doc_id}/1").headers["cache-control"] == IMMUTABLE
+
+        # Translator down: the original text's audio is sent, but not cached for good
+        monkeypatch.setattr(main, "translate_text", lambda text: (text, False, None))
+        untranslated = client.get(f"/audio/{doc_id}/1", params={"translate": "true"})
+        assert untranslated.content == b"edge:es-AR-TomasNeural"
+        assert untranslated.headers["cache-control"] == "no-cache"
+    finally:
+        client.delete(f"/library/{doc_id}")
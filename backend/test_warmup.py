@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+
+# Setup path to find warmup
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+from warmup import WarmupManager
+
+class FakeEngine:
+    def __init__(self, fail=False):
+        self.loaded = False
+        self.seconds = None
+        self.fail = fail
+
+    def load(self):
+        if self.fail:
+            raise RuntimeError("model download failed")
+        self.loaded = True
+        self.seconds = 0.25
+
+    def probe(self):
+        return self.loaded, self.seconds
+
+def wait_for(manager, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if manager.status()["ready"]:
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_warmup_loads_engines_in_background():
+    ocr, summary = FakeEngine(), FakeEngine()
+    manager = WarmupManager(enabled=True, delay=0)
+    manager.register("ocr", ocr.load, ocr.probe)
+    manager.register("summarizer", summary.load, summary.probe)
+
+    assert manager.status()["ready"] is False
+    manager.start()
+    assert wait_for(manager)
+
+    status = manager.status()
+    assert status["engines"]["ocr"]["status"] == "loaded"
+    assert status["engines"]["ocr"]["load_seconds"] == 0.25
+    assert status["engines"]["summarizer"]["status"] == "loaded"
+
+def test_warmup_reports_errors_without_blocking_readiness():
+    broken = FakeEngine(fail=True)
+    manager = WarmupManager(enabled=True, delay=0)
+    manager.register("ocr", broken.load, broken.probe)
+    manager.start()
+    assert wait_for(manager)
+
+    engine = manager.status()["engines"]["ocr"]
+    assert engine["status"] == "error"
+    assert "model download failed" in engine["error"]
+
+def test_disabled_warmup_reports_lazily_loaded_engines():
+    ocr = FakeEngine()
+    manager = WarmupManager(enabled=False)
+    manager.register("ocr", ocr.load, ocr.probe)
+    manager.start()
+
+    assert manager.status()["engines"]["ocr"]["status"] == "lazy"
+    # A real request loads the engine on demand
+    ocr.load()
+    assert manager.status()["engines"]["ocr"]["status"] == "loaded"
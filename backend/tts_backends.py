@@ -0,0 +1,303 @@
+"""Text-to-speech engines and how a voice picks one.
+
+- edge: Microsoft Edge neural voices (network), e.g. "es-AR-TomasNeural".
+- espeak: espeak-ng on this machine, voices "local-es", "local-en", ...
+- piper: piper neural models on this machine, voices "piper-es", ... with the
+  model files listed in AMORI_PIPER_MODELS ("es=/models/es_ES-davefx-medium.onnx,en=...").
+
+Local engines write WAV, encoded to MP3 with lame or ffmpeg so every cached
+page can be served, seeked and joined into audiobooks the same way.
+
+Audio quality profiles (AUDIO_PROFILES) are named after the Azure speech
+output formats they correspond to. edge-tts always streams the 48 kbps
+"standard" format, so other profiles are transcoded from it; local engines
+encode straight to the profile.
+
+When the voice's engine fails (network down, circuit open), the registry
+retries with a local engine for the same language. Previews go to a local
+engine first: it starts speaking long before a network voice would.
+"""
+import asyncio
+import importlib.util
+import os
+import shutil
+import sys
+import uuid
+
+from metrics import REGISTRY, Counter
+from outbound import TTS, Limiter
+
+TTS_SYNTHESES = REGISTRY.register(Counter(
+    "amori_tts_syntheses_total", "Pages of audio synthesized by engine.", ["engine", "fallback"],
+))
+
+# espeak-ng voice for each language (or language-region) of our voice names
+ESPEAK_VOICES = {
+    "es": "es-419", "es-ES": "es", "en": "en-us", "en-GB": "en-gb",
+    "pt": "pt-br", "pt-PT": "pt", "fr": "fr", "it": "it", "de": "de",
+}
+# Audio quality profiles. "standard" is what edge-tts produces; "low" roughly halves
+# the bytes per page (and the cache) for mobile data and slow tunnels.
+AUDIO_PROFILES = {
+    "standard": {"format": "audio-24khz-48kbitrate-mono-mp3", "sample_rate": 24000, "bitrate": 48},
+    "low": {"format": "audio-16khz-32kbitrate-mono-mp3", "sample_rate": 16000, "bitrate": 32},
+}
+DEFAULT_PROFILE = "standard"
+EDGE_FORMAT = AUDIO_PROFILES[DEFAULT_PROFILE]["format"]
+
+LOCAL_VOICE_NAMES = {
+    "es": "Español", "en": "English", "pt": "Português", "fr": "Français", "it": "Italiano", "de": "Deutsch",
+}
+
+
+def voice_language(voice):
+    """"es-AR-TomasNeural" -> ("es", "es-AR"), "local-en" -> ("en", "en")."""
+    parts = voice.split("-")
+    if parts[0] in ("local", "piper"):
+        parts = parts[1:]
+    language = parts[0].split("_")[0].lower() if parts else ""
+    region = f"{language}-{parts[1]}" if len(parts) > 1 and parts[1].isupper() else language
+    return language, region
+
+
+def mp3_encoder():
+    """Function returning the command that encodes a WAV or MP3 file to MP3 in a profile, or None."""
+    if shutil.which("lame"):
+        def lame(source, mp3, profile):
+            settings = AUDIO_PROFILES[profile]
+            mp3_input = ["--mp3input"] if source.endswith(".mp3") else []
+            return ["lame", "--quiet", *mp3_input, "-m", "m", "-b", str(settings["bitrate"]),
+                    "--resample", f"{settings['sample_rate'] / 1000:g}", source, mp3]
+        return lame
+    if shutil.which("ffmpeg"):
+        def ffmpeg(source, mp3, profile):
+            settings = AUDIO_PROFILES[profile]
+            return ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", source,
+                    "-ac", "1", "-ar", str(settings["sample_rate"]), "-b:a", f"{settings['bitrate']}k",
+                    "-id3v2_version", "0", "-f", "mp3", mp3]
+        return ffmpeg
+    return None
+
+
+async def run_command(args, stdin=None):
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await process.communicate(stdin)
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+    if process.returncode != 0:
+        raise RuntimeError(f"{args[0]} exited with {process.returncode}: {stderr.decode(errors='replace').strip()[:200]}")
+
+
+class EdgeTTSBackend:
+    name = "edge"
+    local = False
+
+    def available(self):
+        # Checked without importing: edge_tts loads aiohttp, which slows startup
+        return "edge_tts" in sys.modules or importlib.util.find_spec("edge_tts") is not None
+
+    def supports(self, voice):
+        return voice.endswith("Neural")
+
+    def languages(self):
+        return set()
+
+    async def synthesize(self, text, voice, output_file, profile=DEFAULT_PROFILE):
+        import edge_tts
+
+        # edge-tts can't ask for another output format: other profiles are transcoded locally
+        target = output_file
+        if AUDIO_PROFILES[profile]["format"] != EDGE_FORMAT:
+            target = f"{output_file}.{uuid.uuid4().hex}.mp3"
+
+        async def synthesize():
+            # A Communicate streams only once: each retry needs a new one
+            await edge_tts.Communicate(text, voice).save(target)
+
+        try:
+            await TTS.call_async(synthesize)
+            if target != output_file:
+                await run_command(mp3_encoder()(target, output_file, profile))
+        finally:
+            if target != output_file and os.path.exists(target):
+                os.remove(target)
+
+
+class LocalBackend:
+    """An engine run as a subprocess that writes WAV, then encoded to MP3."""
+
+    name = None
+    local = True
+    voice_prefix = "local"
+
+    def __init__(self, concurrency=None):
+        # CPU-bound: more processes than cores only slows every page down
+        self.limiter = Limiter(concurrency or os.cpu_count() or 2)
+        self._encoder = mp3_encoder()
+
+    def command(self, voice, wav_path):
+        raise NotImplementedError
+
+    def installed(self):
+        raise NotImplementedError
+
+    def available(self):
+        return self._encoder is not None and self.installed()
+
+    async def synthesize(self, text, voice, output_file, profile=DEFAULT_PROFILE):
+        wav_path = f"{output_file}.{uuid.uuid4().hex}.wav"
+        if not await self.limiter.acquire_async():
+            raise RuntimeError(f"{self.name}: no free slot")
+        try:
+            await run_command(self.command(voice, wav_path), stdin=text.encode("utf-8"))
+            await run_command(self._encoder(wav_path, output_file, profile))
+        finally:
+            self.limiter.release()
+            if os.path.exists(wav_path):
+                os.remove(wav_path)
+
+
+class EspeakBackend(LocalBackend):
+    name = "espeak"
+
+    def __init__(self, speed=165, concurrency=None):
+        super().__init__(concurrency)
+        self.speed = speed
+        self.binary = shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def installed(self):
+        return self.binary is not None
+
+    def supports(self, voice):
+        return voice.startswith("local-") and voice_language(voice)[0] in ESPEAK_VOICES
+
+    def languages(self):
+        return set(LOCAL_VOICE_NAMES)
+
+    def command(self, voice, wav_path):
+        language, region = voice_language(voice)
+        espeak_voice = ESPEAK_VOICES.get(region) or ESPEAK_VOICES[language]
+        # Text comes on stdin; -w writes a WAV file instead of playing it
+        return [self.binary, "-v", espeak_voice, "-s", str(self.speed), "-w", wav_path, "--stdin"]
+
+
+class PiperBackend(LocalBackend):
+    name = "piper"
+    voice_prefix = "piper"
+
+    def __init__(self, models, concurrency=None):
+        super().__init__(concurrency)
+        self.models = {language: path for language, path in models.items() if os.path.exists(path)}
+        self.binary = shutil.which("piper")
+
+    @classmethod
+    def from_env(cls):
+        models = {}
+        for entry in os.environ.get("AMORI_PIPER_MODELS", "").split(","):
+            if "=" in entry:
+                language, path = entry.split("=", 1)
+                models[language.strip()] = path.strip()
+        return cls(models)
+
+    def installed(self):
+        return self.binary is not None and bool(self.models)
+
+    def supports(self, voice):
+        return voice.startswith("piper-") and voice_language(voice)[0] in self.models
+
+    def languages(self):
+        return set(self.models)
+
+    def command(self, voice, wav_path):
+        return [self.binary, "--model", self.models[voice_language(voice)[0]], "--output_file", wav_path]
+
+
+class TTSBackendRegistry:
+    """Picks the engine for a voice and falls back to local engines of the same language."""
+
+    def __init__(self, backends, fallback=True):
+        self.backends = [backend for backend in backends if backend.available()]
+        self.fallback = fallback
+
+    def primary(self, voice):
+        for backend in self.backends:
+            if backend.supports(voice):
+                return backend
+        return None
+
+    def local_voice(self, backend, voice):
+        """The voice of a local engine speaking the same language as `voice`, or None."""
+        language, region = voice_language(voice)
+        if language not in backend.languages():
+            return None
+        return f"{backend.voice_prefix}-{region}"
+
+    def chain(self, voice, preview=False, fallback=True):
+        """[(backend, voice)] to try in order."""
+        primary = self.primary(voice)
+        chain = [(primary, voice)] if primary else []
+        if (fallback and self.fallback) or preview:
+            local = [
+                (backend, self.local_voice(backend, voice))
+                for backend in self.backends if backend.local and backend is not primary
+            ]
+            local = [(backend, local_voice) for backend, local_voice in local if local_voice]
+            # Previews want the first audio fast: local engines first
+            chain = local + chain if preview else chain + local
+        return chain
+
+    def supports_profile(self, profile):
+        # Anything but edge-tts's own format needs an encoder
+        return profile == DEFAULT_PROFILE or (profile in AUDIO_PROFILES and mp3_encoder() is not None)
+
+    async def synthesize(self, text, voice, output_file, preview=False, fallback=True, profile=DEFAULT_PROFILE):
+        """Writes output_file; returns (engine name, whether it was a fallback)."""
+        chain = self.chain(voice, preview=preview, fallback=fallback)
+        if not chain:
+            raise ValueError(f"No TTS engine available for voice {voice}")
+        error = None
+        for i, (backend, backend_voice) in enumerate(chain):
+            try:
+                await backend.synthesize(text, backend_voice, output_file, profile)
+            except Exception as e:
+                print(f"TTS engine {backend.name} failed for {backend_voice}: {e}")
+                error = e
+                continue
+            is_fallback = not preview and i > 0
+            TTS_SYNTHESES.inc(engine=backend.name, fallback=str(is_fallback).lower())
+            return backend.name, is_fallback
+        raise error
+
+    def local_voices(self):
+        """Voices of the local engines, for /voices."""
+        voices = []
+        for backend in self.backends:
+            if not backend.local:
+                continue
+            for language in sorted(backend.languages()):
+                name = LOCAL_VOICE_NAMES.get(language, language)
+                voices.append({
+                    "ShortName": f"{backend.voice_prefix}-{language}",
+                    "FriendlyName": f"{name} ({backend.name}, sin conexión)",
+                })
+        return voices
+
+    def stats(self):
+        return {"engines": [backend.name for backend in self.backends], "fallback": self.fallback}
+
+
+def default_registry():
+    """Engines in AMORI_TTS_ENGINES order (default "edge,piper,espeak"); unavailable ones are skipped."""
+    factories = {"edge": EdgeTTSBackend, "espeak": EspeakBackend, "piper": PiperBackend.from_env}
+    names = os.environ.get("AMORI_TTS_ENGINES", "edge,piper,espeak").split(",")
+    return TTSBackendRegistry(
+        [factories[name.strip()]() for name in names if name.strip() in factories],
+        fallback=os.environ.get("AMORI_TTS_FALLBACK", "1") == "1",
+    )
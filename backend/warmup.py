@@ -0,0 +1,74 @@
+import threading
+import time
+
+
+class WarmupManager:
+    """Loads heavy engines (OCR, summarizer) in a background thread.
+
+    Each engine is registered with a loader and a probe. The probe reports
+    whether the engine is already loaded and how long it took, so engines
+    that a real request loaded first are reported correctly too.
+    """
+
+    def __init__(self, enabled=False, delay=1.0):
+        self.enabled = enabled
+        self.delay = delay
+        self.engines = {}
+        self.state = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, name, loader, probe):
+        # probe() -> (loaded: bool, seconds: float | None)
+        self.engines[name] = {"loader": loader, "probe": probe}
+        self.state[name] = {"status": "pending" if self.enabled else "lazy", "error": None}
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="amori-warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        # Give uvicorn a moment to bind the port before we compete for CPU
+        if self.delay:
+            time.sleep(self.delay)
+
+        for name, engine in self.engines.items():
+            loaded, _ = engine["probe"]()
+            if loaded:
+                continue
+            with self._lock:
+                self.state[name]["status"] = "loading"
+            print(f"Warm-up: loading {name}...")
+            try:
+                engine["loader"]()
+                with self._lock:
+                    self.state[name]["status"] = "loaded"
+            except Exception as e:
+                print(f"Warm-up: failed to load {name}: {e}")
+                with self._lock:
+                    self.state[name]["status"] = "error"
+                    self.state[name]["error"] = str(e)
+
+    def status(self):
+        engines = {}
+        with self._lock:
+            for name, engine in self.engines.items():
+                loaded, seconds = engine["probe"]()
+                state = dict(self.state[name])
+                if loaded:
+                    state["status"] = "loaded"
+                    state["error"] = None
+                state["load_seconds"] = round(seconds, 3) if seconds is not None else None
+                engines[name] = state
+
+        # Failed engines fall back to lazy loading, so they don't block readiness
+        ready = not self.enabled or all(
+            e["status"] in ("loaded", "error") for e in engines.values()
+        )
+        return {
+            "ready": ready,
+            "warmup_enabled": self.enabled,
+            "engines": engines,
+        }
@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useRef } from 'react';
-import { uploadPDF, getAudioUrl, getPageImageUrl, getDocStatus, getVoices, getLibrary, deleteBook, updateProgress, getSummary } from './api';
+import { uploadPDF, getAudioUrl, getPageImageUrl, getDocStatus, getDocEventsUrl, getVoices, syncLibrary, deleteBook, updateProgress, getSummary } from './api';
 import { Square, Cat, Dog, Leaf, Sparkles, X, RotateCcw, Play } from 'lucide-react';
 import './BookStyles.css';
 
@@ -33,6 +33,7 @@ function App() {
     const [totalPages, setTotalPages] = useState(0);
     const [currentPage, setCurrentPage] = useState(1);
     const [isUploading, setIsUploading] = useState(false);
+    const [uploadProgress, setUploadProgress] = useState(null);
     const [isPlaying, setIsPlaying] = useState(false);
     const [playbackRate, setPlaybackRate] = useState(1.0);
     const [voices, setVoices] = useState([]);
@@ -59,7 +60,7 @@ function App() {
 
     useEffect(() => {
         getVoices().then(setVoices).catch(console.error);
-        getLibrary().then(setLibrary).catch(console.error);
+        syncLibrary().then(setLibrary).catch(console.error);
     }, []);
 
     useEffect(() => {
@@ -102,24 +103,53 @@ function App() {
             const initData = await uploadPDF(file);
             const docId = initData.doc_id;
 
-            const pollInterval = setInterval(async () => {
-                try {
-                    const statusData = await getDocStatus(docId);
-                    if (statusData.status === 'ready') {
-                        clearInterval(pollInterval);
-                        setDocId(docId);
-                        setTotalPages(statusData.total_pages);
-                        setCurrentPage(statusData.last_page || 1);
-                        setIsUploading(false);
-                    } else if (statusData.status === 'error') {
-                        clearInterval(pollInterval);
-                        setIsUploading(false);
-                        alert(`Error processing PDF: ${statusData.error}`);
-                    }
-                } catch (e) {
-                    console.error("Polling error", e);
+            // Returns true once processing has finished (ready or error)
+            const handleStatus = (statusData) => {
+                if (statusData.status === 'ready') {
+                    setDocId(docId);
+                    setTotalPages(statusData.total_pages);
+                    setCurrentPage(statusData.last_page || 1);
+                    setIsUploading(false);
+                    setUploadProgress(null);
+                    return true;
+                }
+                if (statusData.status === 'error') {
+                    setIsUploading(false);
+                    setUploadProgress(null);
+                    alert(`Error processing PDF: ${statusData.error}`);
+                    return true;
                 }
-            }, 1000);
+                return false;
+            };
+
+            const pollStatus = () => {
+                const pollInterval = setInterval(async () => {
+                    try {
+                        const statusData = await getDocStatus(docId);
+                        if (handleStatus(statusData)) clearInterval(pollInterval);
+                    } catch (e) {
+                        console.error("Polling error", e);
+                    }
+                }, 1000);
+            };
+
+            // Prefer server push; fall back to polling if SSE is unavailable
+            if (window.EventSource) {
+                const events = new EventSource(getDocEventsUrl(docId));
+                events.addEventListener('status', (e) => {
+                    if (handleStatus(JSON.parse(e.data))) events.close();
+                });
+                events.addEventListener('page', (e) => {
+                    const data = JSON.parse(e.data);
+                    setUploadProgress({ done: data.pages_done, total: data.total_pages });
+                });
+                events.onerror = () => {
+                    // EventSource reconnects by itself; only fall back once it gives up
+                    if (events.readyState === EventSource.CLOSED) pollStatus();
+                };
+            } else {
+                pollStatus();
+            }
 
         } catch (error) {
             console.error("Upload failed", error);
@@ -451,7 +481,11 @@ function App() {
                                 {isUploading ? <span>Cargando...</span> : <span>Subir</span>}
                             </div>
                             <span className="text-2xl font-black text-white">
-                                {isUploading ? "Procesando..." : "Sube tu PDF aquí"}
+                                {isUploading
+                                    ? (uploadProgress && uploadProgress.total
+                                        ? `Procesando... ${uploadProgress.done}/${uploadProgress.total}`
+                                        : "Procesando...")
+                                    : "Sube tu PDF aquí"}
                             </span>
                             <p className="text-gray-400">Soporta texto e imágenes (OCR)</p>
                         </label>
@@ -19,17 +19,63 @@ export const getLibrary = async () => {
     return response.data;
 };
 
+const LIBRARY_CACHE_KEY = "amori.library";
+
+// Keeps a local copy of the library and only downloads what changed since the last sync
+export const syncLibrary = async () => {
+    let cached = null;
+    try {
+        cached = JSON.parse(localStorage.getItem(LIBRARY_CACHE_KEY));
+    } catch {
+        cached = null;
+    }
+
+    const response = await axios.get(`${API_BASE}/library/changes`, { params: { since: cached?.seq || 0 } });
+    const { seq, reset, changes, deleted } = response.data;
+
+    let books = reset || !cached ? [] : cached.books.filter(b => !deleted.includes(b.doc_id));
+    for (const book of changes) {
+        const index = books.findIndex(b => b.doc_id === book.doc_id);
+        if (index >= 0) {
+            books[index] = book;
+        } else {
+            books.push(book);
+        }
+    }
+
+    try {
+        localStorage.setItem(LIBRARY_CACHE_KEY, JSON.stringify({ seq, books }));
+    } catch (e) {
+        console.warn("Could not cache library", e);
+    }
+    return books;
+};
+
 export const deleteBook = async (docId) => {
     const response = await axios.delete(`${API_BASE}/library/${docId}`);
     return response.data;
 };
 
+// Low-bitrate audio when the browser reports data saver or a cellular/slow link
+const getAudioQuality = () => {
+    const connection = navigator.connection;
+    if (connection && (connection.saveData || connection.type === 'cellular' || ['slow-2g', '2g', '3g'].includes(connection.effectiveType))) {
+        return 'low';
+    }
+    return 'standard';
+};
+
 export const getAudioUrl = (docId, pageNum, voice = "es-AR-TomasNeural", translate = false) => {
-    return `${API_BASE}/audio/${docId}/${pageNum}?voice=${voice}&translate=${translate}`;
+    return `${API_BASE}/audio/${docId}/${pageNum}?voice=${voice}&translate=${translate}&quality=${getAudioQuality()}`;
+};
+
+export const getPageImageUrl = (docId, pageNum, width = null) => {
+    const query = width ? `?width=${width}` : "";
+    return `${API_BASE}/document/${docId}/image/${pageNum}${query}`;
 };
 
-export const getPageImageUrl = (docId, pageNum) => {
-    return `${API_BASE}/document/${docId}/image/${pageNum}`;
+export const getPageThumbnailUrl = (docId, pageNum) => {
+    return `${API_BASE}/document/${docId}/thumbnail/${pageNum}`;
 };
 
 export const getPageText = async (docId, pageNum, translate = false) => {
@@ -43,6 +89,11 @@ export const getPageContent = async (docId, pageNum) => {
     return null;
 };
 
+// Server-Sent Events stream with processing progress, summary and audio events
+export const getDocEventsUrl = (docId) => {
+    return `${API_BASE}/document/${docId}/events`;
+};
+
 export const getDocStatus = async (docId) => {
     const response = await axios.get(`${API_BASE}/document/${docId}/status`);
     return response.data;
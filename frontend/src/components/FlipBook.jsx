@@ -72,6 +72,9 @@ const Page = forwardRef((props, ref) => {
 
 const FlipBook = forwardRef(({ docId, totalPages, onPageChange, width = 450, height = 650, layoutMode = 'double', isTranslated = false }, ref) => {
     const bookRef = useRef();
+    // Pages stretch up to maxWidth (600) and can be zoomed in, so ask for 2x that on HiDPI screens.
+    // Rounded to 200px steps so the server and browser caches see a handful of sizes.
+    const imageWidth = Math.min(4000, Math.ceil(600 * 2 * (window.devicePixelRatio || 1) / 200) * 200);
 
     useImperativeHandle(ref, () => ({
         flipNext: () => {
@@ -146,7 +149,7 @@ const FlipBook = forwardRef(({ docId, totalPages, onPageChange, width = 450, hei
                                         <Page
                                             key={index}
                                             number={index + 1}
-                                            image={getPageImageUrl(docId, index + 1)}
+                                            image={getPageImageUrl(docId, index + 1, imageWidth)}
                                             docId={docId}
                                             isTranslated={isTranslated}
                                         />